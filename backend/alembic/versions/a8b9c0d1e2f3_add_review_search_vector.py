@@ -0,0 +1,40 @@
+"""add full-text search vector to reviews
+
+Revision ID: a8b9c0d1e2f3
+Revises: f7a8b9c0d1e2
+Create Date: 2026-03-26 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a8b9c0d1e2f3"
+down_revision: Union[str, None] = "f7a8b9c0d1e2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Generated column: Postgres keeps it in step with reviews.text on every
+    # insert and update (see app.data.review_search).
+    op.execute(
+        """
+        ALTER TABLE reviews
+        ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED
+        """
+    )
+    op.create_index(
+        "idx_reviews_search_vector",
+        "reviews",
+        ["search_vector"],
+        postgresql_using="gin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_reviews_search_vector", table_name="reviews")
+    op.drop_column("reviews", "search_vector")
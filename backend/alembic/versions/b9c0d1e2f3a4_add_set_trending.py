@@ -0,0 +1,59 @@
+"""add set_trending decayed activity scores
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-03-28 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b9c0d1e2f3a4"
+down_revision: Union[str, None] = "a8b9c0d1e2f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "set_trending",
+        sa.Column("set_num", sa.String(), sa.ForeignKey("sets.set_num", ondelete="CASCADE"), primary_key=True),
+        sa.Column("score", sa.Float(), nullable=False, server_default="0"),
+    )
+    op.create_index("idx_set_trending_score", "set_trending", ["score"])
+
+    # Backfill the last 90 days of activity. Weights, epoch and half-life
+    # (7 days = 604800 s) match app.data.trending, as does the set an event
+    # counts towards (its own set_num if that is a set, else set_num || '-1').
+    op.execute(
+        """
+        INSERT INTO set_trending (set_num, score)
+        SELECT
+            COALESCE(exact.set_num, dashed.set_num),
+            SUM(e.w * power(2, extract(epoch FROM e.at - TIMESTAMPTZ '2026-01-01 00:00:00+00') / 604800.0))::float8
+        FROM (
+            SELECT set_num, created_at AS at, 3.0 AS w FROM reviews
+            UNION ALL
+            SELECT li.set_num, li.created_at, CASE l.system_key WHEN 'owned' THEN 2.0 ELSE 1.0 END
+            FROM list_items li
+            JOIN lists l ON l.id = li.list_id
+            WHERE l.is_system AND l.system_key IN ('owned', 'wishlist')
+            UNION ALL
+            SELECT set_num, created_at, 0.5 FROM affiliate_clicks
+        ) e
+        LEFT JOIN sets exact ON exact.set_num = e.set_num
+        LEFT JOIN sets dashed ON dashed.set_num = e.set_num || '-1'
+        WHERE e.at >= now() - INTERVAL '90 days'
+          AND COALESCE(exact.set_num, dashed.set_num) IS NOT NULL
+        GROUP BY COALESCE(exact.set_num, dashed.set_num)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_set_trending_score", table_name="set_trending")
+    op.drop_table("set_trending")
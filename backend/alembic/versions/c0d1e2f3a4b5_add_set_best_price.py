@@ -0,0 +1,63 @@
+"""add set_best_price table
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-03-30 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c0d1e2f3a4b5"
+down_revision: Union[str, None] = "b9c0d1e2f3a4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "set_best_price",
+        sa.Column("set_num", sa.String(), sa.ForeignKey("sets.set_num", ondelete="CASCADE"), primary_key=True),
+        sa.Column("best_price", sa.Float(), nullable=False),
+        sa.Column("store", sa.String(), nullable=False),
+        sa.Column("retail_price", sa.Float(), nullable=True),
+        sa.Column("discount_pct", sa.Float(), nullable=True),
+        sa.Column("savings", sa.Float(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    )
+    op.create_index("idx_set_best_price_discount", "set_best_price", ["discount_pct"])
+    op.create_index("idx_set_best_price_price", "set_best_price", ["best_price"])
+
+    # Backfill: same rules as app.data.best_prices (cheapest in-stock or
+    # unknown-stock offer, BrickLink excluded, ties broken by store name).
+    op.execute(
+        """
+        INSERT INTO set_best_price (set_num, best_price, store, retail_price, discount_pct, savings)
+        SELECT
+            s.set_num,
+            b.price,
+            b.store,
+            CASE WHEN s.retail_price > 0 THEN s.retail_price END,
+            CASE WHEN s.retail_price > 0 THEN (1.0 - b.price / s.retail_price) * 100 END,
+            CASE WHEN s.retail_price > 0 THEN s.retail_price - b.price END
+        FROM (
+            SELECT DISTINCT ON (set_num) set_num, price, store
+            FROM offers
+            WHERE price IS NOT NULL
+              AND COALESCE(in_stock, TRUE)
+              AND store <> 'BrickLink'
+            ORDER BY set_num, price, store
+        ) b
+        JOIN sets s ON s.set_num = b.set_num || '-1'
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_set_best_price_price", table_name="set_best_price")
+    op.drop_index("idx_set_best_price_discount", table_name="set_best_price")
+    op.drop_table("set_best_price")
@@ -0,0 +1,48 @@
+"""add offers.canonical_set_num and a unique (canonical_set_num, store) index
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-04-06 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d1e2f3a4b5c6"
+down_revision: Union[str, None] = "c0d1e2f3a4b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        "ALTER TABLE offers ADD COLUMN canonical_set_num varchar "
+        "GENERATED ALWAYS AS (set_num || '-1') STORED"
+    )
+
+    # Keep the most recently checked row of any duplicated (set, store) pair.
+    op.execute(
+        """
+        DELETE FROM offers o
+        USING offers newer
+        WHERE newer.set_num = o.set_num
+          AND newer.store = o.store
+          AND (coalesce(newer.last_checked, '-infinity'), newer.id)
+              > (coalesce(o.last_checked, '-infinity'), o.id)
+        """
+    )
+
+    op.create_index(
+        "uq_offers_canonical_set_num_store",
+        "offers",
+        ["canonical_set_num", "store"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_offers_canonical_set_num_store", table_name="offers")
+    op.drop_column("offers", "canonical_set_num")
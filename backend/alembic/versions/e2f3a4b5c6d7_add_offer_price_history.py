@@ -0,0 +1,78 @@
+"""add offer_price_points and offer_price_rollups
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-04-13 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2f3a4b5c6d7"
+down_revision: Union[str, None] = "d1e2f3a4b5c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "offer_price_points",
+        sa.Column("id", sa.Integer(), autoincrement=True, primary_key=True),
+        sa.Column("set_num", sa.String(), nullable=False),
+        sa.Column("store", sa.String(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=True),
+        sa.Column("in_stock", sa.Boolean(), nullable=True),
+        sa.Column("recorded_at", sa.DateTime(timezone=True), server_default=sa.text("now()"), nullable=False),
+    )
+    op.create_index(
+        "idx_offer_price_points_set_store_time",
+        "offer_price_points",
+        ["set_num", "store", "recorded_at"],
+    )
+
+    op.create_table(
+        "offer_price_rollups",
+        sa.Column("set_num", sa.String(), nullable=False),
+        sa.Column("store", sa.String(), nullable=False),
+        sa.Column("granularity", sa.String(length=8), nullable=False),
+        sa.Column("bucket", sa.Date(), nullable=False),
+        sa.Column("low", sa.Float(), nullable=False),
+        sa.Column("high", sa.Float(), nullable=False),
+        sa.Column("last", sa.Float(), nullable=False),
+        sa.Column("last_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("points", sa.Integer(), server_default="1", nullable=False),
+        sa.PrimaryKeyConstraint("set_num", "store", "granularity", "bucket"),
+        sa.CheckConstraint("granularity IN ('day', 'week')", name="offer_price_rollups_granularity_check"),
+    )
+
+    # History starts with each offer's current state, as of its last check.
+    op.execute(
+        """
+        INSERT INTO offer_price_points (set_num, store, price, in_stock, recorded_at)
+        SELECT set_num, store, price, in_stock, last_checked
+        FROM offers
+        WHERE price IS NOT NULL OR in_stock IS NOT NULL
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO offer_price_rollups
+            (set_num, store, granularity, bucket, low, high, last, last_at, points)
+        SELECT p.set_num, p.store, g.granularity,
+               date_trunc(g.granularity, p.recorded_at AT TIME ZONE 'UTC')::date,
+               p.price, p.price, p.price, p.recorded_at, 1
+        FROM offer_price_points p
+        CROSS JOIN (VALUES ('day'), ('week')) AS g (granularity)
+        WHERE p.price IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("offer_price_rollups")
+    op.drop_index("idx_offer_price_points_set_store_time", table_name="offer_price_points")
+    op.drop_table("offer_price_points")
@@ -0,0 +1,57 @@
+"""add set_rating_stats aggregate table
+
+Revision ID: e6f7a8b9c0d1
+Revises: d5e6f7a8b9c0
+Create Date: 2026-03-20 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e6f7a8b9c0d1"
+down_revision: Union[str, None] = "d5e6f7a8b9c0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+_BUCKETS = ("05", "10", "15", "20", "25", "30", "35", "40", "45", "50")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "set_rating_stats",
+        sa.Column("set_num", sa.String(), sa.ForeignKey("sets.set_num", ondelete="CASCADE"), primary_key=True),
+        sa.Column("rating_sum", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("rating_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("review_count", sa.Integer(), nullable=False, server_default="0"),
+        *[
+            sa.Column(f"hist_{b}", sa.Integer(), nullable=False, server_default="0")
+            for b in _BUCKETS
+        ],
+    )
+
+    # Backfill from existing reviews
+    hist_cols = ", ".join(f"hist_{b}" for b in _BUCKETS)
+    hist_sums = ", ".join(
+        f"SUM(CASE WHEN rating = {int(b) / 10} THEN 1 ELSE 0 END)" for b in _BUCKETS
+    )
+    op.execute(
+        f"""
+        INSERT INTO set_rating_stats (set_num, rating_sum, rating_count, review_count, {hist_cols})
+        SELECT
+            set_num,
+            COALESCE(SUM(rating), 0),
+            COUNT(rating),
+            SUM(CASE WHEN text IS NOT NULL AND LENGTH(TRIM(text)) > 0 THEN 1 ELSE 0 END),
+            {hist_sums}
+        FROM reviews
+        GROUP BY set_num
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("set_rating_stats")
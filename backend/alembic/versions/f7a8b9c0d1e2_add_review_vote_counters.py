@@ -0,0 +1,71 @@
+"""add vote counters and helpful_score to reviews
+
+Revision ID: f7a8b9c0d1e2
+Revises: e6f7a8b9c0d1
+Create Date: 2026-03-24 12:00:00.000000
+
+"""
+import math
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f7a8b9c0d1e2"
+down_revision: Union[str, None] = "e6f7a8b9c0d1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _wilson_lower_bound(up: int, down: int) -> float:
+    # Same formula as app.data.review_votes.wilson_lower_bound (z = 1.96).
+    n = up + down
+    if n <= 0:
+        return 0.0
+    z = 1.96
+    p = up / n
+    centre = p + z * z / (2 * n)
+    spread = z * math.sqrt((p * (1 - p) + z * z / (4 * n)) / n)
+    return (centre - spread) / (1 + z * z / n)
+
+
+def upgrade() -> None:
+    op.add_column("reviews", sa.Column("upvotes", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("reviews", sa.Column("downvotes", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("reviews", sa.Column("helpful_score", sa.Float(), nullable=False, server_default="0"))
+
+    # Backfill from existing votes
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text(
+            """
+            SELECT review_id,
+                   SUM(CASE WHEN vote_type = 'up' THEN 1 ELSE 0 END),
+                   SUM(CASE WHEN vote_type = 'down' THEN 1 ELSE 0 END)
+            FROM review_votes
+            GROUP BY review_id
+            """
+        )
+    ).all()
+    update = sa.text(
+        "UPDATE reviews SET upvotes = :up, downvotes = :down, helpful_score = :score WHERE id = :id"
+    )
+    for review_id, up, down in rows:
+        bind.execute(update, {"id": review_id, "up": up, "down": down, "score": _wilson_lower_bound(up, down)})
+
+    op.create_index("idx_reviews_set_helpful", "reviews", ["set_num", "helpful_score", "id"])
+    op.create_index(
+        "idx_reviews_set_recent",
+        "reviews",
+        ["set_num", sa.text("COALESCE(updated_at, created_at)"), "id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_reviews_set_recent", table_name="reviews")
+    op.drop_index("idx_reviews_set_helpful", table_name="reviews")
+    op.drop_column("reviews", "helpful_score")
+    op.drop_column("reviews", "downvotes")
+    op.drop_column("reviews", "upvotes")
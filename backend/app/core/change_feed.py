@@ -0,0 +1,101 @@
+# backend/app/core/change_feed.py
+"""In-process change feed: which keys changed since a given version.
+
+Write paths publish the keys they touched after committing:
+
+    from app.core.change_feed import RATINGS, feed
+    feed.publish(RATINGS, [set_num])
+
+Caches remember the version they were built at. On read they ask for the
+keys changed since then and re-load only those, instead of throwing the
+whole cache away on every write:
+
+    changed = feed.since(RATINGS, cached_version)   # None -> rebuild fully
+
+Each topic keeps a bounded window of recent changes; a consumer that falls
+further behind than the window gets None and rebuilds.
+
+The feed is per process: a write published in one gunicorn worker never
+reaches the others, which only see it at their next periodic full rebuild.
+Consumers therefore take their rebuild period from sweep_interval(), which
+caps it at MULTI_WORKER_SWEEP seconds when WEB_CONCURRENCY asks for several
+workers (see gunicorn.conf.py). Reads that must be current everywhere, such
+as a single set's rating numbers, go to the DB instead.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
+
+# Topics
+RATINGS = "ratings"  # set_num whose set_rating_stats row changed
+SETS = "sets"        # set_num whose row in the sets table changed
+
+_WINDOW = 10_000
+MULTI_WORKER_SWEEP = 60  # seconds
+
+
+def _multi_worker() -> bool:
+    try:
+        return int(os.getenv("WEB_CONCURRENCY") or 1) > 1
+    except ValueError:
+        return False
+
+
+def sweep_interval(seconds: int) -> int:
+    """
+    Full-rebuild period for a feed consumer: *seconds* in a single process,
+    at most MULTI_WORKER_SWEEP with several workers, where the rebuild is the
+    only way another worker's writes arrive.
+    """
+    return min(seconds, MULTI_WORKER_SWEEP) if _multi_worker() else seconds
+
+
+class ChangeFeed:
+    """Thread-safe per-topic log of (version, key), bounded to `window` entries."""
+
+    def __init__(self, window: int = _WINDOW) -> None:
+        self.window = window
+        self._lock = threading.Lock()
+        self._logs: Dict[str, Deque[Tuple[int, str]]] = {}
+        self._versions: Dict[str, int] = {}
+
+    def publish(self, topic: str, keys: Iterable[str]) -> int:
+        """Record changed keys; returns the topic's new version."""
+        with self._lock:
+            version = self._versions.get(topic, 0)
+            log = self._logs.setdefault(topic, deque())
+            for key in keys:
+                version += 1
+                log.append((version, key))
+            while len(log) > self.window:
+                log.popleft()
+            self._versions[topic] = version
+            return version
+
+    def version(self, topic: str) -> int:
+        with self._lock:
+            return self._versions.get(topic, 0)
+
+    def since(self, topic: str, version: int) -> Optional[Set[str]]:
+        """
+        Keys changed after `version`, or None if some of those changes have
+        already dropped out of the window (the caller must rebuild).
+        """
+        with self._lock:
+            if version >= self._versions.get(topic, 0):
+                return set()
+            log = self._logs.get(topic)
+            if not log or log[0][0] > version + 1:
+                return None
+            out: Set[str] = set()
+            for v, key in reversed(log):
+                if v <= version:
+                    break
+                out.add(key)
+            return out
+
+
+feed = ChangeFeed()
@@ -0,0 +1,218 @@
+# backend/app/core/profanity.py
+"""Profanity check for user-written text (reviews, posts, comments).
+
+Uses better_profanity's word list and rules: a word counts as profane if it
+matches a whole listed word, allowing that package's look-alike characters
+("@" or "4" for "a", "$" for "s", ...). Runs of up to a few following words
+are also checked, concatenated either directly or with the separators
+between them, so listed phrases ("2 girls 1 cup") and spelled-out words
+("f-u-c-k") are caught.
+
+better_profanity stores every listed word as an object that is compared one
+by one against every word of the text, and it loads the list at import. This
+module reads the same data files without importing that package. On first
+use it builds a trie of the list. Each word of the text is walked through
+the trie, following every letter a look-alike character can stand for.
+Most words fall off after one or two characters, and the result is
+remembered per distinct word.
+
+Benchmark against large review bodies:
+
+    cd backend && python -m app.core.profanity
+"""
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+# Same substitutions as better_profanity.Profanity.CHARS_MAPPING:
+# listed letter -> characters that may stand for it in text.
+CHARS_MAPPING: Dict[str, Tuple[str, ...]] = {
+    "a": ("a", "@", "*", "4"),
+    "i": ("i", "*", "l", "1"),
+    "o": ("o", "*", "0", "@"),
+    "u": ("u", "*", "v"),
+    "v": ("v", "*", "u"),
+    "l": ("l", "1"),
+    "e": ("e", "*", "3"),
+    "s": ("s", "$", "5"),
+    "t": ("t", "7"),
+}
+
+# Characters that can be part of a word, besides the package's list of
+# Unicode letters.
+_WORD_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789@$*\"'"
+
+_END = ""  # trie key marking the end of a listed word
+
+_WORD_MEMO = 50_000  # distinct words remembered per matcher
+
+
+class ProfanityMatcher:
+    """Trie over a word list, matched word by word against text."""
+
+    def __init__(self, words: List[str], letters: str = "") -> None:
+        self.trie: Dict[str, dict] = {}
+        allowed = set(_WORD_CHARS) | set(letters)
+        self.max_extra_words = 1
+        for word in {w.strip().lower() for w in words if w.strip()}:
+            node = self.trie
+            for ch in word:
+                node = node.setdefault(ch, {})
+            node[_END] = {}
+            self.max_extra_words = max(self.max_extra_words, sum(ch not in allowed for ch in word))
+
+        # Text character -> listed characters it may stand for.
+        reverse: Dict[str, Set[str]] = {}
+        for listed, variants in CHARS_MAPPING.items():
+            for v in variants:
+                reverse.setdefault(v, set()).add(listed)
+        self._stands_for: Dict[str, FrozenSet[str]] = {
+            ch: frozenset(targets | ({ch} if ch not in CHARS_MAPPING else set()))
+            for ch, targets in reverse.items()
+        }
+
+        # One character class: \w plus the rest of the allowed characters
+        # (mostly combining marks) as ranges. "_" is in \w but separates
+        # words, so contains() blanks it out before matching.
+        extra = sorted(ord(ch) for ch in allowed if not re.match(r"\w", ch))
+        ranges: List[Tuple[int, int]] = []
+        for cp in extra:
+            if ranges and cp == ranges[-1][1] + 1:
+                ranges[-1] = (ranges[-1][0], cp)
+            else:
+                ranges.append((cp, cp))
+        extra_class = "".join(
+            re.escape(chr(a)) if a == b else f"{re.escape(chr(a))}-{re.escape(chr(b))}"
+            for a, b in ranges
+        )
+        self._word_re = re.compile(f"[\\w{extra_class}]+")
+        # The long class costs about as much again as the scan itself; ASCII
+        # text, the common case, needs none of it.
+        self._ascii_word_re = re.compile(r"[\w@$*\"']+")
+
+        # Word -> trie nodes it reaches. Text repeats words a lot, so most
+        # words are walked once per process.
+        self._word_nodes: Dict[str, List[dict]] = {}
+
+    def _walk(self, nodes: List[dict], text: str) -> List[dict]:
+        stands_for = self._stands_for
+        for ch in text:
+            nxt = []
+            for node in nodes:
+                for target in stands_for.get(ch, (ch,)):
+                    child = node.get(target)
+                    if child is not None:
+                        nxt.append(child)
+            if not nxt:
+                return nxt
+            nodes = nxt
+        return nodes
+
+    def _nodes_for(self, word: str) -> List[dict]:
+        nodes = self._word_nodes.get(word)
+        if nodes is None:
+            nodes = self._walk([self.trie], word)
+            if len(self._word_nodes) >= _WORD_MEMO:
+                self._word_nodes.clear()
+            self._word_nodes[word] = nodes
+        return nodes
+
+    def contains(self, text: str) -> bool:
+        """True if *text* contains a listed word or phrase."""
+        if not text:
+            return False
+        lowered = text.lower()
+        blanked = lowered.replace("_", " ")
+        word_re = self._ascii_word_re if blanked.isascii() else self._word_re
+
+        # Distinct words first: usually none of them is even the start of a
+        # listed word and the text is clean.
+        prefixes = False
+        for word in set(word_re.findall(blanked)):
+            nodes = self._nodes_for(word)
+            if any(_END in n for n in nodes):
+                return True
+            prefixes = prefixes or bool(nodes)
+        if not prefixes:
+            return False
+
+        # Some word starts a listed phrase: try it with the words after it,
+        # joined directly and with their separators.
+        spans = [m.span() for m in word_re.finditer(blanked)]
+        for k, (start, end) in enumerate(spans):
+            nodes = self._nodes_for(lowered[start:end])
+            if not nodes:
+                continue
+            joined, separated = nodes, nodes
+            for nxt_start, nxt_end in spans[k + 1:k + 1 + self.max_extra_words]:
+                word = lowered[nxt_start:nxt_end]
+                gap = lowered[end:nxt_start]
+                joined = self._walk(joined, word) if joined else joined
+                separated = self._walk(separated, gap + word) if separated else separated
+                if any(_END in n for n in joined) or any(_END in n for n in separated):
+                    return True
+                if not joined and not separated:
+                    break
+                end = nxt_end
+        return False
+
+
+_matcher: Optional[ProfanityMatcher] = None
+_matcher_lock = threading.Lock()
+
+
+def _load_default_matcher() -> ProfanityMatcher:
+    # Locate better_profanity's data files without importing the package,
+    # which would build its own word set at import time.
+    spec = importlib.util.find_spec("better_profanity")
+    root = list(spec.submodule_search_locations)[0]
+    with open(os.path.join(root, "profanity_wordlist.txt"), encoding="utf-8") as fh:
+        words = fh.read().splitlines()
+    with open(os.path.join(root, "alphabetic_unicode.json"), encoding="utf-8") as fh:
+        letters = "".join(json.load(fh))
+    return ProfanityMatcher(words, letters)
+
+
+def default_matcher() -> ProfanityMatcher:
+    """The matcher for the bundled word list, built on first use."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = _load_default_matcher()
+    return _matcher
+
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    vocab = (
+        "great set build instructions bricks minifigures castle ship detail price value "
+        "classic space sturdy display shelf sticker printed pieces hours fun kids adult"
+    ).split()
+    rng = random.Random(7)
+    bodies = [" ".join(rng.choice(vocab) for _ in range(900)) + "." for _ in range(20)]
+
+    t0 = time.perf_counter()
+    matcher = default_matcher()
+    print(f"build: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    t0 = time.perf_counter()
+    for body in bodies:
+        matcher.contains(body)
+    per = (time.perf_counter() - t0) / len(bodies) * 1000
+    print(f"contains(): {per:.3f} ms per {len(bodies[0]):,}-char review")
+
+    from better_profanity import profanity
+
+    t0 = time.perf_counter()
+    for body in bodies[:3]:
+        profanity.contains_profanity(body)
+    per = (time.perf_counter() - t0) / 3 * 1000
+    print(f"better_profanity: {per:.3f} ms per review")
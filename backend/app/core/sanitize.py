@@ -2,10 +2,20 @@
 import html
 import re
 
-from better_profanity import profanity as _profanity
+from .profanity import default_matcher
 
-# Initialise the profanity filter once at module load
-_profanity.load_censor_words()
+_TAG_RE = re.compile(r"<[^>]+>")
+
+
+def _strip_and_escape(value: str) -> str:
+    # Plain text (most reviews) has nothing to strip or escape. Otherwise
+    # two C-level passes beat a single regex pass with a Python callback
+    # per match.
+    if "<" in value:
+        value = _TAG_RE.sub("", value)
+    if "&" in value or "<" in value or ">" in value:
+        value = html.escape(value, quote=False)
+    return value
 
 
 def sanitize_text(value: str) -> str:
@@ -15,10 +25,7 @@ def sanitize_text(value: str) -> str:
     """
     if not value:
         return value
-    # Remove HTML tags
-    stripped = re.sub(r"<[^>]+>", "", value)
-    # Escape remaining HTML entities
-    return html.escape(stripped, quote=False).strip()
+    return _strip_and_escape(value).strip()
 
 
 def sanitize_oneline(value: str) -> str:
@@ -27,14 +34,12 @@ def sanitize_oneline(value: str) -> str:
     """
     if not value:
         return value
-    stripped = re.sub(r"<[^>]+>", "", value)
-    escaped = html.escape(stripped, quote=False)
     # Collapse all whitespace (including newlines) to single space
-    return re.sub(r"\s+", " ", escaped).strip()
+    return " ".join(_strip_and_escape(value).split())
 
 
 def contains_profanity(text: str) -> bool:
     """Return True if the text contains profane language."""
     if not text or not text.strip():
         return False
-    return _profanity.contains_profanity(text)
+    return default_matcher().contains(text)
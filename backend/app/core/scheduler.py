@@ -9,6 +9,7 @@ from __future__ import annotations
 import logging
 import os
 
+from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_EXECUTED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
@@ -87,11 +88,50 @@ def register_jobs() -> None:
     )
 
 
+_JOBS_LOCK_PATH = os.getenv("BRICKTRACK_JOBS_LOCK", "/tmp/bricktrack-jobs.lock")
+_jobs_lock_file = None
+
+
+def acquire_job_leadership() -> bool:
+    """
+    Return True if this process should run the scheduler and startup scrapes.
+
+    With several workers (see gunicorn.conf.py) only the one holding an
+    exclusive flock on _JOBS_LOCK_PATH runs them. The OS releases the lock
+    when that worker exits, so its replacement takes the jobs over.
+    """
+    global _jobs_lock_file
+    if _jobs_lock_file is not None:
+        return True
+    try:
+        import fcntl
+    except ImportError:  # non-POSIX dev machines only run one process
+        return True
+
+    fh = open(_JOBS_LOCK_PATH, "a")
+    try:
+        fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        fh.close()
+        logger.info("Another worker runs background jobs; skipping here")
+        return False
+    _jobs_lock_file = fh
+    return True
+
+
+def _on_job_finished(event) -> None:
+    # Every pipeline writes to the sets table; drop the in-memory view.
+    from app.data.set_view import invalidate_set_view
+
+    invalidate_set_view()
+
+
 def start_scheduler() -> None:
     """Start the scheduler (called from FastAPI lifespan)."""
     if _is_testing:
         return
     register_jobs()
+    scheduler.add_listener(_on_job_finished, EVENT_JOB_EXECUTED | EVENT_JOB_ERROR)
     scheduler.start()
     logger.info("Scheduler started with %d jobs", len(scheduler.get_jobs()))
 
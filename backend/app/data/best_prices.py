@@ -0,0 +1,123 @@
+# app/data/best_prices.py
+"""
+Maintenance of the set_best_price table.
+
+A set's row holds its cheapest offer that is in stock (or of unknown stock)
+and not from an aftermarket seller (BrickLink), plus the discount and
+savings of that price against Set.retail_price. Sets without such an offer
+have no row, so deal listings and counts are index scans over this table
+instead of MIN(price) GROUP BY over `offers` joined on "set_num || '-1'".
+
+Offers are stored under the plain number ("10305"); rows here are keyed by
+the canonical "<plain>-1" the deal queries always joined on.
+
+Writers that change offers or a set's retail price call
+refresh_best_prices() with the set numbers they touched before committing.
+rebuild_best_prices() recomputes the whole table; it is what the migration
+backfill does and serves as a consistency repair.
+"""
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.set_nums import base_set_num
+from ..models import Offer as OfferModel
+from ..models import Set as SetModel
+from ..models import SetBestPrice
+
+# Aftermarket sellers: not comparable to retail deals.
+EXCLUDED_STORES = ("BrickLink",)
+
+
+def canonical_for(plain: str) -> str:
+    return f"{plain}-1"
+
+
+def _best_offers(db: Session, plains: Optional[List[str]]) -> Dict[str, Tuple[float, str]]:
+    """plain set_num -> (price, store) of its cheapest qualifying offer."""
+    q = select(OfferModel.set_num, OfferModel.price, OfferModel.store).where(
+        OfferModel.price.isnot(None),
+        func.coalesce(OfferModel.in_stock, True).is_(True),
+        OfferModel.store.not_in(EXCLUDED_STORES),
+    )
+    if plains is not None:
+        q = q.where(OfferModel.set_num.in_(plains))
+
+    best: Dict[str, Tuple[float, str]] = {}
+    for sn, price, store in db.execute(q).all():
+        cand = (float(price), str(store))
+        cur = best.get(sn)
+        if cur is None or cand < cur:
+            best[sn] = cand
+    return best
+
+
+def _rows(db: Session, best: Dict[str, Tuple[float, str]], full: bool) -> List[Dict[str, object]]:
+    q = select(SetModel.set_num, SetModel.retail_price)
+    if not full:
+        q = q.where(SetModel.set_num.in_([canonical_for(p) for p in best]))
+    retail = {sn: rp for sn, rp in db.execute(q).all()}
+
+    out: List[Dict[str, object]] = []
+    for plain, (price, store) in best.items():
+        canonical = canonical_for(plain)
+        if canonical not in retail:
+            continue  # no sets row to join to
+        rp = retail[canonical]
+        rp = float(rp) if rp is not None and rp > 0 else None
+        out.append({
+            "set_num": canonical,
+            "best_price": price,
+            "store": store,
+            "retail_price": rp,
+            "discount_pct": (1.0 - price / rp) * 100 if rp else None,
+            "savings": rp - price if rp else None,
+        })
+    return out
+
+
+def refresh_best_prices(db: Session, set_nums: Iterable[str]) -> None:
+    """
+    Recompute the rows of *set_nums* (plain or canonical) from their offers
+    and retail prices. Flushes pending changes first; does not commit.
+    """
+    plains = sorted({base_set_num(sn) for sn in set_nums} - {""})
+    if not plains:
+        return
+    db.flush()
+
+    rows = _rows(db, _best_offers(db, plains), full=False)
+    fresh = {r["set_num"] for r in rows}
+    stale = [canonical_for(p) for p in plains if canonical_for(p) not in fresh]
+    if stale:
+        db.execute(delete(SetBestPrice).where(SetBestPrice.set_num.in_(stale)))
+
+    for row in rows:
+        values = {k: v for k, v in row.items() if k != "set_num"}
+        stmt = (
+            update(SetBestPrice)
+            .where(SetBestPrice.set_num == row["set_num"])
+            .values(**values, updated_at=func.now())
+        )
+        if db.execute(stmt).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(SetBestPrice).values(**row))
+        except IntegrityError:
+            # Another writer created the row between our UPDATE and INSERT.
+            db.execute(stmt)
+
+
+def rebuild_best_prices(db: Session) -> int:
+    """Recompute every row from `offers` and `sets`. Commits; returns the number of sets."""
+    rows = _rows(db, _best_offers(db, None), full=True)
+    db.execute(delete(SetBestPrice))
+    if rows:
+        db.execute(insert(SetBestPrice), rows)
+    db.commit()
+    return len(rows)
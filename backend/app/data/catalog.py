@@ -0,0 +1,520 @@
+# app/data/catalog.py
+"""
+In-memory lookup structures derived from the cached set catalog.
+
+A SetCatalog is built once per list returned by load_cached_sets() and is
+replaced (never mutated) when the catalog reloads, so readers always see a
+consistent snapshot without taking a lock.
+
+Besides the set-number index, the catalog keeps NumPy columns (year, pieces,
+theme code, name rank) so list endpoints can filter with boolean masks and
+sort with argsort instead of copying every row, a trigram index over the
+searchable text fields for fuzzy search, a sorted-prefix index for
+autocomplete and per-theme partitions for the /themes endpoints.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+def _num_key(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _theme_key(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def fold_text(value: Any) -> str:
+    """Trimmed, lowercased and accent-free: ' Pokémon ' -> 'pokemon'."""
+    return "".join(
+        c for c in unicodedata.normalize("NFD", str(value or "").strip())
+        if unicodedata.category(c) != "Mn"
+    ).lower()
+
+
+def theme_group_key(value: Any) -> str:
+    """Key that groups spellings of one theme ('Star-Wars', 'star wars')."""
+    return fold_text(value).replace("-", " ")
+
+
+def _int_or_zero(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _float_or_zero(value: Any) -> float:
+    try:
+        return float(value or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _trigrams(text: str) -> set:
+    # Padded like pg_trgm so short queries and word starts still produce grams.
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to the distinct lowercased
+    name / ip / theme strings of a catalog, and from those strings to rows.
+
+    Theme and ip values repeat across thousands of sets, so indexing distinct
+    strings keeps both the postings and the exact re-scoring step small.
+    """
+
+    FIELDS = ("name", "ip", "theme")
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        text_ids: Dict[str, int] = {}
+        text_rows: List[List[int]] = []
+        for i, s in enumerate(rows):
+            for field in self.FIELDS:
+                text = (s.get(field) or "").lower()
+                if not text:
+                    continue
+                tid = text_ids.get(text)
+                if tid is None:
+                    tid = text_ids[text] = len(text_rows)
+                    text_rows.append([])
+                positions = text_rows[tid]
+                if not positions or positions[-1] != i:
+                    positions.append(i)
+
+        postings: Dict[str, List[int]] = {}
+        gram_count = np.zeros(len(text_ids), dtype=np.int32)
+        for text, tid in text_ids.items():
+            grams = _trigrams(text)
+            gram_count[tid] = len(grams)
+            for g in grams:
+                postings.setdefault(g, []).append(tid)
+
+        self.texts: List[str] = list(text_ids)
+        self.text_rows = text_rows
+        self._gram_count = gram_count
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+
+    def candidates(self, q: str, limit: int = 500) -> List[int]:
+        """
+        Ids of the distinct texts most similar to *q* by trigram overlap
+        (Dice coefficient), best first. Texts sharing no trigram are skipped.
+        """
+        q = (q or "").strip().lower()
+        if not q or not self.texts:
+            return []
+
+        q_grams = _trigrams(q)
+        hits = [self._postings[g] for g in q_grams if g in self._postings]
+        if not hits:
+            return []
+
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.texts))
+        dice = 2.0 * overlap / (len(q_grams) + self._gram_count)
+        dice[overlap == 0] = 0.0
+
+        top = np.flatnonzero(dice)
+        if len(top) > limit:
+            top = top[np.argpartition(-dice[top], limit)[:limit]]
+        return top[np.argsort(-dice[top], kind="stable")].tolist()
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _norm_text(value: Any) -> str:
+    return " ".join(str(value or "").lower().split())
+
+
+class AutocompleteIndex:
+    """
+    Sorted-prefix index for /sets/suggest.
+
+    Keys are set numbers, full names, name tokens, full themes and theme
+    tokens. Each (key, row) entry carries a static score: the kind of key
+    (weighted like the old linear suggest scan) plus capped popularity.
+    Prefixes matching more than SCAN_LIMIT entries have their top rows
+    precomputed at build time; narrower prefixes are ranked on the fly, so a
+    keystroke costs a dict hit or a bisect plus a small sort.
+    """
+
+    TOP_K = 20
+    SCAN_LIMIT = 256
+
+    SET_NUM = 110
+    NAME_PREFIX = 140  # name starts with q (80) and contains q (60)
+    NAME_TOKEN = 60
+    THEME = 30
+
+    def __init__(self, rows: List[Dict[str, Any]], rating_count: np.ndarray, year: np.ndarray) -> None:
+        entries: List[tuple] = []
+        for i, s in enumerate(rows):
+            keys: Dict[str, int] = {}
+
+            def add(key: str, score: int) -> None:
+                if key and keys.get(key, -1) < score:
+                    keys[key] = score
+
+            add(_num_key(s.get("set_num")), self.SET_NUM)
+            add(_num_key(s.get("set_num_plain")), self.SET_NUM)
+            name = _norm_text(s.get("name"))
+            add(name, self.NAME_PREFIX)
+            for tok in _TOKEN_RE.findall(name):
+                add(tok, self.NAME_TOKEN)
+            theme = _norm_text(s.get("theme"))
+            add(theme, self.THEME)
+            for tok in _TOKEN_RE.findall(theme):
+                add(tok, self.THEME)
+
+            entries.extend((key, i, score) for key, score in keys.items())
+
+        entries.sort(key=lambda e: e[0])
+        n = len(entries)
+        self.keys: List[str] = [e[0] for e in entries]
+        self._row = np.fromiter((e[1] for e in entries), dtype=np.intp, count=n)
+        kind = np.fromiter((e[2] for e in entries), dtype=np.int64, count=n)
+
+        self.popularity = np.asarray(rating_count, dtype=np.int64)
+        self.year = year
+        self._count = self.popularity[self._row]
+        self._year = year[self._row]
+        self._score = kind + np.minimum(self._count, 50)
+
+        self._top: Dict[str, List[int]] = {}
+        for key in dict.fromkeys(self.keys):
+            for n_chars in range(1, len(key) + 1):
+                prefix = key[:n_chars]
+                if prefix in self._top:
+                    continue
+                lo, hi = self._range(prefix)
+                if hi - lo <= self.SCAN_LIMIT:
+                    break
+                self._top[prefix] = self._rank(lo, hi, self.TOP_K)
+
+    def _range(self, prefix: str) -> tuple:
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\U0010ffff", lo)
+        return lo, hi
+
+    def _rank(self, lo: int, hi: int, k: int) -> List[int]:
+        # lexsort: last key is the primary one; reversed for descending.
+        order = np.lexsort((self._year[lo:hi], self._count[lo:hi], self._score[lo:hi]))[::-1]
+        out: List[int] = []
+        seen = set()
+        for j in order:
+            row = int(self._row[lo + j])
+            if row in seen:
+                continue
+            seen.add(row)
+            out.append(row)
+            if len(out) >= k:
+                break
+        return out
+
+    def top(self, prefix: str, k: int) -> List[int]:
+        """Best row positions whose keys start with *prefix*, at most *k*."""
+        prefix = _norm_text(prefix)
+        if not prefix:
+            return []
+        cached = self._top.get(prefix)
+        if cached is not None and k <= self.TOP_K:
+            return cached[:k]
+        lo, hi = self._range(prefix)
+        return self._rank(lo, hi, k)
+
+
+class ThemeIndex:
+    """
+    Rows partitioned by theme_group_key(), with the aggregates the /themes
+    grid shows (display name, set count, best image) computed up front.
+
+    The display name is the first spelling seen; the image is the one of the
+    set with the most pieces (earliest row on ties).
+    """
+
+    # Distinct min_year listings kept before the memo is reset.
+    SINCE_MEMO = 32
+
+    def __init__(self, catalog: "SetCatalog") -> None:
+        rows = catalog.rows
+        self._rows = rows
+        self._year = catalog.year
+
+        key_of: Dict[Any, str] = {}
+        members: Dict[str, List[int]] = {}
+        display: Dict[str, str] = {}
+        for i, s in enumerate(rows):
+            raw = s.get("theme")
+            k = key_of.get(raw)
+            if k is None:
+                k = key_of[raw] = theme_group_key(raw)
+            if not k:
+                continue
+            lst = members.get(k)
+            if lst is None:
+                members[k] = lst = []
+                display[k] = str(raw).strip()
+            lst.append(i)
+
+        self.partitions: Dict[str, np.ndarray] = {}
+        # Rows that have an image, best first (most pieces, then row order).
+        self._image_rows: Dict[str, np.ndarray] = {}
+        self.min_year: Dict[str, int] = {}
+        self.max_year: Dict[str, int] = {}
+        for k, lst in members.items():
+            pos = np.asarray(lst, dtype=np.intp)
+            self.partitions[k] = pos
+            img = pos[np.fromiter((bool(rows[i].get("image_url")) for i in lst), dtype=bool, count=len(lst))]
+            self._image_rows[k] = img[np.lexsort((img, -catalog.pieces[img]))]
+            years = catalog.year[pos]
+            self.min_year[k] = int(years.min())
+            self.max_year[k] = int(years.max())
+
+        # (display, set_count, image_url) for every theme, ordered by name.
+        keys = sorted(members, key=lambda k: display[k].lower())
+        self._keys = keys
+        self._since_memo: Dict[int, Tuple[List[str], List[Tuple[str, int, Optional[str]]]]] = {}
+        self._listing: List[Tuple[str, int, Optional[str]]] = [
+            (display[k], len(members[k]), self._best_image(self._image_rows[k])) for k in keys
+        ]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _best_image(self, image_rows: np.ndarray) -> Optional[str]:
+        return self._rows[image_rows[0]]["image_url"] if len(image_rows) else None
+
+    def rows_for(self, theme: str) -> Optional[np.ndarray]:
+        """Row positions (ascending) of a theme, or None if it doesn't exist."""
+        return self.partitions.get(theme_group_key(theme))
+
+    def listing(self, q: str = "", min_year: Optional[int] = None) -> List[Tuple[str, int, Optional[str]]]:
+        """
+        (display, set_count, image_url) per theme whose key contains *q*,
+        ordered by name. With *min_year*, only sets from that year onward
+        count towards the aggregates. The returned list must not be mutated.
+        """
+        ql = fold_text(q)
+        keys, listing = self._keys, self._listing
+        if min_year is not None:
+            keys, listing = self._since(min_year)
+        if not ql:
+            return listing
+        return [row for k, row in zip(keys, listing) if ql in k]
+
+    def _since(self, min_year: int) -> Tuple[List[str], List[Tuple[str, int, Optional[str]]]]:
+        """Keys and listing rows restricted to sets from *min_year* on, memoized per year."""
+        hit = self._since_memo.get(min_year)
+        if hit is not None:
+            return hit
+
+        out: List[Tuple[str, Tuple[str, int, Optional[str]]]] = []
+        for k, row in zip(self._keys, self._listing):
+            if self.max_year[k] < min_year:
+                continue
+            if self.min_year[k] >= min_year:
+                out.append((k, row))
+                continue
+            pos = self.partitions[k]
+            keep = pos[self._year[pos] >= min_year]
+            img = self._image_rows[k]
+            img = img[self._year[img] >= min_year]
+            display = str(self._rows[keep[0]].get("theme")).strip()
+            out.append((k, (display, len(keep), self._best_image(img))))
+        out.sort(key=lambda t: t[1][0].lower())
+
+        hit = ([k for k, _ in out], [row for _, row in out])
+        if len(self._since_memo) >= self.SINCE_MEMO:
+            self._since_memo.clear()
+        self._since_memo[min_year] = hit
+        return hit
+
+
+class SetCatalog:
+    """Read-only indexes over one catalog snapshot."""
+
+    def __init__(self, rows: List[Dict[str, Any]]) -> None:
+        self.rows = rows
+
+        # set number (canonical or plain, lowercased) -> row position.
+        # The earliest row matching either number wins, like a linear scan.
+        by_num: Dict[str, int] = {}
+        plain_pos: Dict[str, int] = {}
+        for i, s in enumerate(rows):
+            full = _num_key(s.get("set_num"))
+            if full and full not in by_num:
+                by_num[full] = i
+            plain = _num_key(s.get("set_num_plain"))
+            if plain and plain not in plain_pos:
+                plain_pos[plain] = i
+        for plain, i in plain_pos.items():
+            j = by_num.get(plain)
+            if j is None or i < j:
+                by_num[plain] = i
+        self._by_num = by_num
+
+        # Exact canonical set_num -> row positions, for scattering DB maps
+        # (ratings, prices) that are keyed by canonical number.
+        canon: Dict[str, List[int]] = {}
+        for i, s in enumerate(rows):
+            canon.setdefault(s.get("set_num") or "", []).append(i)
+        self._canon = canon
+
+        # ----- columns -----
+        n = len(rows)
+        self.year = np.fromiter((_int_or_zero(s.get("year")) for s in rows), dtype=np.int32, count=n)
+        self.pieces = np.fromiter((_int_or_zero(s.get("pieces")) for s in rows), dtype=np.int64, count=n)
+        self.base_price = np.fromiter(
+            (_float_or_zero(s.get("retail_price")) for s in rows), dtype=np.float64, count=n
+        )
+
+        theme_codes: Dict[str, int] = {}
+        self.theme_code = np.fromiter(
+            (theme_codes.setdefault(_theme_key(s.get("theme")), len(theme_codes)) for s in rows),
+            dtype=np.int32,
+            count=n,
+        )
+        self._theme_codes = theme_codes
+
+        # Rank of the lowercased name; equal names share a rank so a stable
+        # argsort on it orders exactly like sorting by the name string.
+        names = [(s.get("name") or "").lower() for s in rows]
+        name_rank = np.zeros(n, dtype=np.int32)
+        rank = -1
+        prev: Optional[str] = None
+        for i in sorted(range(n), key=names.__getitem__):
+            if names[i] != prev:
+                rank += 1
+                prev = names[i]
+            name_rank[i] = rank
+        self.name_rank = name_rank
+
+        self._lazy_lock = threading.Lock()
+        self._scattered: Dict[str, tuple] = {}
+        self._sorted: Dict[Tuple[str, bool], np.ndarray] = {}
+        self._trigram_index: Optional[TrigramIndex] = None
+        self._theme_index: Optional[ThemeIndex] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def position(self, set_num: str) -> Optional[int]:
+        """Row position for a full or plain set number, or None."""
+        return self._by_num.get(_num_key(set_num))
+
+    def get(self, set_num: str) -> Optional[Dict[str, Any]]:
+        """Row for a full or plain set number ('10305' or '10305-1'), or None."""
+        i = self._by_num.get(_num_key(set_num))
+        return self.rows[i] if i is not None else None
+
+    def theme_code_of(self, theme: str) -> Optional[int]:
+        """Integer code for a theme name (case-insensitive), or None if unknown."""
+        return self._theme_codes.get(_theme_key(theme))
+
+    def positions_of(self, set_nums: Any) -> np.ndarray:
+        """Row positions for an iterable of exact canonical set numbers."""
+        out: List[int] = []
+        for sn in set_nums:
+            out.extend(self._canon.get(sn, ()))
+        return np.asarray(out, dtype=np.intp)
+
+    def sorted_rows(self, key: str, descending: bool = False) -> np.ndarray:
+        """
+        Every row position, stably sorted by a static column ("name", "year"
+        or "pieces"). Built once per key and direction for this snapshot.
+
+        Keeping the entries of this permutation that pass a row mask gives the
+        same order as a stable sort of the masked rows in position order.
+        """
+        perm = self._sorted.get((key, descending))
+        if perm is None:
+            col = {"name": self.name_rank, "year": self.year, "pieces": self.pieces}[key]
+            perm = np.argsort(-col if descending else col, kind="stable")
+            with self._lazy_lock:
+                self._sorted[(key, descending)] = perm
+        return perm
+
+    def trigram_index(self) -> TrigramIndex:
+        """Trigram index for this snapshot, built on first fuzzy lookup."""
+        idx = self._trigram_index
+        if idx is None:
+            with self._lazy_lock:
+                idx = self._trigram_index
+                if idx is None:
+                    idx = self._trigram_index = TrigramIndex(self.rows)
+        return idx
+
+    def theme_index(self) -> ThemeIndex:
+        """Theme partitions for this snapshot, built on first use."""
+        idx = self._theme_index
+        if idx is None:
+            with self._lazy_lock:
+                idx = self._theme_index
+                if idx is None:
+                    idx = self._theme_index = ThemeIndex(self)
+        return idx
+
+    def scatter(
+        self,
+        name: str,
+        mapping: Mapping[str, Any],
+        value: Callable[[Any], float],
+        fill: float,
+        dtype: Any = np.float64,
+    ) -> np.ndarray:
+        """
+        Turn a {canonical set_num: v} map into a column aligned with rows.
+
+        Only the map's keys are visited. The result is memoized per name
+        while the same mapping object is passed in, so a TTL-cached DB map
+        is converted once per refresh rather than once per request.
+        """
+        hit = self._scattered.get(name)
+        if hit is not None and hit[0] is mapping:
+            return hit[1]
+
+        col = np.full(len(self.rows), fill, dtype=dtype)
+        for sn, v in mapping.items():
+            pos = self._canon.get(sn)
+            if pos:
+                col[pos] = value(v)
+
+        with self._lazy_lock:
+            self._scattered[name] = (mapping, col)
+        return col
+
+
+_build_lock = threading.Lock()
+# Newest first. The previous snapshot is kept so that requests still holding
+# the old rows list don't rebuild its catalog while a reload is published.
+_recent: Tuple[SetCatalog, ...] = ()
+
+
+def catalog_for(rows: List[Dict[str, Any]]) -> SetCatalog:
+    """
+    Return the SetCatalog for this exact rows list, building it on first use.
+
+    Keyed on list identity: a reload produces a new list, which produces a new
+    catalog that is swapped in with a single reference assignment.
+    """
+    global _recent
+    for cat in _recent:
+        if cat.rows is rows:
+            return cat
+
+    with _build_lock:
+        for cat in _recent:
+            if cat.rows is rows:
+                return cat
+        cat = SetCatalog(rows)
+        _recent = (cat,) + _recent[:1]
+        return cat
@@ -0,0 +1,150 @@
+# app/data/offer_refresh.py
+"""
+Background LEGO.com refreshes for sets viewed without a LEGO offer.
+
+GET /sets/{set_num}/offers used to scrape LEGO.com inline, holding a worker
+thread for up to REQUEST_TIMEOUT per unpriced set. It now calls
+request_refresh() and returns the offers it already has; a single daemon
+thread drains the queue and writes whatever the scrape finds, so the next
+load shows it.
+
+- Single flight: a set is queued at most once until its refresh finishes.
+- Negative cache: a set LEGO.com has no product page (or price) for is not
+  retried for _NOT_FOUND_TTL seconds. Failed fetches (timeouts, rate limits,
+  5xx) are not cached; the next view of the set queues it again.
+- The queue is bounded; when it is full the request is dropped and the
+  next view of the set asks again.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import Offer as OfferModel
+from ..models import Set as SetModel
+from . import offers as offers_data
+from .best_prices import refresh_best_prices
+
+logger = logging.getLogger("bricktrack.on_demand_scrape")
+
+_NOT_FOUND_TTL = 6 * 3600  # seconds
+_QUEUE_SIZE = 256
+
+_Job = Tuple[str, str, str]  # (canonical set_num, plain set_num, name)
+
+_lock = threading.Lock()
+_queue: "queue.Queue[_Job]" = queue.Queue(maxsize=_QUEUE_SIZE)
+_pending: Set[str] = set()  # plain numbers queued or being scraped
+_not_found: Dict[str, float] = {}  # plain number -> monotonic expiry
+_worker: Optional[threading.Thread] = None
+
+
+def request_refresh(canonical_set_num: str, plain: str, name: str) -> bool:
+    """
+    Queue a LEGO.com refresh of *plain* unless one is already pending or the
+    set is negatively cached. Returns True if a refresh is queued or running.
+    """
+    with _lock:
+        if plain in _pending:
+            return True
+        expiry = _not_found.get(plain)
+        if expiry is not None:
+            if expiry > time.monotonic():
+                return False
+            del _not_found[plain]
+        try:
+            _queue.put_nowait((canonical_set_num, plain, name))
+        except queue.Full:
+            return False
+        _pending.add(plain)
+        _ensure_worker()
+    return True
+
+
+def _ensure_worker() -> None:
+    # Caller holds _lock.
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_work, name="offer-refresh", daemon=True)
+        _worker.start()
+
+
+def _work() -> None:
+    while True:
+        _run(_queue.get())
+
+
+def _run(job: _Job) -> None:
+    canonical_set_num, plain, name = job
+    missing = False
+    try:
+        db = SessionLocal()
+        try:
+            missing = not refresh_offers(db, canonical_set_num, plain, name)
+        finally:
+            db.close()
+    except Exception:
+        # Not evidence the page is missing: leave the set uncached.
+        logger.warning("On-demand scrape failed for %s", plain, exc_info=True)
+    finally:
+        with _lock:
+            _pending.discard(plain)
+            if missing:
+                _not_found[plain] = time.monotonic() + _NOT_FOUND_TTL
+
+
+def refresh_offers(db: Session, canonical_set_num: str, plain: str, name: str) -> bool:
+    """
+    Scrape LEGO.com for one set, upsert its LEGO offer and retail price, and
+    refresh the Amazon link if the set has an ASIN. Commits. Returns whether
+    LEGO.com had a price for the set; fetch errors other than a 404 are raised.
+    """
+    import httpx
+
+    from app.pipelines import price_scraper
+
+    now = datetime.now(timezone.utc)
+    with httpx.Client(timeout=price_scraper.REQUEST_TIMEOUT) as client:
+        lego_data = price_scraper.fetch_lego_product_page(client, plain)
+    found = bool(lego_data and lego_data.get("price"))
+
+    if found:
+        offers_data.upsert_offer(
+            db, plain, "LEGO",
+            price=lego_data["price"], currency=lego_data.get("currency", "USD"),
+            url=lego_data["url"], in_stock=lego_data.get("in_stock"),
+            now=now,
+        )
+        db.execute(
+            update(SetModel)
+            .where(SetModel.set_num == canonical_set_num)
+            .values(retail_price=lego_data["price"], retail_currency=lego_data.get("currency", "USD"))
+        )
+
+    # Only create Amazon offer if we already have an ASIN for this set
+    asin = db.execute(
+        select(OfferModel.asin).where(
+            OfferModel.set_num == plain,
+            OfferModel.store == "Amazon",
+            OfferModel.asin.isnot(None),
+        )
+    ).scalar_one_or_none()
+    if asin:
+        # Refresh the URL with current affiliate tag
+        offers_data.upsert_offer(
+            db, plain, "Amazon", price=None, currency="USD",
+            url=price_scraper.build_amazon_url(plain, name, asin=asin), in_stock=None, now=now,
+        )
+
+    refresh_best_prices(db, [plain])
+    db.commit()
+    logger.info("On-demand scrape for %s: %s", plain, lego_data["price"] if found else "no LEGO.com price")
+    return found
@@ -1,11 +1,19 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
-from sqlalchemy import func as sa_func, select
+from sqlalchemy import func as sa_func, select, update
 from sqlalchemy.orm import Session
 
-from app.models import Offer as OfferModel, Set as SetModel
+from app.data.best_prices import canonical_for, refresh_best_prices
+from app.data.price_history import record_changes
+from app.db import dialect_insert
+from app.models import Offer as OfferModel, Set as SetModel, SetBestPrice
+
+logger = logging.getLogger(__name__)
 
 
 def _normalize_plain_set_num(v: str) -> str:
@@ -72,6 +80,214 @@ def get_msrp_for_set(db: Session, plain_set_num: str) -> Optional[Dict[str, Any]
     return None
 
 
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+
+_KEEP_IF_NONE = ("price", "in_stock", "asin")
+_OFFER_FIELDS = ("price", "currency", "url", "in_stock", "asin")
+
+
+def _stored_offers(db: Session, rows: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """(set_num, store) -> current field values, for the offers of *rows* that exist."""
+    keys = {(r["set_num"], r["store"]) for r in rows}
+    found = db.execute(
+        select(OfferModel.set_num, OfferModel.store, *(getattr(OfferModel, f) for f in _OFFER_FIELDS)).where(
+            OfferModel.set_num.in_({sn for sn, _ in keys}),
+            OfferModel.store.in_({store for _, store in keys}),
+        )
+    ).all()
+    return {
+        (sn, store): dict(zip(_OFFER_FIELDS, values))
+        for sn, store, *values in found
+        if (sn, store) in keys
+    }
+
+
+def _upsert_rows(db: Session, rows: List[Dict[str, Any]], now: datetime) -> Tuple[int, int]:
+    """
+    Write *rows* (distinct (set_num, store) pairs) in one multi-row
+    INSERT ... ON CONFLICT DO UPDATE on the unique (canonical_set_num, store)
+    index. A None price, stock flag or ASIN keeps the stored value.
+
+    The existing offers are read first: price and stock changes are appended
+    to the price history, and the result is (rows inserted, existing rows
+    whose values changed).
+    """
+    stored = _stored_offers(db, rows)
+    record_changes(db, rows, stored, now)
+
+    changed = 0
+    for r in rows:
+        old = stored.get((r["set_num"], r["store"]))
+        if old is not None and any(
+            (r[f] is not None and r[f] != old[f]) if f in _KEEP_IF_NONE else r[f] != old[f]
+            for f in _OFFER_FIELDS
+        ):
+            changed += 1
+
+    stmt = dialect_insert(db)(OfferModel).values(
+        [{**r, "last_checked": now, "created_at": now} for r in rows]
+    )
+    new = stmt.excluded
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[OfferModel.canonical_set_num, OfferModel.store],
+        set_={
+            "price": sa_func.coalesce(new.price, OfferModel.price),
+            "currency": new.currency,
+            "url": new.url,
+            "in_stock": sa_func.coalesce(new.in_stock, OfferModel.in_stock),
+            "asin": sa_func.coalesce(new.asin, OfferModel.asin),
+            "last_checked": new.last_checked,
+        },
+    ))
+    return len(rows) - len(stored), changed
+
+
+def upsert_offer(
+    db: Session,
+    set_num_plain: str,
+    store: str,
+    *,
+    price: Optional[float],
+    currency: str,
+    url: str,
+    in_stock: Optional[bool],
+    asin: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> bool:
+    """
+    Insert or update a single (set, store) offer; see _upsert_rows().
+    Returns True if the row was inserted. Does not commit.
+
+    Pipelines writing many offers use OfferWriter instead.
+    """
+    row = {
+        "set_num": set_num_plain, "store": store, "price": price,
+        "currency": currency, "url": url, "in_stock": in_stock, "asin": asin,
+    }
+    inserted, _ = _upsert_rows(db, [row], now or datetime.now(timezone.utc))
+    return inserted == 1
+
+
+class OfferWriter:
+    """
+    Batched offer ingest for the pipelines.
+
+    add() records an observation; observations of the same (set, store) are
+    merged, a None price/stock/ASIN keeping the earlier value, as the upsert
+    itself does against the stored row. set_retail_price() queues a
+    Set.retail_price write the same way. Every *batch_size* distinct offers,
+    and on each flush(), the batch is written with one multi-row upsert plus
+    the queued retail prices, the touched sets' best prices are refreshed, and
+    the session (including any other pending pipeline changes) is committed.
+
+    Nothing is written between flushes, so a pipeline that sleeps or fetches
+    between sets holds no transaction or row locks while doing so; scrapers
+    flush every few sets to keep each transaction short. If the pipeline
+    fails, flush_after_error() keeps what was gathered before the failure.
+
+        writer = OfferWriter(db)
+        try:
+            for ...:
+                writer.add(plain, "LEGO", price=..., currency="USD", url=..., in_stock=...)
+            writer.flush()
+        except Exception:
+            writer.flush_after_error()
+        stats.update(writer.stats)
+    """
+
+    def __init__(self, db: Session, batch_size: int = 200):
+        self.db = db
+        self.batch_size = batch_size
+        self._pending: Dict[tuple, Dict[str, Any]] = {}
+        self._retail: Dict[str, Tuple[float, str]] = {}
+        self.batches: List[Dict[str, Any]] = []
+
+    def add(
+        self,
+        set_num_plain: str,
+        store: str,
+        *,
+        price: Optional[float],
+        currency: str,
+        url: str,
+        in_stock: Optional[bool],
+        asin: Optional[str] = None,
+    ) -> None:
+        row = {
+            "set_num": set_num_plain, "store": store, "price": price,
+            "currency": currency, "url": url, "in_stock": in_stock, "asin": asin,
+        }
+        key = (set_num_plain, store)
+        prev = self._pending.get(key)
+        if prev is not None:
+            for k in _KEEP_IF_NONE:
+                if row[k] is None:
+                    row[k] = prev[k]
+        self._pending[key] = row
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def set_retail_price(self, set_num: str, price: float, currency: str) -> None:
+        """Queue Set.retail_price/retail_currency for *set_num* (full, e.g. "10305-1")."""
+        self._retail[set_num] = (price, currency)
+
+    def flush(self) -> Optional[Dict[str, Any]]:
+        """Write and commit the pending batch; returns its stats (None if empty)."""
+        if not self._pending and not self._retail:
+            return None
+        rows = list(self._pending.values())
+        retail = dict(self._retail)
+        self._pending.clear()
+        self._retail.clear()
+
+        t0 = time.monotonic()
+        inserted, changed = _upsert_rows(self.db, rows, datetime.now(timezone.utc)) if rows else (0, 0)
+        for set_num, (price, currency) in retail.items():
+            self.db.execute(
+                update(SetModel)
+                .where(SetModel.set_num == set_num)
+                .values(retail_price=price, retail_currency=currency)
+            )
+        refresh_best_prices(self.db, {r["set_num"] for r in rows} | set(retail))
+        self.db.commit()
+
+        batch = {
+            "offers": len(rows),
+            "inserted": inserted,
+            "updated": len(rows) - inserted,
+            "changed": changed,
+            "seconds": round(time.monotonic() - t0, 3),
+        }
+        self.batches.append(batch)
+        return batch
+
+    def flush_after_error(self) -> None:
+        """
+        Roll back a failed pipeline's session, then write the batch still
+        pending. Offers and retail prices are only written by flush(), so the
+        rollback discards none of them. A failure of this write is logged.
+        """
+        self.db.rollback()
+        try:
+            self.flush()
+        except Exception:
+            self.db.rollback()
+            logger.exception("Could not write the pending offer batch")
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        """Totals across flushed batches, plus the batches themselves."""
+        return {
+            "offers_inserted": sum(b["inserted"] for b in self.batches),
+            "offers_updated": sum(b["updated"] for b in self.batches),
+            "offers_changed": sum(b["changed"] for b in self.batches),
+            "offer_batches": list(self.batches),
+        }
+
+
 # ---------------------------------------------------------------------------
 # Batch best-price helpers (for enriching list endpoints)
 # ---------------------------------------------------------------------------
@@ -85,12 +301,12 @@ def best_prices_for_sets(
     Given canonical set_nums (e.g. "10305-1"), return a mapping of
     canonical_set_num → cheapest in-stock offer price.
 
-    Uses a single GROUP BY query for efficiency.
+    Reads the set_best_price table (see app.data.best_prices).
     """
     if not set_nums:
         return {}
 
-    # Build plain → canonical lookup (Offer.set_num stores "10305", not "10305-1")
+    # Build plain → canonical lookup (best prices are kept per "<plain>-1")
     plain_to_canonical: Dict[str, str] = {}
     seen: set[str] = set()
     plain_nums: List[str] = []
@@ -104,23 +320,15 @@ def best_prices_for_sets(
         return {}
 
     rows = db.execute(
-        select(OfferModel.set_num, sa_func.min(OfferModel.price))
-        .where(
-            OfferModel.set_num.in_(plain_nums),
-            OfferModel.price.isnot(None),
-            # Include in-stock (True) and unknown (None), exclude out-of-stock (False)
-            sa_func.coalesce(OfferModel.in_stock, True).is_(True),
-            # Exclude aftermarket sellers (BrickLink) from deal/sale calculations
-            OfferModel.store != "BrickLink",
-        )
-        .group_by(OfferModel.set_num)
+        select(SetBestPrice.set_num, SetBestPrice.best_price)
+        .where(SetBestPrice.set_num.in_([canonical_for(p) for p in plain_nums]))
     ).all()
 
     result: Dict[str, float] = {}
-    for plain_sn, min_price in rows:
-        canonical = plain_to_canonical.get(str(plain_sn))
-        if canonical and min_price is not None:
-            result[canonical] = float(min_price)
+    for best_sn, best_price in rows:
+        canonical = plain_to_canonical.get(_normalize_plain_set_num(str(best_sn)))
+        if canonical and best_price is not None:
+            result[canonical] = float(best_price)
 
     return result
 
@@ -219,5 +427,6 @@ def seed_offers(db: Session) -> int:
         db.add(OfferModel(**o))
         inserted += 1
 
+    refresh_best_prices(db, [o["set_num"] for o in SEED_OFFERS])
     db.commit()
     return inserted
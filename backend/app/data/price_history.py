@@ -0,0 +1,225 @@
+# app/data/price_history.py
+"""
+Offer price history: the offer_price_points log and its rollups.
+
+`offers` holds only the latest observation per (set, store). Before each
+offer upsert, record_changes() compares the incoming price and stock flag
+with the stored ones and appends a point for every offer where either
+changed; unchanged re-scrapes write nothing, so the log grows with price
+movements rather than with scrape frequency.
+
+Each priced point is also folded into offer_price_rollups, one row per
+(set, store, granularity, bucket) holding the bucket's low, high and last
+price, with an INSERT ... ON CONFLICT DO UPDATE per granularity. Charts read
+only the rollups: daily buckets for short ranges, weekly ones beyond
+_MAX_POINTS days, so a series never has more than _MAX_POINTS points.
+
+rebuild_rollups() recomputes the rollups from the points.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from ..db import dialect_insert
+from ..models import OfferPricePoint, OfferPriceRollup
+
+GRANULARITIES = ("day", "week")
+_MAX_POINTS = 120
+
+
+def _floor(day: date, granularity: str) -> date:
+    return day - timedelta(days=day.weekday()) if granularity == "week" else day
+
+
+def bucket_for(at: datetime, granularity: str) -> date:
+    """The UTC day of *at*, or the Monday starting its week."""
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc)
+    return _floor(at.date(), granularity)
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+
+def record_changes(
+    db: Session,
+    rows: List[Dict[str, Any]],
+    stored: Dict[Tuple[str, str], Dict[str, Any]],
+    now: datetime,
+) -> int:
+    """
+    Append a point for each offer in *rows* (distinct (set_num, store) pairs
+    about to be upserted) whose price or stock flag differs from its *stored*
+    values (keyed by (set_num, store); absent for new offers), and fold the
+    priced ones into the rollups. A None value keeps the stored one, as in the
+    upsert. Returns the number of points; does not commit.
+    """
+    if not rows:
+        return 0
+
+    points: List[Dict[str, Any]] = []
+    for r in rows:
+        old = stored.get((r["set_num"], r["store"])) or {}
+        old_price, old_stock = old.get("price"), old.get("in_stock")
+        price = r["price"] if r["price"] is not None else old_price
+        in_stock = r["in_stock"] if r["in_stock"] is not None else old_stock
+        if (price, in_stock) != (old_price, old_stock):
+            points.append({
+                "set_num": r["set_num"],
+                "store": r["store"],
+                "price": price,
+                "in_stock": in_stock,
+                "recorded_at": now,
+            })
+    if not points:
+        return 0
+
+    db.execute(insert(OfferPricePoint), points)
+    _fold(db, [p for p in points if p["price"] is not None])
+    return len(points)
+
+
+def _fold(db: Session, points: List[Dict[str, Any]]) -> None:
+    """Merge *points* (at most one per (set, store)) into each granularity's buckets."""
+    if not points:
+        return
+    for granularity in GRANULARITIES:
+        stmt = dialect_insert(db)(OfferPriceRollup).values([
+            {
+                "set_num": p["set_num"],
+                "store": p["store"],
+                "granularity": granularity,
+                "bucket": bucket_for(p["recorded_at"], granularity),
+                "low": p["price"],
+                "high": p["price"],
+                "last": p["price"],
+                "last_at": p["recorded_at"],
+                "points": 1,
+            }
+            for p in points
+        ])
+        new = stmt.excluded
+        is_later = new.last_at >= OfferPriceRollup.last_at
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[
+                OfferPriceRollup.set_num,
+                OfferPriceRollup.store,
+                OfferPriceRollup.granularity,
+                OfferPriceRollup.bucket,
+            ],
+            set_={
+                "low": case((new.low < OfferPriceRollup.low, new.low), else_=OfferPriceRollup.low),
+                "high": case((new.high > OfferPriceRollup.high, new.high), else_=OfferPriceRollup.high),
+                "last": case((is_later, new.last), else_=OfferPriceRollup.last),
+                "last_at": case((is_later, new.last_at), else_=OfferPriceRollup.last_at),
+                "points": OfferPriceRollup.points + 1,
+            },
+        ))
+
+
+def rebuild_rollups(db: Session) -> int:
+    """Recompute every rollup from offer_price_points. Commits; returns the number of rows."""
+    buckets: Dict[Tuple[str, str, str, date], Dict[str, Any]] = {}
+    for sn, store, price, at in db.execute(
+        select(OfferPricePoint.set_num, OfferPricePoint.store, OfferPricePoint.price, OfferPricePoint.recorded_at)
+        .where(OfferPricePoint.price.isnot(None))
+        .order_by(OfferPricePoint.recorded_at, OfferPricePoint.id)
+    ).all():
+        for granularity in GRANULARITIES:
+            key = (sn, store, granularity, bucket_for(at, granularity))
+            b = buckets.get(key)
+            if b is None:
+                buckets[key] = {
+                    "set_num": sn, "store": store, "granularity": granularity, "bucket": key[3],
+                    "low": price, "high": price, "last": price, "last_at": at, "points": 1,
+                }
+            else:
+                b.update(low=min(b["low"], price), high=max(b["high"], price), last=price, last_at=at)
+                b["points"] += 1
+
+    db.execute(delete(OfferPriceRollup))
+    if buckets:
+        db.execute(insert(OfferPriceRollup), list(buckets.values()))
+    db.commit()
+    return len(buckets)
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+
+
+def price_history(
+    db: Session,
+    set_num_plain: str,
+    days: int,
+    stores: Optional[Iterable[str]] = None,
+    today: Optional[date] = None,
+) -> Dict[str, Any]:
+    """
+    Per-store low/high/close series over the last *days* days, from the
+    daily rollups, or the weekly ones when that would exceed _MAX_POINTS.
+    Each series starts with the bucket in force at the start of the range
+    (carried over from before it, if the price did not change within it).
+    """
+    granularity = "day" if days <= _MAX_POINTS else "week"
+    today = today or datetime.now(timezone.utc).date()
+    start = _floor(today - timedelta(days=days - 1), granularity)
+
+    scope = [
+        OfferPriceRollup.set_num == set_num_plain,
+        OfferPriceRollup.granularity == granularity,
+    ]
+    if stores is not None:
+        scope.append(OfferPriceRollup.store.in_(list(stores)))
+
+    # The latest bucket before the range, per store, for the opening price.
+    before = (
+        select(OfferPriceRollup.store, func.max(OfferPriceRollup.bucket).label("bucket"))
+        .where(*scope, OfferPriceRollup.bucket < start)
+        .group_by(OfferPriceRollup.store)
+        .subquery()
+    )
+    opening = db.execute(
+        select(OfferPriceRollup)
+        .join(before, (before.c.store == OfferPriceRollup.store) & (before.c.bucket == OfferPriceRollup.bucket))
+        .where(*scope)
+    ).scalars().all()
+    within = db.execute(
+        select(OfferPriceRollup)
+        .where(*scope, OfferPriceRollup.bucket >= start, OfferPriceRollup.bucket <= _floor(today, granularity))
+        .order_by(OfferPriceRollup.store, OfferPriceRollup.bucket)
+    ).scalars().all()
+
+    series: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for r in within:
+        series[r.store].append({"date": r.bucket.isoformat(), "low": r.low, "high": r.high, "close": r.last})
+    for points in series.values():
+        del points[:-_MAX_POINTS]
+    for r in opening:
+        points = series[r.store]
+        if not points or points[0]["date"] != start.isoformat():
+            # The price carried into the range from before it, in front of
+            # at most _MAX_POINTS - 1 bucketed points.
+            del points[:-(_MAX_POINTS - 1)]
+            points.insert(0, {"date": start.isoformat(), "low": r.last, "high": r.last, "close": r.last})
+
+    return {
+        "granularity": granularity,
+        "start": start.isoformat(),
+        "series": [
+            {
+                "store": store,
+                "low": min(p["low"] for p in points),
+                "points": points,
+            }
+            for store, points in sorted(series.items())
+        ],
+    }
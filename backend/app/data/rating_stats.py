@@ -0,0 +1,147 @@
+# app/data/rating_stats.py
+"""
+Maintenance of the set_rating_stats aggregate table.
+
+Every write to `reviews` calls apply_review_change() before committing, so a
+set's rating sum, counts and histogram move in the same transaction as the
+review itself. Deltas are applied as `col = col + n` in SQL, which keeps
+concurrent writers to the same set correct without a read-modify-write.
+
+histograms_for() reads the half-star histograms of many sets in one query.
+
+rebuild_rating_stats() recomputes the whole table from `reviews`; it is what
+the migration backfill does and serves as a consistency repair.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import RATING_BUCKETS
+from ..models import Review as ReviewModel
+from ..models import SetRatingStats
+
+# (rating, text) of one review before or after a write; None if there is none.
+ReviewState = Optional[Tuple[Any, Optional[str]]]
+
+HIST_COLUMNS = tuple(f"hist_{b}" for b in RATING_BUCKETS)
+
+
+# API labels of the buckets, as the frontend RatingHistogram bins them.
+HIST_KEYS = tuple(f"{int(b) / 10:.1f}" for b in RATING_BUCKETS)
+
+
+def _half_stars(rating: Any) -> int:
+    return min(max(int(round(float(rating) * 2)), 1), len(HIST_COLUMNS))
+
+
+def bucket_column(rating: Any) -> str:
+    """Histogram column for a rating (nearest half star)."""
+    return HIST_COLUMNS[_half_stars(rating) - 1]
+
+
+def histogram_key(rating: Any) -> str:
+    """Histogram label for a rating: "0.5" ... "5.0"."""
+    return HIST_KEYS[_half_stars(rating) - 1]
+
+
+def empty_histogram() -> Dict[str, int]:
+    return dict.fromkeys(HIST_KEYS, 0)
+
+
+def histogram(stats: Optional[SetRatingStats]) -> Dict[str, int]:
+    """Half-star counts of a set_rating_stats row; all zeros for None."""
+    out = empty_histogram()
+    if stats is not None:
+        for key, col in zip(HIST_KEYS, HIST_COLUMNS):
+            out[key] = int(getattr(stats, col) or 0)
+    return out
+
+
+def histograms_for(db: Session, set_nums: Iterable[str]) -> Dict[str, Dict[str, int]]:
+    """set_num -> histogram for each of *set_nums* (zeros for sets without ratings)."""
+    wanted = set(set_nums)
+    out = {sn: empty_histogram() for sn in wanted}
+    if wanted:
+        rows = db.execute(select(SetRatingStats).where(SetRatingStats.set_num.in_(wanted))).scalars()
+        for stats in rows:
+            out[stats.set_num] = histogram(stats)
+    return out
+
+
+def _contribution(state: ReviewState) -> Dict[str, float]:
+    if state is None:
+        return {}
+    rating, text = state
+    out: Dict[str, float] = {}
+    if rating is not None:
+        out["rating_sum"] = float(rating)
+        out["rating_count"] = 1
+        out[bucket_column(rating)] = 1
+    if text is not None and text.strip():
+        out["review_count"] = 1
+    return out
+
+
+def apply_review_change(db: Session, set_num: str, before: ReviewState, after: ReviewState) -> bool:
+    """
+    Add the difference between a review's *before* and *after* state to the
+    set's aggregate row, creating the row if needed. Does not commit.
+
+    Returns True if the aggregates changed.
+    """
+    delta = _contribution(after)
+    for col, v in _contribution(before).items():
+        delta[col] = delta.get(col, 0) - v
+    delta = {col: v for col, v in delta.items() if v}
+    if not delta:
+        return False
+
+    increments = {col: getattr(SetRatingStats, col) + v for col, v in delta.items()}
+    stmt = update(SetRatingStats).where(SetRatingStats.set_num == set_num).values(**increments)
+    if db.execute(stmt).rowcount:
+        return True
+    try:
+        with db.begin_nested():
+            db.execute(insert(SetRatingStats).values(set_num=set_num, **delta))
+    except IntegrityError:
+        # Another writer created the row between our UPDATE and INSERT.
+        db.execute(stmt)
+    return True
+
+
+def review_state(review: Optional[ReviewModel]) -> ReviewState:
+    """Snapshot of the fields that feed the aggregates."""
+    if review is None:
+        return None
+    return (review.rating, review.text)
+
+
+def _aggregate_select():
+    has_text = (ReviewModel.text.is_not(None)) & (func.length(func.trim(ReviewModel.text)) > 0)
+    hist = [
+        func.sum(case((ReviewModel.rating == int(b) / 10, 1), else_=0)).label(col)
+        for b, col in zip(RATING_BUCKETS, HIST_COLUMNS)
+    ]
+    return (
+        select(
+            ReviewModel.set_num,
+            func.coalesce(func.sum(ReviewModel.rating), 0).label("rating_sum"),
+            func.count(ReviewModel.rating).label("rating_count"),
+            func.sum(case((has_text, 1), else_=0)).label("review_count"),
+            *hist,
+        )
+        .group_by(ReviewModel.set_num)
+    )
+
+
+def rebuild_rating_stats(db: Session) -> int:
+    """Recompute every row from `reviews`. Commits; returns the number of sets."""
+    cols = ["set_num", "rating_sum", "rating_count", "review_count", *HIST_COLUMNS]
+    db.execute(delete(SetRatingStats))
+    db.execute(insert(SetRatingStats).from_select(cols, _aggregate_select()))
+    db.commit()
+    return int(db.execute(select(func.count()).select_from(SetRatingStats)).scalar_one())
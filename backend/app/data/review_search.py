@@ -0,0 +1,41 @@
+# app/data/review_search.py
+"""
+Full-text search over review text.
+
+On Postgres, reviews.search_vector is a stored generated column,
+to_tsvector('english', text), with a GIN index. The database recomputes it
+on every review insert and update, so writers need no extra step. Queries
+match it against websearch_to_tsquery() and rank with ts_rank().
+
+The column isn't mapped on the Review model: SQLite (tests, local dev) has
+no tsvector, so there searches fall back to a case-insensitive substring
+match of every term, all ranked 0.
+"""
+from __future__ import annotations
+
+from typing import Any, Tuple
+
+from sqlalchemy import Float, and_, func, literal, literal_column
+from sqlalchemy.orm import Session
+
+from ..models import Review as ReviewModel
+
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+search_vector = literal_column("reviews.search_vector")
+
+
+def _like_escape(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def match_and_rank(db: Session, q: str) -> Tuple[Any, Any]:
+    """(WHERE clause matching reviews for *q*, rank expression; higher is better)."""
+    if db.get_bind().dialect.name == "postgresql":
+        query = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        return search_vector.op("@@")(query), func.ts_rank(search_vector, query)
+
+    text = func.lower(ReviewModel.text)
+    terms = q.lower().split()
+    match = and_(*(text.like(f"%{_like_escape(t)}%", escape="\\") for t in terms))
+    return match, literal(0.0, Float)
@@ -0,0 +1,98 @@
+# app/data/review_votes.py
+"""
+Maintenance of the vote counters on `reviews`.
+
+Every write to `review_votes` calls apply_vote_change() before committing,
+so reviews.upvotes / downvotes move in the same transaction as the vote.
+The counters are bumped in SQL (`col = col + n`), and helpful_score is then
+recomputed from the values the row holds after the bump. Listings sort by
+helpful_score through an index instead of aggregating votes per request.
+
+rebuild_vote_counts() recomputes every review from `review_votes`; the
+migration backfill uses the same logic and it doubles as a repair.
+"""
+from __future__ import annotations
+
+import math
+from typing import Dict, Optional
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import Session
+
+from ..models import Review as ReviewModel
+from ..models import ReviewVote as ReviewVoteModel
+
+_Z = 1.96  # 95% confidence
+
+_COLUMNS = {"up": "upvotes", "down": "downvotes"}
+
+
+def wilson_lower_bound(up: int, down: int) -> float:
+    """Lower bound of the Wilson score interval for the share of upvotes."""
+    n = up + down
+    if n <= 0:
+        return 0.0
+    p = up / n
+    z2 = _Z * _Z
+    centre = p + z2 / (2 * n)
+    spread = _Z * math.sqrt((p * (1 - p) + z2 / (4 * n)) / n)
+    return (centre - spread) / (1 + z2 / n)
+
+
+def apply_vote_change(db: Session, review_id: int, before: Optional[str], after: Optional[str]) -> bool:
+    """
+    Move the review's counters from vote *before* to vote *after* ("up",
+    "down" or None) and refresh its helpful_score. Does not commit.
+
+    Returns True if the counters changed.
+    """
+    if before == after:
+        return False
+    delta: Dict[str, int] = {}
+    if before is not None:
+        delta[_COLUMNS[before]] = -1
+    if after is not None:
+        delta[_COLUMNS[after]] = delta.get(_COLUMNS[after], 0) + 1
+
+    increments = {col: getattr(ReviewModel, col) + v for col, v in delta.items()}
+    db.execute(
+        update(ReviewModel)
+        .where(ReviewModel.id == review_id)
+        .values(**increments)
+        .execution_options(synchronize_session=False)
+    )
+    row = db.execute(
+        select(ReviewModel.upvotes, ReviewModel.downvotes).where(ReviewModel.id == review_id)
+    ).one_or_none()
+    if row is None:
+        return False
+    up, down = int(row.upvotes), int(row.downvotes)
+    # Only write the score if the counters are still the ones it was computed
+    # from; a writer that moved them since writes its own score.
+    db.execute(
+        update(ReviewModel)
+        .where(ReviewModel.id == review_id, ReviewModel.upvotes == up, ReviewModel.downvotes == down)
+        .values(helpful_score=wilson_lower_bound(up, down))
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+def rebuild_vote_counts(db: Session) -> int:
+    """Recompute counters and scores of every review. Commits; returns the number of reviews with votes."""
+    rows = db.execute(
+        select(
+            ReviewVoteModel.review_id,
+            func.count(case((ReviewVoteModel.vote_type == "up", 1))),
+            func.count(case((ReviewVoteModel.vote_type == "down", 1))),
+        ).group_by(ReviewVoteModel.review_id)
+    ).all()
+    db.execute(update(ReviewModel).values(upvotes=0, downvotes=0, helpful_score=0.0))
+    for review_id, up, down in rows:
+        db.execute(
+            update(ReviewModel)
+            .where(ReviewModel.id == review_id)
+            .values(upvotes=up, downvotes=down, helpful_score=wilson_lower_bound(up, down))
+        )
+    db.commit()
+    return len(rows)
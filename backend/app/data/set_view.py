@@ -0,0 +1,169 @@
+# app/data/set_view.py
+"""
+In-memory materialized view of the `sets` table.
+
+The JSON catalog (app.data.sets) carries the Rebrickable fields; prices,
+retirement status, tags, launch dates and the Brickset enrichment live in
+the DB. SetView loads every Set row in one query, keeps each as a plain dict
+keyed by canonical set_num, and precomputes the lookups and orderings the
+/sets endpoints need, so request handlers hydrate sets from memory.
+
+Writers that touch a few sets (admin edits) publish their set_nums on the
+SETS change feed and the next reader re-reads only those rows. Bulk writers
+(pipelines, startup scrapes, cache syncs) call invalidate_set_view() and the
+next reader reloads everything. The TTL is a safety net for writes made by
+another process (e.g. a different gunicorn worker), and is shortened when
+several workers serve (see app.core.change_feed.sweep_interval).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..core.change_feed import SETS, feed, sweep_interval
+from ..models import Set as SetModel
+
+# Columns copied into the view. Internal bookkeeping (first_seen_at,
+# created_at, admin_locked_fields) stays in the DB.
+VIEW_FIELDS = (
+    "set_num", "name", "year", "theme", "pieces", "image_url", "ip",
+    "retail_price", "retail_currency",
+    "description", "subtheme", "minifigs", "age_min", "age_max",
+    "dimensions_height", "dimensions_width", "dimensions_depth", "weight_kg",
+    "launch_date", "exit_date", "retirement_status", "retirement_date",
+    "lego_com_coming_soon", "set_tag",
+)
+
+_VIEW_TTL = sweep_interval(300)  # seconds
+
+
+class SetView:
+    """Immutable snapshot of the sets table plus derived lookups."""
+
+    def __init__(self, rows: List[Dict[str, Any]], version: int, feed_version: int = 0) -> None:
+        self.version = version
+        self.feed_version = feed_version  # SETS change-feed version reflected here
+        self.rows: Dict[str, Dict[str, Any]] = {r["set_num"]: r for r in rows}
+
+        # The dicts below keep their identity for the lifetime of the view, so
+        # SetCatalog.scatter() memoizes the columns built from them.
+        self.prices: Dict[str, float] = {
+            sn: float(r["retail_price"])
+            for sn, r in self.rows.items()
+            if r["retail_price"] is not None and r["retail_price"] > 0
+        }
+        self.tags: Dict[str, str] = {sn: r["set_tag"] for sn, r in self.rows.items() if r["set_tag"]}
+
+        # retirement_status as small ints for vectorized filtering.
+        self.status_codes: Dict[str, int] = {}
+        self.status_by_set: Dict[str, int] = {}
+        for sn, r in self.rows.items():
+            status = r["retirement_status"]
+            if status is not None:
+                self.status_by_set[sn] = self.status_codes.setdefault(status, len(self.status_codes))
+
+        # Orderings used by /new, /retiring and /coming-soon (NULLs last).
+        launched = [r for r in self.rows.values() if r["launch_date"]]
+        launched.sort(key=lambda r: r["set_num"])
+        launched.sort(key=lambda r: r["launch_date"], reverse=True)
+        self.by_launch_desc: List[Dict[str, Any]] = launched
+
+        self.retiring: List[Dict[str, Any]] = sorted(
+            (r for r in self.rows.values() if r["retirement_status"] == "retiring_soon"),
+            key=lambda r: (r["retirement_date"] is None, r["retirement_date"] or "", r["name"] or ""),
+        )
+        self.coming_soon: List[Dict[str, Any]] = sorted(
+            (r for r in self.rows.values() if r["lego_com_coming_soon"]),
+            key=lambda r: (r["launch_date"] is None, r["launch_date"] or "", r["name"] or ""),
+        )
+
+    def get(self, set_num: str) -> Optional[Dict[str, Any]]:
+        return self.rows.get(set_num)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+_view_lock = threading.Lock()
+_build_lock = threading.Lock()
+_view_state: Dict[str, Any] = {"ts": float("-inf"), "val": None, "version": 0, "dirty": 0}
+
+
+def invalidate_set_view() -> None:
+    """Call after anything writes to the sets table; the next read rebuilds."""
+    with _view_lock:
+        _view_state["ts"] = float("-inf")
+        _view_state["dirty"] += 1
+
+
+def _load_rows(db: Session, set_nums: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+    cols = [getattr(SetModel, f) for f in VIEW_FIELDS]
+    q = select(*cols)
+    if set_nums is not None:
+        q = q.where(SetModel.set_num.in_(set_nums))
+    return [dict(zip(VIEW_FIELDS, r)) for r in db.execute(q).all()]
+
+
+def set_view(db: Session) -> SetView:
+    """
+    Return the current SetView, bringing it up to date first if needed.
+
+    Single-set writes arrive through the SETS change feed and are applied by
+    re-reading just those rows; bulk writers call invalidate_set_view() and
+    the view is reloaded in full, as it is every _VIEW_TTL seconds.
+
+    Only one thread updates at a time. Meanwhile other readers keep getting
+    the previous view; they only wait when there is none yet.
+    """
+    def current(state: Dict[str, Any]) -> bool:
+        val = state["val"]
+        return (
+            val is not None
+            and time.monotonic() - state["ts"] < _VIEW_TTL
+            and val.feed_version == feed.version(SETS)
+        )
+
+    with _view_lock:
+        view = _view_state["val"]
+        if current(_view_state):
+            return view
+
+    if not _build_lock.acquire(blocking=view is None):
+        return view
+    try:
+        with _view_lock:
+            # Another thread may have finished an update while we waited.
+            if current(_view_state):
+                return _view_state["val"]
+            base = _view_state["val"]
+            # Read the version first: keys published after it are re-applied
+            # next time, which is harmless; the reverse would lose them.
+            feed_version = feed.version(SETS)
+            changed = None
+            if base is not None and time.monotonic() - _view_state["ts"] < _VIEW_TTL:
+                changed = feed.since(SETS, base.feed_version)
+            started = time.monotonic() if changed is None else _view_state["ts"]
+            dirty = _view_state["dirty"]
+            version = _view_state["version"] + 1
+
+        if changed is None:
+            rows = _load_rows(db)
+        else:
+            patched = {sn: r for sn, r in base.rows.items() if sn not in changed}
+            patched.update((r["set_num"], r) for r in _load_rows(db, changed))
+            rows = list(patched.values())
+        fresh = SetView(rows, version, feed_version)
+
+        with _view_lock:
+            _view_state["val"] = fresh
+            _view_state["version"] = version
+            # An invalidation that landed mid-build leaves the view stale so
+            # the next reader picks the change up.
+            _view_state["ts"] = started if _view_state["dirty"] == dirty else float("-inf")
+        return fresh
+    finally:
+        _build_lock.release()
@@ -7,39 +7,24 @@ Handles fetching LEGO sets from the Rebrickable API and caching them locally.
 - Looks up theme names via /api/v3/lego/themes/ and stores them
 - Saves a simplified copy to sets_cache.json for faster local access
 - Provides helpers for loading and looking up cached sets
+
+sets_cache.json is the only cache format. Gunicorn workers share the loaded
+catalog copy-on-write because app.core.preload loads it before the fork, so
+there is no separate memory-mapped snapshot: every consumer walks the full
+row dicts, and a mapped file would still be decoded into rows per worker.
 """
 
 from ..core.env import get_env
+from .catalog import catalog_for
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
 import json
+import os
 import threading
 import time
 import requests
 
-# ----- Simple TTL Cache -----
-
-def _mem_cache(ttl: float = 300):
-    """Decorator: caches a no-arg function result in memory for *ttl* seconds."""
-    lock = threading.Lock()
-    state: dict = {"ts": 0.0, "val": None}
-
-    def decorator(fn):
-        def wrapper():
-            now = time.monotonic()
-            with lock:
-                if now - state["ts"] < ttl and state["val"] is not None:
-                    return state["val"]
-            result = fn()
-            with lock:
-                state["ts"] = time.monotonic()
-                state["val"] = result
-            return result
-        wrapper.cache_clear = lambda: state.update(ts=0.0, val=None)
-        return wrapper
-    return decorator
-
 
 # ----- Paths / Constants -----
 CACHE_FILE = Path(__file__).with_name("sets_cache.json")
@@ -159,8 +144,14 @@ def _map_set(item: Dict[str, Any], theme_map: Dict[int, str]) -> Dict[str, Any]:
 
 
 def _save_cache(rows: List[Dict[str, Any]]) -> None:
-    """Save all sets to the JSON cache."""
-    CACHE_FILE.write_text(json.dumps(rows, indent=2, ensure_ascii=False))
+    """Save all sets to the JSON cache.
+
+    Written to a temp file and renamed over the cache, so a concurrent
+    reload never sees a half-written file.
+    """
+    tmp = CACHE_FILE.with_name(CACHE_FILE.name + ".tmp")
+    tmp.write_text(json.dumps(rows, indent=2, ensure_ascii=False))
+    os.replace(tmp, CACHE_FILE)
 
 
 # ===== Public functions =====
@@ -202,29 +193,98 @@ def fetch_all_lego_sets(page_size: int = 1000, throttle: float = 0.2) -> List[Di
 
     _save_cache(all_sets)
     print(f"✅ Saved {len(all_sets)} sets → {CACHE_FILE}")
+    reload_cached_sets()
     return all_sets
 
 
-def load_cached_sets() -> List[Dict[str, Any]]:
-    """Load cached sets from sets_cache.json (or empty list if missing).
+# ----- In-memory snapshot (stale-while-revalidate) -----
 
-    Results are cached in memory for 10 minutes to avoid repeated disk I/O.
-    """
-    return _load_cached_sets_inner()
+# How often the cache file is stat()ed for changes. Requests never wait for
+# this: a stale snapshot keeps being served while one background thread
+# re-checks the file and, only if it changed, reparses and swaps it in.
+_RECHECK_SECONDS = 60
 
+_load_lock = threading.Lock()          # single-flight for (re)loads
+_refresh_started = threading.Lock()    # held while a background refresh runs
 
-@_mem_cache(ttl=600)
-def _load_cached_sets_inner() -> List[Dict[str, Any]]:
-    if not CACHE_FILE.exists():
+# (path, (mtime_ns, size) or None, monotonic time of last check, rows)
+_snapshot: Optional[tuple] = None
+
+
+def _file_stamp(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_cache_file(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
         print("⚠️ Cache not found — run fetch_all_lego_sets() first.")
         return []
     try:
-        return json.loads(CACHE_FILE.read_text())
+        return json.loads(path.read_text())
     except json.JSONDecodeError:
         print("⚠️ Cache corrupted — returning empty list.")
         return []
 
 
+def _reload_snapshot(path: Path) -> List[Dict[str, Any]]:
+    """Re-stat *path* and reparse it only if it changed. Caller holds _load_lock."""
+    global _snapshot
+    stamp = _file_stamp(path)
+    snap = _snapshot
+    if snap is not None and snap[0] == path and snap[1] == stamp:
+        rows = snap[3]
+    else:
+        rows = _read_cache_file(path)
+        # Build the indexes before publishing so no request pays for them.
+        catalog = catalog_for(rows)
+        catalog.trigram_index()
+        catalog.theme_index()
+    _snapshot = (path, stamp, time.monotonic(), rows)
+    return rows
+
+
+def _background_refresh() -> None:
+    try:
+        with _load_lock:
+            _reload_snapshot(CACHE_FILE)
+    except Exception as e:
+        print(f"⚠️ Set cache refresh failed: {e}")
+    finally:
+        _refresh_started.release()
+
+
+def reload_cached_sets() -> List[Dict[str, Any]]:
+    """Synchronously re-check sets_cache.json and return the current snapshot."""
+    with _load_lock:
+        return _reload_snapshot(CACHE_FILE)
+
+
+def load_cached_sets() -> List[Dict[str, Any]]:
+    """Load cached sets from sets_cache.json (or empty list if missing).
+
+    The parsed list is kept in memory. Only the very first call (or a call
+    after CACHE_FILE is repointed) reads the file inline; afterwards the file
+    is re-checked in the background every _RECHECK_SECONDS and an unchanged
+    file is never reparsed.
+    """
+    path = CACHE_FILE
+    snap = _snapshot
+    if snap is None or snap[0] != path:
+        with _load_lock:
+            snap = _snapshot
+            if snap is None or snap[0] != path:
+                return _reload_snapshot(path)
+        return snap[3]
+
+    if time.monotonic() - snap[2] >= _RECHECK_SECONDS and _refresh_started.acquire(blocking=False):
+        threading.Thread(target=_background_refresh, name="sets-cache-refresh", daemon=True).start()
+    return snap[3]
+
+
 def cache_count() -> int:
     """Return how many sets are currently cached."""
     return len(load_cached_sets())
@@ -234,17 +294,10 @@ def get_set_by_num(set_num: str) -> Optional[Dict[str, Any]]:
     """
     Look up a single LEGO set by full or plain set number (e.g. '10305' or '10305-1').
     Returns the matching dict or None if not found.
+
+    Uses a hash index built once per catalog load (see app.data.catalog).
     """
-    sets = load_cached_sets()
-    set_num = set_num.strip().lower()
-
-    for s in sets:
-        if (
-            (s.get("set_num") or "").lower() == set_num
-            or (s.get("set_num_plain") or "").lower() == set_num
-        ):
-            return s
-    return None
+    return catalog_for(load_cached_sets()).get(set_num)
 
 
 # ===== Manual Testing (Terminal entrypoint) =====
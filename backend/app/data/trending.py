@@ -0,0 +1,182 @@
+# app/data/trending.py
+"""
+Time-decayed trending score per set (the set_trending table).
+
+Each event on a set (a new review, an owned or wishlist add, an affiliate
+click) adds its weight to the set's score, and every contribution halves
+each HALF_LIFE. Decaying every row as time passes would mean rewriting the
+whole table, so instead an event at time t adds
+
+    weight * 2 ** ((t - EPOCH) / HALF_LIFE)
+
+Later events count exponentially more, so ordering by the stored value is
+ordering by the decayed score. The decayed score itself is the stored value
+times 2 ** (-(now - EPOCH) / HALF_LIFE). A float holds the factor for about
+twenty years past EPOCH.
+
+Write paths call record_event() before committing. It updates one row as
+`score = score + n` in SQL, in the same transaction as the event itself.
+top_sets() serves the top of the table from a per-process snapshot that is
+refreshed every _TOP_TTL seconds.
+
+rebuild_trending() recomputes the table from reviews, system list items and
+affiliate clicks; the migration backfill does the same in SQL.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import AffiliateClick
+from ..models import List as ListModel
+from ..models import ListItem as ListItemModel
+from ..models import Review as ReviewModel
+from ..models import Set as SetModel
+from ..models import SetTrending
+
+HALF_LIFE = timedelta(days=7)
+EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+# Event kind -> weight at the moment it happens.
+WEIGHTS: Dict[str, float] = {
+    "review": 3.0,
+    "owned": 2.0,
+    "wishlist": 1.0,
+    "click": 0.5,
+}
+
+_LOOKBACK = timedelta(days=90)  # rebuild skips older events (< 2**-12 of their weight left)
+_TOP_K = 100
+_TOP_TTL = 60  # seconds
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def growth(at: datetime) -> float:
+    """Factor an event at *at* is stored with (see the module docstring)."""
+    if at.tzinfo is None:
+        at = at.replace(tzinfo=timezone.utc)
+    return 2.0 ** ((at - EPOCH) / HALF_LIFE)
+
+
+def decayed(stored: float, now: Optional[datetime] = None) -> float:
+    """The stored score of a row as of *now*."""
+    return float(stored) / growth(now or _now())
+
+
+def record_event(db: Session, set_num: str, kind: str, at: Optional[datetime] = None) -> None:
+    """
+    Add one event of *kind* on the canonical *set_num* to its score, creating
+    the row if needed. Does not commit.
+    """
+    inc = WEIGHTS[kind] * growth(at or _now())
+    stmt = (
+        update(SetTrending)
+        .where(SetTrending.set_num == set_num)
+        .values(score=SetTrending.score + inc)
+    )
+    if db.execute(stmt).rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(SetTrending).values(set_num=set_num, score=inc))
+    except IntegrityError:
+        # Another writer created the row between our UPDATE and INSERT (or
+        # the set is not in `sets`, and the UPDATE is a no-op).
+        db.execute(stmt)
+
+
+_top_lock = threading.Lock()
+_top_cache: Dict[str, Any] = {"ts": float("-inf"), "val": None}
+
+
+def invalidate_trending() -> None:
+    """Drop this process's snapshot; the next top_sets() re-reads the table."""
+    with _top_lock:
+        _top_cache["ts"] = float("-inf")
+
+
+def top_sets(db: Session, limit: int) -> List[Tuple[str, float]]:
+    """Up to min(limit, _TOP_K) (set_num, decayed score), highest first."""
+    now = time.monotonic()
+    with _top_lock:
+        if now - _top_cache["ts"] < _TOP_TTL and _top_cache["val"] is not None:
+            return _top_cache["val"][:limit]
+
+    rows = db.execute(
+        select(SetTrending.set_num, SetTrending.score)
+        .where(SetTrending.score > 0)
+        .order_by(SetTrending.score.desc(), SetTrending.set_num.asc())
+        .limit(_TOP_K)
+    ).all()
+    scale = growth(_now())
+    val = [(sn, float(score) / scale) for sn, score in rows]
+
+    with _top_lock:
+        _top_cache["ts"] = time.monotonic()
+        _top_cache["val"] = val
+    return val[:limit]
+
+
+def event_set_num(db: Session, set_num: str) -> Optional[str]:
+    """
+    The set an event on *set_num* counts towards: *set_num* itself if it is a
+    set, else the "-1" variant of a plain number, else None. rebuild_trending()
+    and the migration backfill apply the same rule.
+    """
+    for sn in (set_num, f"{set_num}-1"):
+        if db.get(SetModel, sn) is not None:
+            return sn
+    return None
+
+
+def rebuild_trending(db: Session, now: Optional[datetime] = None) -> int:
+    """Recompute every row from the event tables. Commits; returns the number of sets."""
+    cutoff = (now or _now()) - _LOOKBACK
+    known = set(db.execute(select(SetModel.set_num)).scalars())
+
+    events: List[Tuple[str, str, datetime]] = []
+    events += [
+        (sn, "review", at)
+        for sn, at in db.execute(
+            select(ReviewModel.set_num, ReviewModel.created_at).where(ReviewModel.created_at >= cutoff)
+        ).all()
+    ]
+    events += db.execute(
+        select(ListItemModel.set_num, ListModel.system_key, ListItemModel.created_at)
+        .join(ListModel, ListModel.id == ListItemModel.list_id)
+        .where(
+            ListModel.is_system.is_(True),
+            ListModel.system_key.in_(["owned", "wishlist"]),
+            ListItemModel.created_at >= cutoff,
+        )
+    ).all()
+    events += [
+        (sn, "click", at)
+        for sn, at in db.execute(
+            select(AffiliateClick.set_num, AffiliateClick.created_at).where(AffiliateClick.created_at >= cutoff)
+        ).all()
+    ]
+
+    scores: Dict[str, float] = defaultdict(float)
+    for sn, kind, at in events:
+        # Older reviews and clicks may carry the plain number ("10305").
+        canonical = sn if sn in known else f"{sn}-1"
+        if canonical in known:
+            scores[canonical] += WEIGHTS[kind] * growth(at)
+
+    db.execute(delete(SetTrending))
+    if scores:
+        db.execute(insert(SetTrending), [{"set_num": sn, "score": v} for sn, v in scores.items()])
+    db.commit()
+    invalidate_trending()
+    return len(scores)
@@ -4,7 +4,7 @@ from pathlib import Path
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
-from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
 
 # Load backend/.env no matter where uvicorn is run from (local dev)
 ENV_PATH = Path(__file__).resolve().parents[1] / ".env"  # backend/.env
@@ -58,4 +58,16 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def dialect_insert(db: Session):
+    """
+    The `insert` construct of *db*'s dialect, for INSERT ... ON CONFLICT.
+    Production runs Postgres; the test suite runs SQLite.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
@@ -63,8 +63,11 @@ def _ensure_columns():
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     import threading
-    from app.core.scheduler import start_scheduler, shutdown_scheduler
-    start_scheduler()
+    from app.core.scheduler import acquire_job_leadership, start_scheduler, shutdown_scheduler
+    from app.data.set_view import invalidate_set_view
+    runs_jobs = acquire_job_leadership()
+    if runs_jobs:
+        start_scheduler()
     _ensure_columns()
 
     # Run startup pipelines in background threads to not block the app
@@ -77,6 +80,7 @@ async def lifespan(app: FastAPI):
             result = run_retirement_scrape()
             logger.info("Startup retirement scrape result: %s", result)
             print(f"[STARTUP] Retirement scrape done: {result}", flush=True)
+            invalidate_set_view()
         except Exception as e:
             logging.getLogger("bricktrack.startup").exception("Startup retirement scrape failed")
             print(f"[STARTUP] Retirement scrape FAILED: {e}", flush=True)
@@ -90,6 +94,7 @@ async def lifespan(app: FastAPI):
             result = run_brickset_sync()
             logger.info("Startup Brickset sync result: %s", result)
             print(f"[STARTUP] Brickset sync done: {result}", flush=True)
+            invalidate_set_view()
         except Exception as e:
             logging.getLogger("bricktrack.startup").exception("Startup Brickset sync failed")
             print(f"[STARTUP] Brickset sync FAILED: {e}", flush=True)
@@ -103,13 +108,19 @@ async def lifespan(app: FastAPI):
             result = run_coming_soon_scrape()
             logger.info("Startup coming-soon scrape result: %s", result)
             print(f"[STARTUP] Coming-soon scrape done: {result}", flush=True)
+            invalidate_set_view()
         except Exception as e:
             logging.getLogger("bricktrack.startup").exception("Startup coming-soon scrape failed")
             print(f"[STARTUP] Coming-soon scrape FAILED: {e}", flush=True)
 
-    threading.Thread(target=_startup_scrape, daemon=True).start()
-    threading.Thread(target=_startup_brickset_sync, daemon=True).start()
-    threading.Thread(target=_startup_coming_soon, daemon=True).start()
+    # Parse the set catalog and build its indexes before the first request
+    from app.data.sets import reload_cached_sets
+    threading.Thread(target=reload_cached_sets, daemon=True).start()
+
+    if runs_jobs:
+        threading.Thread(target=_startup_scrape, daemon=True).start()
+        threading.Thread(target=_startup_brickset_sync, daemon=True).start()
+        threading.Thread(target=_startup_coming_soon, daemon=True).start()
 
     yield
     shutdown_scheduler()
@@ -217,7 +228,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PATCH", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
-    expose_headers=["X-Total-Count"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor"],
 )
 
 
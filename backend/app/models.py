@@ -8,6 +8,7 @@ from sqlalchemy import (
     String,
     Integer,
     Text,
+    Date,
     DateTime,
     ForeignKey,
     Numeric,
@@ -17,6 +18,7 @@ from sqlalchemy import (
     Index,
     Boolean,
     Float,
+    Computed,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -147,6 +149,15 @@ class Review(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), nullable=True)
 
+    # Vote counters, kept in step with review_votes by app.data.review_votes.
+    # helpful_score is the Wilson lower bound of the upvote share.
+    upvotes = Column(Integer, nullable=False, default=0, server_default="0")
+    downvotes = Column(Integer, nullable=False, default=0, server_default="0")
+    helpful_score = Column(Float, nullable=False, default=0.0, server_default="0")
+    # On Postgres the table also has search_vector, a generated tsvector
+    # column for full-text search; it is deliberately unmapped (see
+    # app.data.review_search).
+
     user = relationship("User", back_populates="reviews")
     set = relationship("Set", back_populates="reviews")
     votes = relationship(
@@ -162,9 +173,64 @@ class Review(Base):
         Index("idx_reviews_set_num", "set_num"),
         Index("idx_reviews_user_set_num", "user_id", "set_num"),
         Index("idx_reviews_created_at", "created_at"),
+        Index("idx_reviews_set_helpful", "set_num", "helpful_score", "id"),
     )
 
 
+# Keyset pagination of a set's reviews, newest first.
+Index(
+    "idx_reviews_set_recent",
+    Review.set_num,
+    func.coalesce(Review.updated_at, Review.created_at),
+    Review.id,
+)
+
+
+
+# Half-star rating buckets: hist_05 counts 0.5 ratings, ..., hist_50 counts 5.0.
+RATING_BUCKETS = ("05", "10", "15", "20", "25", "30", "35", "40", "45", "50")
+
+
+class SetRatingStats(Base):
+    """
+    Per-set review aggregates, kept in step with `reviews` by
+    app.data.rating_stats in the same transaction as each review write.
+    """
+    __tablename__ = "set_rating_stats"
+
+    set_num = Column(String, ForeignKey("sets.set_num", ondelete="CASCADE"), primary_key=True)
+
+    rating_sum = Column(Float, nullable=False, server_default="0", default=0.0)
+    rating_count = Column(Integer, nullable=False, server_default="0", default=0)
+    review_count = Column(Integer, nullable=False, server_default="0", default=0)  # non-empty text
+
+    hist_05 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_10 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_15 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_20 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_25 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_30 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_35 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_40 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_45 = Column(Integer, nullable=False, server_default="0", default=0)
+    hist_50 = Column(Integer, nullable=False, server_default="0", default=0)
+
+
+class SetTrending(Base):
+    """
+    Exponentially decayed activity score per set, maintained event by event
+    by app.data.trending. `score` is stored relative to a fixed epoch, so
+    ordering by it is ordering by the current decayed score.
+    """
+    __tablename__ = "set_trending"
+
+    set_num = Column(String, ForeignKey("sets.set_num", ondelete="CASCADE"), primary_key=True)
+    score = Column(Float, nullable=False, server_default="0", default=0.0)
+
+    __table_args__ = (
+        Index("idx_set_trending_score", "score"),
+    )
+
 
 class ReviewVote(Base):
     __tablename__ = "review_votes"
@@ -265,7 +331,10 @@ class Offer(Base):
     __tablename__ = "offers"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    set_num = Column(String, nullable=False, index=True)
+    set_num = Column(String, nullable=False, index=True)  # plain number, e.g. "10305"
+    # "<set_num>-1", the form sets.set_num uses, so joins to sets and the
+    # (set, store) upsert key are plain indexed lookups.
+    canonical_set_num = Column(String, Computed("set_num || '-1'", persisted=True))
     store = Column(String, nullable=False)
     price = Column(Float, nullable=True)  # Null for affiliate-only links without price data
     currency = Column(String(8), nullable=False, server_default="USD")
@@ -275,6 +344,74 @@ class Offer(Base):
     last_checked = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        Index("uq_offers_canonical_set_num_store", "canonical_set_num", "store", unique=True),
+    )
+
+
+class SetBestPrice(Base):
+    """
+    Cheapest in-stock (or unknown-stock), non-BrickLink offer per set and its
+    discount against retail, kept in step with `offers` and Set.retail_price
+    by app.data.best_prices.
+    """
+    __tablename__ = "set_best_price"
+
+    set_num = Column(String, ForeignKey("sets.set_num", ondelete="CASCADE"), primary_key=True)
+    best_price = Column(Float, nullable=False)
+    store = Column(String, nullable=False)
+    retail_price = Column(Float, nullable=True)
+    discount_pct = Column(Float, nullable=True)  # (1 - best/retail) * 100; None without a retail price
+    savings = Column(Float, nullable=True)  # retail - best
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_set_best_price_discount", "discount_pct"),
+        Index("idx_set_best_price_price", "best_price"),
+    )
+
+
+class OfferPricePoint(Base):
+    """
+    Append-only history of an offer: one row each time its price or stock
+    flag changes (written by app.data.price_history, never updated).
+    """
+    __tablename__ = "offer_price_points"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    set_num = Column(String, nullable=False)  # plain number, like offers.set_num
+    store = Column(String, nullable=False)
+    price = Column(Float, nullable=True)
+    in_stock = Column(Boolean, nullable=True)
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("idx_offer_price_points_set_store_time", "set_num", "store", "recorded_at"),
+    )
+
+
+class OfferPriceRollup(Base):
+    """
+    Daily and weekly low/high/last price per (set, store), folded in from
+    offer_price_points as they are written. Buckets without a change have
+    no row; the price carried over from the previous bucket applies.
+    """
+    __tablename__ = "offer_price_rollups"
+
+    set_num = Column(String, primary_key=True)  # plain number
+    store = Column(String, primary_key=True)
+    granularity = Column(String(8), primary_key=True)  # "day" or "week"
+    bucket = Column(Date, primary_key=True)  # the day, or the Monday starting the week
+    low = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    last = Column(Float, nullable=False)
+    last_at = Column(DateTime(timezone=True), nullable=False)
+    points = Column(Integer, nullable=False, server_default="1")
+
+    __table_args__ = (
+        CheckConstraint("granularity IN ('day', 'week')", name="offer_price_rollups_granularity_check"),
+    )
+
 
 class Report(Base):
     __tablename__ = "reports"
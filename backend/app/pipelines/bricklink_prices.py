@@ -23,9 +23,10 @@ from typing import Optional
 from urllib.parse import quote as urlquote
 
 import httpx
-from sqlalchemy import select, and_, func, case
-from sqlalchemy.orm import Session
+from sqlalchemy import select, and_
+from sqlalchemy.orm import Session, aliased
 
+from app.data.offers import OfferWriter
 from app.db import SessionLocal
 from app.models import Offer as OfferModel, Set as SetModel
 
@@ -35,6 +36,7 @@ BRICKLINK_API_BASE = "https://api.bricklink.com/api/store/v1"
 REQUEST_TIMEOUT = 15.0
 THROTTLE_SECONDS = 1.0  # ~1 req/sec, well under 5000/day limit
 MAX_SETS_PER_RUN = 500
+SETS_PER_BATCH = 20  # offers are committed every this many sets
 
 
 # ---------------------------------------------------------------------------
@@ -119,16 +121,9 @@ def _get_sets_to_process(db: Session) -> list[dict]:
     Uses a LEFT JOIN on the offers table so sets never fetched come first,
     then sets with the oldest last_checked timestamp.
     """
-    # Subquery: latest BrickLink offer check per set_num
-    bl_offer = (
-        select(
-            OfferModel.set_num,
-            func.max(OfferModel.last_checked).label("last_bl_check"),
-        )
-        .where(OfferModel.store == "BrickLink")
-        .group_by(OfferModel.set_num)
-        .subquery()
-    )
+    # Offers are stored per plain number, so only the "-1" set of each number
+    # is scheduled; its BrickLink offer is found through the canonical key.
+    bl_offer = aliased(OfferModel)
 
     rows = db.execute(
         select(
@@ -138,10 +133,14 @@ def _get_sets_to_process(db: Session) -> list[dict]:
         )
         .outerjoin(
             bl_offer,
-            func.split_part(SetModel.set_num, "-", 1) == bl_offer.c.set_num,
+            and_(
+                bl_offer.canonical_set_num == SetModel.set_num,
+                bl_offer.store == "BrickLink",
+            ),
         )
+        .where(SetModel.set_num.like("%-1"))
         .order_by(
-            bl_offer.c.last_bl_check.asc().nulls_first(),
+            bl_offer.last_checked.asc().nulls_first(),
             SetModel.set_num.asc(),
         )
         .limit(MAX_SETS_PER_RUN)
@@ -250,50 +249,6 @@ def _build_bricklink_url(set_num_plain: str) -> str:
     return f"https://www.bricklink.com/v2/catalog/catalogitem.page?S={set_num_plain}-1"
 
 
-# ---------------------------------------------------------------------------
-# Offer upsert
-# ---------------------------------------------------------------------------
-
-def _upsert_offer(
-    db: Session,
-    set_num_plain: str,
-    store: str,
-    price: Optional[float],
-    currency: str,
-    url: str,
-    in_stock: Optional[bool],
-) -> bool:
-    """Insert or update an offer row. Match by (set_num, store). Returns True if new."""
-    now = datetime.now(timezone.utc)
-
-    existing = db.execute(
-        select(OfferModel).where(
-            and_(OfferModel.set_num == set_num_plain, OfferModel.store == store)
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        if price is not None:
-            existing.price = price
-        existing.currency = currency
-        existing.url = url
-        if in_stock is not None:
-            existing.in_stock = in_stock
-        existing.last_checked = now
-        return False
-    else:
-        db.add(OfferModel(
-            set_num=set_num_plain,
-            store=store,
-            price=price,
-            currency=currency,
-            url=url,
-            in_stock=in_stock,
-            last_checked=now,
-        ))
-        return True
-
-
 # ---------------------------------------------------------------------------
 # Main pipeline
 # ---------------------------------------------------------------------------
@@ -320,6 +275,7 @@ def run_bricklink_prices() -> dict:
         "skipped_no_data": 0,
         "api_errors": 0,
     }
+    offers = OfferWriter(db, batch_size=SETS_PER_BATCH)
 
     try:
         sets_to_process = _get_sets_to_process(db)
@@ -335,23 +291,21 @@ def run_bricklink_prices() -> dict:
                 if result and result.get("avg_price"):
                     stats["prices_found"] += 1
 
-                    is_new = _upsert_offer(
-                        db, plain, "BrickLink",
-                        result["avg_price"],
-                        "USD",
-                        _build_bricklink_url(plain),
-                        None,  # in_stock unknown from price guide
+                    offers.add(
+                        plain, "BrickLink",
+                        price=result["avg_price"],
+                        currency="USD",
+                        url=_build_bricklink_url(plain),
+                        in_stock=None,  # unknown from price guide
                     )
-                    if is_new:
-                        stats["offers_inserted"] += 1
-                    else:
-                        stats["offers_updated"] += 1
                 elif result is None:
                     stats["skipped_no_data"] += 1
                 else:
                     stats["api_errors"] += 1
 
-                db.commit()
+                if stats["sets_processed"] % SETS_PER_BATCH == 0:
+                    offers.flush()
+
                 time.sleep(THROTTLE_SECONDS)
 
                 # Log progress every 100 sets
@@ -363,14 +317,18 @@ def run_bricklink_prices() -> dict:
                         stats["prices_found"],
                     )
 
+        offers.flush()
+        stats.update(offers.stats)
+
         stats["elapsed_seconds"] = round(time.time() - t0, 1)
         stats["completed_at"] = datetime.now(timezone.utc).isoformat()
         logger.info("BrickLink price fetch complete: %s", stats)
         return stats
 
     except Exception:
-        db.rollback()
         logger.exception("BrickLink price fetch failed")
+        offers.flush_after_error()
+        stats.update(offers.stats)
         return {
             "error": "bricklink_fetch_failed",
             "completed_at": datetime.now(timezone.utc).isoformat(),
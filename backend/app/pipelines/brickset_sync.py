@@ -18,11 +18,13 @@ import time
 from datetime import datetime, timezone
 
 import httpx
-from sqlalchemy import select, and_
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.data.best_prices import refresh_best_prices
+from app.data.offers import OfferWriter
 from app.db import SessionLocal
-from app.models import Set as SetModel, Offer as OfferModel, get_locked_fields
+from app.models import Set as SetModel, get_locked_fields
 
 logger = logging.getLogger(__name__)
 
@@ -104,39 +106,6 @@ def _determine_status(bs_set: dict) -> str:
     return "unknown"
 
 
-def _upsert_lego_offer(db: Session, plain_num: str, price: float | None, in_stock: bool | None) -> bool:
-    """Upsert a LEGO.com offer. Returns True if new row inserted."""
-    if price is None:
-        return False
-
-    existing = db.execute(
-        select(OfferModel).where(
-            and_(OfferModel.set_num == plain_num, OfferModel.store == "LEGO")
-        )
-    ).scalar_one_or_none()
-
-    now = datetime.now(timezone.utc)
-    url = f"https://www.lego.com/en-us/product/{plain_num}"
-
-    if existing:
-        existing.price = price
-        existing.in_stock = in_stock
-        existing.last_checked = now
-        existing.url = url
-        return False
-    else:
-        db.add(OfferModel(
-            set_num=plain_num,
-            store="LEGO",
-            price=price,
-            currency="USD",
-            url=url,
-            in_stock=in_stock,
-            last_checked=now,
-        ))
-        return True
-
-
 def _fetch_sets_by_year(api_key: str, year: int) -> list[dict]:
     """Fetch all sets for a given year from Brickset API, handling pagination."""
     all_sets = []
@@ -203,6 +172,7 @@ def run_brickset_sync(years: list[int] | None = None) -> dict:
         "offers_updated": 0,
         "api_calls": 0,
     }
+    offers = OfferWriter(db)
 
     try:
         for year in years:
@@ -211,15 +181,22 @@ def run_brickset_sync(years: list[int] | None = None) -> dict:
             stats["api_calls"] += (len(bs_sets) // PAGE_SIZE) + 1
             stats["sets_fetched"] += len(bs_sets)
 
+            # Load this year's rows from our DB in one query
+            wanted = [f"{bs.get('number', '')}-{bs.get('numberVariant', 1)}" for bs in bs_sets]
+            rows = {
+                r.set_num: r
+                for r in db.execute(
+                    select(SetModel).where(SetModel.set_num.in_(wanted))
+                ).scalars()
+            }
+            repriced = []  # sets whose retail price (and so deal discount) changed
+
             for bs in bs_sets:
                 number = bs.get("number", "")
                 variant = bs.get("numberVariant", 1)
                 set_num = f"{number}-{variant}"
 
-                # Find in our DB
-                row = db.execute(
-                    select(SetModel).where(SetModel.set_num == set_num)
-                ).scalar_one_or_none()
+                row = rows.get(set_num)
 
                 if not row:
                     stats["sets_not_in_db"] += 1
@@ -261,6 +238,7 @@ def run_brickset_sync(years: list[int] | None = None) -> dict:
                 if "retail_price" not in locked and us_price is not None and row.retail_price != us_price:
                     row.retail_price = us_price
                     row.retail_currency = "USD"
+                    repriced.append(set_num)
                     updated = True
 
                 # Description (strip HTML tags + entities)
@@ -330,19 +308,23 @@ def run_brickset_sync(years: list[int] | None = None) -> dict:
 
                 # --- Upsert LEGO.com offer (only for sets currently sold) ---
                 if new_status in ("available", "retiring_soon") and us_price:
-                    is_new = _upsert_lego_offer(
-                        db, number, us_price,
-                        True if new_status == "available" else None,
+                    offers.add(
+                        number, "LEGO",
+                        price=us_price,
+                        currency="USD",
+                        url=f"https://www.lego.com/en-us/product/{number}",
+                        in_stock=True if new_status == "available" else None,
                     )
-                    if is_new:
-                        stats["offers_inserted"] += 1
-                    else:
-                        stats["offers_updated"] += 1
 
+            # Offers are written (and committed) in batches; commit the rest
+            # of the year's set updates with the last one.
+            offers.flush()
+            refresh_best_prices(db, repriced)
             db.commit()
             logger.info("Brickset sync: year %d done (%d sets)", year, len(bs_sets))
             time.sleep(1)
 
+        stats.update(offers.stats)
         stats["elapsed_seconds"] = round(time.time() - t0, 1)
         stats["completed_at"] = datetime.now(timezone.utc).isoformat()
         logger.info("Brickset sync complete: %s", stats)
@@ -26,6 +26,7 @@ from bs4 import BeautifulSoup
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.data.best_prices import refresh_best_prices
 from app.db import SessionLocal
 from app.models import Set as SetModel, get_locked_fields
 
@@ -441,6 +442,7 @@ def run_coming_soon_scrape() -> dict:
                     if row.retail_price != price:
                         row.retail_price = price
                         row.retail_currency = product_data.get("currency", "USD")
+                        refresh_best_prices(db, [row.set_num])
                         changed = True
 
                 if changed:
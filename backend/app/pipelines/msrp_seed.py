@@ -15,10 +15,10 @@ from datetime import datetime, timezone
 from urllib.parse import quote
 
 from sqlalchemy import select, and_
-from sqlalchemy.orm import Session
 
+from app.data.offers import OfferWriter
 from app.db import SessionLocal
-from app.models import Offer as OfferModel, Set as SetModel
+from app.models import Set as SetModel
 
 logger = logging.getLogger("bricktrack.pipeline.msrp_seed")
 
@@ -202,46 +202,6 @@ def _build_lego_url(plain: str) -> str:
     return f"https://www.lego.com/en-us/product/{plain}"
 
 
-def _upsert_offer(
-    db: Session,
-    set_num_plain: str,
-    store: str,
-    price: float | None,
-    currency: str,
-    url: str,
-    in_stock: bool | None,
-) -> bool:
-    """Insert or update offer by (set_num, store). Returns True if new."""
-    now = datetime.now(timezone.utc)
-
-    existing = db.execute(
-        select(OfferModel).where(
-            and_(OfferModel.set_num == set_num_plain, OfferModel.store == store)
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        if price is not None:
-            existing.price = price
-        existing.currency = currency
-        existing.url = url
-        if in_stock is not None:
-            existing.in_stock = in_stock
-        existing.last_checked = now
-        return False
-    else:
-        db.add(OfferModel(
-            set_num=set_num_plain,
-            store=store,
-            price=price,
-            currency=currency,
-            url=url,
-            in_stock=in_stock,
-            last_checked=now,
-        ))
-        return True
-
-
 def run_msrp_seed() -> dict:
     """
     Seed MSRP offers for curated sets and generate retailer search links.
@@ -253,81 +213,60 @@ def run_msrp_seed() -> dict:
     t0 = time.time()
 
     db = SessionLocal()
-    inserted = 0
-    updated = 0
+    offers = OfferWriter(db)
     matched = 0
 
     try:
+        # Load every candidate row (both number formats) in one query.
+        candidates = [sn for plain in MSRP_DATA for sn in (f"{plain}-1", plain)]
+        rows = {
+            row.set_num: row
+            for row in db.execute(
+                select(SetModel).where(SetModel.set_num.in_(candidates))
+            ).scalars()
+        }
+
         for plain, (price, name) in MSRP_DATA.items():
-            # Check if set exists in DB (try both formats)
-            set_exists = False
-            for sn in [f"{plain}-1", plain]:
-                row = db.execute(
-                    select(SetModel).where(SetModel.set_num == sn)
-                ).scalar_one_or_none()
-                if row:
-                    set_exists = True
-                    # Update retail_price on the Set model
-                    if row.retail_price != price:
-                        row.retail_price = price
-                        row.retail_currency = "USD"
-                    # Mark as available (these are current sets on LEGO.com)
-                    if row.retirement_status != "available":
-                        row.retirement_status = "available"
-                    break
-
-            if not set_exists:
+            row = rows.get(f"{plain}-1") or rows.get(plain)
+            if row is None:
                 continue
 
+            # Update retail_price on the Set model
+            if row.retail_price != price:
+                row.retail_price = price
+                row.retail_currency = "USD"
+            # Mark as available (these are current sets on LEGO.com)
+            if row.retirement_status != "available":
+                row.retirement_status = "available"
+
             matched += 1
 
             # LEGO.com offer (with price)
-            is_new = _upsert_offer(
-                db, plain, "LEGO", price, "USD",
-                _build_lego_url(plain), True,
+            offers.add(
+                plain, "LEGO", price=price, currency="USD",
+                url=_build_lego_url(plain), in_stock=True,
             )
-            if is_new:
-                inserted += 1
-            else:
-                updated += 1
-
-            # Amazon search link
-            is_new = _upsert_offer(
-                db, plain, "Amazon", None, "USD",
-                _build_amazon_url(plain, name), None,
+
+            # Amazon, Target and Walmart search links
+            offers.add(
+                plain, "Amazon", price=None, currency="USD",
+                url=_build_amazon_url(plain, name), in_stock=None,
             )
-            if is_new:
-                inserted += 1
-            else:
-                updated += 1
-
-            # Target search link
-            is_new = _upsert_offer(
-                db, plain, "Target", None, "USD",
-                _build_target_url(plain), None,
+            offers.add(
+                plain, "Target", price=None, currency="USD",
+                url=_build_target_url(plain), in_stock=None,
             )
-            if is_new:
-                inserted += 1
-            else:
-                updated += 1
-
-            # Walmart search link
-            is_new = _upsert_offer(
-                db, plain, "Walmart", None, "USD",
-                _build_walmart_url(plain), None,
+            offers.add(
+                plain, "Walmart", price=None, currency="USD",
+                url=_build_walmart_url(plain), in_stock=None,
             )
-            if is_new:
-                inserted += 1
-            else:
-                updated += 1
 
-        db.commit()
+        offers.flush()
 
         stats = {
             "curated_sets": len(MSRP_DATA),
             "matched_in_db": matched,
-            "offers_inserted": inserted,
-            "offers_updated": updated,
+            **offers.stats,
         }
 
         # --- Year-based retirement inference ---
@@ -21,6 +21,7 @@ import httpx
 from sqlalchemy import select, and_
 from sqlalchemy.orm import Session
 
+from app.data.offers import OfferWriter
 from app.db import SessionLocal
 from app.models import Offer as OfferModel, Set as SetModel
 from app.pipelines._scraper_utils import extract_jsonld_product_offer, SCRAPER_HEADERS
@@ -37,6 +38,7 @@ HEADERS = SCRAPER_HEADERS
 REQUEST_TIMEOUT = 20.0
 THROTTLE_SECONDS = 2.0
 MAX_SETS_PER_RUN = 200
+SETS_PER_BATCH = 10  # offers are committed every this many sets
 
 
 def build_amazon_url(set_num_plain: str, name: str, asin: str | None = None) -> str:
@@ -65,26 +67,23 @@ def build_bestbuy_url(set_num_plain: str) -> str:
     return f"https://www.bestbuy.com/site/searchpage.jsp?st=lego+{set_num_plain}"
 
 
-def scrape_lego_product_page(
+def fetch_lego_product_page(
     client: httpx.Client,
     set_num_plain: str,
 ) -> Optional[dict]:
     """
-    Scrape a LEGO.com product page for price and availability via JSON-LD.
+    Fetch a LEGO.com product page and read its price and availability via JSON-LD.
 
-    Returns {"price": float, "currency": str, "in_stock": bool|None, "url": str}
-    or None if unavailable.
+    Returns {"price": float, "currency": str, "in_stock": bool|None, "url": str},
+    or None if LEGO.com has no page (404) or no product offer for the set.
+    Other HTTP and transport errors are raised.
     """
     url = f"{LEGO_PRODUCT_URL}{set_num_plain}"
 
-    try:
-        resp = client.get(url, headers=HEADERS, follow_redirects=True)
-        if resp.status_code == 404:
-            return None
-        resp.raise_for_status()
-    except httpx.HTTPError:
-        logger.debug("Failed to fetch LEGO.com page for %s", set_num_plain)
+    resp = client.get(url, headers=HEADERS, follow_redirects=True)
+    if resp.status_code == 404:
         return None
+    resp.raise_for_status()
 
     result = extract_jsonld_product_offer(resp.text)
     if result:
@@ -94,6 +93,23 @@ def scrape_lego_product_page(
     return None
 
 
+def scrape_lego_product_page(
+    client: httpx.Client,
+    set_num_plain: str,
+) -> Optional[dict]:
+    """
+    Scrape a LEGO.com product page for price and availability via JSON-LD.
+
+    Returns {"price": float, "currency": str, "in_stock": bool|None, "url": str}
+    or None if unavailable.
+    """
+    try:
+        return fetch_lego_product_page(client, set_num_plain)
+    except httpx.HTTPError:
+        logger.debug("Failed to fetch LEGO.com page for %s", set_num_plain)
+        return None
+
+
 def _get_active_sets(db: Session) -> list[dict]:
     """Get sets from current year +/- 1 to scrape prices for.
 
@@ -104,7 +120,7 @@ def _get_active_sets(db: Session) -> list[dict]:
     current_year = datetime.now().year
 
     # Left-join to the LEGO offer so we can sort by last_checked (NULL first)
-    from sqlalchemy import func, case
+    from sqlalchemy import case
     from sqlalchemy.orm import aliased
 
     lego_offer = aliased(OfferModel)
@@ -114,7 +130,7 @@ def _get_active_sets(db: Session) -> list[dict]:
         .outerjoin(
             lego_offer,
             and_(
-                func.replace(SetModel.set_num, "-1", "") == lego_offer.set_num,
+                lego_offer.canonical_set_num == SetModel.set_num,
                 lego_offer.store == "LEGO",
             ),
         )
@@ -144,52 +160,6 @@ def _get_active_sets(db: Session) -> list[dict]:
     return result
 
 
-def _upsert_offer(
-    db: Session,
-    set_num_plain: str,
-    store: str,
-    price: Optional[float],
-    currency: str,
-    url: str,
-    in_stock: Optional[bool],
-) -> bool:
-    """
-    Insert or update an offer row. Match by (set_num, store).
-    Returns True if new row inserted.
-    """
-    now = datetime.now(timezone.utc)
-
-    existing = db.execute(
-        select(OfferModel).where(
-            and_(
-                OfferModel.set_num == set_num_plain,
-                OfferModel.store == store,
-            )
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        if price is not None:
-            existing.price = price
-        existing.currency = currency
-        existing.url = url
-        if in_stock is not None:
-            existing.in_stock = in_stock
-        existing.last_checked = now
-        return False
-    else:
-        db.add(OfferModel(
-            set_num=set_num_plain,
-            store=store,
-            price=price,
-            currency=currency,
-            url=url,
-            in_stock=in_stock,
-            last_checked=now,
-        ))
-        return True
-
-
 def run_price_scrape() -> dict:
     """
     Main pipeline: scrape LEGO.com prices + generate retailer URLs.
@@ -203,6 +173,8 @@ def run_price_scrape() -> dict:
 
     db = SessionLocal()
     stats = {"sets_processed": 0, "offers_inserted": 0, "offers_updated": 0, "lego_prices_found": 0}
+    # LEGO.com plus four retailer links per set; flushed every SETS_PER_BATCH sets.
+    offers = OfferWriter(db, batch_size=5 * SETS_PER_BATCH)
 
     try:
         active_sets = _get_active_sets(db)
@@ -222,25 +194,18 @@ def run_price_scrape() -> dict:
                 if lego_data and lego_data.get("price"):
                     stats["lego_prices_found"] += 1
 
-                    is_new = _upsert_offer(
-                        db, plain, "LEGO",
-                        lego_data["price"],
-                        lego_data.get("currency", "USD"),
-                        lego_data["url"],
-                        lego_data.get("in_stock"),
+                    offers.add(
+                        plain, "LEGO",
+                        price=lego_data["price"],
+                        currency=lego_data.get("currency", "USD"),
+                        url=lego_data["url"],
+                        in_stock=lego_data.get("in_stock"),
+                    )
+
+                    # Also update Set.retail_price (written with the batch)
+                    offers.set_retail_price(
+                        full_set_num, lego_data["price"], lego_data.get("currency", "USD"),
                     )
-                    if is_new:
-                        stats["offers_inserted"] += 1
-                    else:
-                        stats["offers_updated"] += 1
-
-                    # Also update Set.retail_price
-                    set_row = db.execute(
-                        select(SetModel).where(SetModel.set_num == full_set_num)
-                    ).scalar_one_or_none()
-                    if set_row:
-                        set_row.retail_price = lego_data["price"]
-                        set_row.retail_currency = lego_data.get("currency", "USD")
 
                 # --- Retailer search URLs ---
                 retailers = [
@@ -250,18 +215,18 @@ def run_price_scrape() -> dict:
                     ("Best Buy", build_bestbuy_url(plain)),
                 ]
                 for store, url in retailers:
-                    is_new = _upsert_offer(db, plain, store, None, "USD", url, None)
-                    if is_new:
-                        stats["offers_inserted"] += 1
-                    else:
-                        stats["offers_updated"] += 1
+                    offers.add(plain, store, price=None, currency="USD", url=url, in_stock=None)
 
-                # Commit per-set to avoid losing progress
-                db.commit()
+                if stats["sets_processed"] % SETS_PER_BATCH == 0:
+                    offers.flush()
 
                 # Rate limit LEGO.com
                 time.sleep(THROTTLE_SECONDS)
 
+        # Write the last partial batch.
+        offers.flush()
+        stats.update(offers.stats)
+
         elapsed = time.time() - t0
         stats["elapsed_seconds"] = round(elapsed, 1)
         stats["completed_at"] = datetime.now(timezone.utc).isoformat()
@@ -269,8 +234,8 @@ def run_price_scrape() -> dict:
         return stats
 
     except Exception:
-        db.rollback()
         logger.exception("Price scrape failed")
+        offers.flush_after_error()
         return {"error": "scrape_failed", "completed_at": datetime.now(timezone.utc).isoformat()}
     finally:
         db.close()
@@ -27,6 +27,7 @@ import httpx
 from sqlalchemy import select, and_
 from sqlalchemy.orm import Session
 
+from app.data.offers import OfferWriter
 from app.db import SessionLocal
 from app.models import Offer as OfferModel, Set as SetModel
 
@@ -40,6 +41,7 @@ AMAZON_TAG = os.getenv("AMAZON_AFFILIATE_TAG", "bricktrack-20")
 
 REQUEST_TIMEOUT = 15.0
 MAX_SETS_PER_RUN = 150
+SETS_PER_BATCH = 10  # offers are committed every this many sets
 
 
 # ---------------------------------------------------------------------------
@@ -51,7 +53,7 @@ def _get_active_sets(db: Session) -> list[dict]:
 
     Prioritises sets whose Amazon offer has no ASIN yet.
     """
-    from sqlalchemy import func, case
+    from sqlalchemy import case
     from sqlalchemy.orm import aliased
 
     current_year = datetime.now().year
@@ -67,7 +69,7 @@ def _get_active_sets(db: Session) -> list[dict]:
         .outerjoin(
             amazon_offer,
             and_(
-                func.replace(SetModel.set_num, "-1", "") == amazon_offer.set_num,
+                amazon_offer.canonical_set_num == SetModel.set_num,
                 amazon_offer.store == "Amazon",
             ),
         )
@@ -99,63 +101,6 @@ def _get_active_sets(db: Session) -> list[dict]:
     return result
 
 
-def _upsert_offer(
-    db: Session,
-    set_num_plain: str,
-    store: str,
-    price: Optional[float],
-    currency: str,
-    url: str,
-    in_stock: Optional[bool],
-    asin: Optional[str] = None,
-) -> str:
-    """Insert or update an offer row. Match by (set_num, store).
-
-    Returns "inserted", "updated", or "unchanged".
-    """
-    now = datetime.now(timezone.utc)
-
-    existing = db.execute(
-        select(OfferModel).where(
-            and_(
-                OfferModel.set_num == set_num_plain,
-                OfferModel.store == store,
-            )
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        changed = False
-        # Only update price if we got a real one — never null out existing
-        if price is not None and existing.price != price:
-            existing.price = price
-            changed = True
-        if url and existing.url != url:
-            existing.url = url
-            changed = True
-        if in_stock is not None and existing.in_stock != in_stock:
-            existing.in_stock = in_stock
-            changed = True
-        if asin and existing.asin != asin:
-            existing.asin = asin
-            changed = True
-        existing.currency = currency
-        existing.last_checked = now
-        return "updated" if changed else "unchanged"
-    else:
-        db.add(OfferModel(
-            set_num=set_num_plain,
-            store=store,
-            price=price,
-            currency=currency,
-            url=url,
-            in_stock=in_stock,
-            asin=asin,
-            last_checked=now,
-        ))
-        return "inserted"
-
-
 # ---------------------------------------------------------------------------
 # Amazon ASIN Discovery
 # ---------------------------------------------------------------------------
@@ -230,8 +175,10 @@ def run_retailer_scrape() -> dict:
     stats = {
         "sets_checked": 0,
         "asins_discovered": 0,
+        "offers_inserted": 0,
         "offers_updated": 0,
     }
+    offers = OfferWriter(db, batch_size=SETS_PER_BATCH)
 
     try:
         active_sets = _get_active_sets(db)
@@ -252,21 +199,21 @@ def run_retailer_scrape() -> dict:
                 if asin:
                     # Build direct product URL with affiliate tag
                     direct_url = f"https://www.amazon.com/dp/{quote(asin)}?tag={quote(AMAZON_TAG)}"
-                    action = _upsert_offer(
-                        db, plain, "Amazon",
-                        None,  # No price without PA-API
-                        "USD",
-                        direct_url,
-                        None,
+                    offers.add(
+                        plain, "Amazon",
+                        price=None,  # No price without PA-API
+                        currency="USD",
+                        url=direct_url,
+                        in_stock=None,
                         asin=asin,
                     )
-                    db.commit()
                     stats["asins_discovered"] += 1
-                    if action in ("inserted", "updated"):
-                        stats["offers_updated"] += 1
 
                     logger.debug("Found ASIN %s for set %s", asin, plain)
 
+                if stats["sets_checked"] % SETS_PER_BATCH == 0:
+                    offers.flush()
+
                 # Rate limit UPC API (free tier: 100/day)
                 time.sleep(1.0)
 
@@ -275,6 +222,12 @@ def run_retailer_scrape() -> dict:
                     logger.info("Hit ASIN discovery daily limit cap (90)")
                     break
 
+        offers.flush()
+        stats.update(offers.stats)
+        # As before batching: count the offers this run actually wrote, i.e.
+        # new ones plus existing ones whose values changed.
+        stats["offers_updated"] = stats["offers_inserted"] + stats["offers_changed"]
+
         elapsed = time.time() - t0
         stats["elapsed_seconds"] = round(elapsed, 1)
         stats["completed_at"] = datetime.now(timezone.utc).isoformat()
@@ -282,8 +235,8 @@ def run_retailer_scrape() -> dict:
         return stats
 
     except Exception:
-        db.rollback()
         logger.exception("Retailer scrape failed")
+        offers.flush_after_error()
         return {"error": "scrape_failed", "completed_at": datetime.now(timezone.utc).isoformat()}
     finally:
         db.close()
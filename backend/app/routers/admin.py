@@ -10,8 +10,12 @@ from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
 from app.core.auth import get_admin_user
+from app.core.change_feed import SETS, feed
 from app.core.limiter import limiter
 from app.core.sanitize import sanitize_oneline
+from app.data import offers as offers_data
+from app.data.best_prices import refresh_best_prices
+from app.data.set_view import invalidate_set_view
 from app.db import get_db
 from app.models import (
     User as UserModel,
@@ -103,6 +107,7 @@ def refresh_sets(request: Request, admin: UserModel = Depends(get_admin_user)):
     from scripts.refresh_sets import sync_cache_to_db
 
     stats = sync_cache_to_db(skip_fetch=False)
+    invalidate_set_view()
     return {"ok": True, **stats}
 
 
@@ -113,6 +118,7 @@ def sync_sets(request: Request, admin: UserModel = Depends(get_admin_user)):
     from scripts.refresh_sets import sync_cache_to_db
 
     stats = sync_cache_to_db(skip_fetch=True)
+    invalidate_set_view()
     return {"ok": True, **stats}
 
 
@@ -132,6 +138,14 @@ _PIPELINES = {
 }
 
 
+def _run_pipeline(fn):
+    """Run a pipeline, then drop the in-memory set view it may have changed."""
+    try:
+        return fn()
+    finally:
+        invalidate_set_view()
+
+
 @router.post("/pipelines/{pipeline_name}/run")
 @limiter.limit("5/minute")
 def trigger_pipeline(
@@ -150,10 +164,10 @@ def trigger_pipeline(
     # Long-running pipelines (like bricklink_prices) run in background
     _LONG_RUNNING = {"bricklink_prices", "retailer_scrape"}
     if pipeline_name in _LONG_RUNNING:
-        threading.Thread(target=fn, daemon=True).start()
+        threading.Thread(target=_run_pipeline, args=(fn,), daemon=True).start()
         return {"ok": True, "pipeline": pipeline_name, "status": "started_in_background"}
 
-    result = fn()
+    result = _run_pipeline(fn)
     return {"ok": True, "pipeline": pipeline_name, "result": result}
 
 
@@ -246,9 +260,12 @@ def admin_update_set(
 
     if changed_fields:
         add_locked_fields(row, changed_fields)
+    if "retail_price" in changed_fields:
+        refresh_best_prices(db, [row.set_num])
 
     db.commit()
     db.refresh(row)
+    feed.publish(SETS, [row.set_num])
 
     return {
         "ok": True,
@@ -325,9 +342,12 @@ def admin_reset_set(
             if api_val is not None and getattr(row, db_field) != api_val:
                 setattr(row, db_field, api_val)
                 restored_fields.append(db_field)
+    if "retail_price" in restored_fields:
+        refresh_best_prices(db, [row.set_num])
 
     db.commit()
     db.refresh(row)
+    feed.publish(SETS, [row.set_num])
 
     return {
         "ok": True,
@@ -426,35 +446,18 @@ def admin_set_asin(
     direct_url = f"https://www.amazon.com/dp/{quote(payload.asin)}?tag={quote(amazon_tag)}"
     now = datetime.now(timezone.utc)
 
-    existing = db.execute(
-        select(OfferModel).where(
-            OfferModel.set_num == plain,
-            OfferModel.store == "Amazon",
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        existing.asin = payload.asin
-        existing.url = direct_url
-        existing.last_checked = now
-        if payload.price is not None:
-            existing.price = payload.price
-        if payload.in_stock is not None:
-            existing.in_stock = payload.in_stock
-        action = "updated"
-    else:
-        db.add(OfferModel(
-            set_num=plain,
-            store="Amazon",
-            price=payload.price,
-            currency="USD",
-            url=direct_url,
-            in_stock=payload.in_stock,
-            asin=payload.asin,
-            last_checked=now,
-        ))
-        action = "created"
-
+    created = offers_data.upsert_offer(
+        db, plain, "Amazon",
+        price=payload.price,
+        currency="USD",
+        url=direct_url,
+        in_stock=payload.in_stock,
+        asin=payload.asin,
+        now=now,
+    )
+    action = "created" if created else "updated"
+
+    refresh_best_prices(db, [plain])
     db.commit()
     return {"ok": True, "set_num": plain, "asin": payload.asin, "url": direct_url, "action": action}
 
@@ -481,6 +484,7 @@ def admin_delete_asin(
         raise HTTPException(status_code=404, detail="no_amazon_offer")
 
     db.delete(existing)
+    refresh_best_prices(db, [plain])
     db.commit()
     return {"ok": True, "set_num": plain, "action": "deleted"}
 
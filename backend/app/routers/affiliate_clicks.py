@@ -1,6 +1,8 @@
 from fastapi import APIRouter, Body, Depends, Request
 from sqlalchemy.orm import Session
 
+from app.data import trending as trending_data
+from app.data.sets import get_set_by_num
 from app.db import get_db
 from app.models import AffiliateClick, User as UserModel
 from app.schemas.affiliate import AffiliateClickIn
@@ -27,5 +29,8 @@ def track_affiliate_click(
         page_path=body.page_path,
     )
     db.add(row)
+    s = get_set_by_num(body.set_num)
+    if s:
+        trending_data.record_event(db, s["set_num"], "click")
     db.commit()
     return {"ok": True}
\ No newline at end of file
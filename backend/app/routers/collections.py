@@ -13,6 +13,7 @@ from app.core.limiter import limiter
 from app.core.set_nums import base_set_num
 from app.data.sets import get_set_by_num
 from app.data import offers as offers_data
+from app.data import trending as trending_data
 from app.db import get_db
 from app.models import List as ListModel
 from app.models import ListItem as ListItemModel
@@ -286,6 +287,8 @@ def add_owned(
     wishlist_list = _get_or_create_system_list(db, int(current_user.id), "wishlist")
 
     if not _already_in_list(db, int(owned_list.id), canonical):
+        # Committed with the item; rolled back with it if it was a duplicate.
+        trending_data.record_event(db, canonical, "owned")
         _append_item(db, int(owned_list.id), canonical)
 
     _remove_item_idempotent_by_base_or_exact(db, int(wishlist_list.id), base_set_num(canonical))
@@ -329,6 +332,8 @@ def add_wishlist(
     owned_list = _get_or_create_system_list(db, int(current_user.id), "owned")
 
     if not _already_in_list(db, int(wishlist_list.id), canonical):
+        # Committed with the item; rolled back with it if it was a duplicate.
+        trending_data.record_event(db, canonical, "wishlist")
         _append_item(db, int(wishlist_list.id), canonical)
 
     _remove_item_idempotent_by_base_or_exact(db, int(owned_list.id), base_set_num(canonical))
@@ -8,7 +8,10 @@ from sqlalchemy.orm import Session
 
 from ..core.auth import get_current_user
 from ..core.collections import move_wishlist_to_owned
+from ..core.change_feed import RATINGS, feed
 from ..core.limiter import limiter
+from ..data import trending as trending_data
+from ..data.rating_stats import apply_review_change, review_state
 from ..db import get_db
 from ..models import User as UserModel
 
@@ -49,14 +52,20 @@ def put_rating(
     ).limit(1)
   ).scalar_one_or_none()
 
+  before = review_state(existing)
   if existing:
     existing.rating = float(payload.rating)
     review = existing
   else:
     review = ReviewModel(set_num=sn, rating=float(payload.rating), user_id=user.id)
     db.add(review)
+    trending_sn = trending_data.event_set_num(db, sn)
+    if trending_sn:
+      trending_data.record_event(db, trending_sn, "review")
 
+  apply_review_change(db, sn, before, review_state(review))
   db.commit()
+  feed.publish(RATINGS, [sn])
 
   # Auto-move from wishlist → owned when a user rates a set
   moved_to_owned = False
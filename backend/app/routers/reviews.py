@@ -1,22 +1,28 @@
 # backend/app/routers/reviews.py
 
+import base64
+import json
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
 from pydantic import BaseModel, field_validator
-from sqlalchemy import select, func, case
+from sqlalchemy import and_, or_, select, func
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, aliased
 
 from ..core.auth import get_current_user, get_current_user_optional
 from ..core.collections import move_wishlist_to_owned
+from ..core.change_feed import RATINGS, feed
 from ..core.limiter import limiter
 from ..core.sanitize import contains_profanity
 from ..core.set_nums import base_set_num
+from ..data import review_search
+from ..data import trending as trending_data
+from ..data.rating_stats import apply_review_change, review_state
+from ..data.review_votes import apply_vote_change
 from ..data.sets import get_set_by_num
 from ..db import get_db
-from ..routers.sets import invalidate_ratings_cache
 from ..models import Review as ReviewModel
 from ..models import ReviewVote as ReviewVoteModel
 from ..models import Set as SetModel
@@ -34,35 +40,20 @@ router = APIRouter(tags=["reviews"])
 # ---------------- helpers ----------------
 
 def _vote_counts_for_reviews(
-    db: Session, review_ids: List[int], current_user_id: Optional[int] = None
+    db: Session, reviews: List[ReviewModel], current_user_id: Optional[int] = None
 ) -> Dict[int, Dict[str, Any]]:
-    """Batch-fetch vote counts + current user's vote for a list of review IDs."""
-    if not review_ids:
-        return {}
-
-    # Aggregate up/down counts per review
-    rows = db.execute(
-        select(
-            ReviewVoteModel.review_id,
-            func.count(case((ReviewVoteModel.vote_type == "up", 1))).label("upvotes"),
-            func.count(case((ReviewVoteModel.vote_type == "down", 1))).label("downvotes"),
-        )
-        .where(ReviewVoteModel.review_id.in_(review_ids))
-        .group_by(ReviewVoteModel.review_id)
-    ).all()
-
+    """Vote counts (from the review rows) + current user's vote for a list of reviews."""
     result: Dict[int, Dict[str, Any]] = {
-        rid: {"upvotes": 0, "downvotes": 0, "user_vote": None} for rid in review_ids
+        r.id: {"upvotes": int(r.upvotes or 0), "downvotes": int(r.downvotes or 0), "user_vote": None}
+        for r in reviews
     }
-    for review_id, up, down in rows:
-        result[review_id] = {"upvotes": up, "downvotes": down, "user_vote": None}
 
     # If we have a current user, also fetch their votes
-    if current_user_id is not None:
+    if current_user_id is not None and result:
         user_votes = db.execute(
             select(ReviewVoteModel.review_id, ReviewVoteModel.vote_type)
             .where(
-                ReviewVoteModel.review_id.in_(review_ids),
+                ReviewVoteModel.review_id.in_(list(result)),
                 ReviewVoteModel.user_id == current_user_id,
             )
         ).all()
@@ -73,6 +64,35 @@ def _vote_counts_for_reviews(
     return result
 
 
+_REVIEW_SORTS = ("recent", "helpful", "relevance")
+
+
+def _review_sort_key(model: Any, sort: str) -> Any:
+    """Primary ORDER BY column of a recent/helpful listing (ties broken by id)."""
+    if sort == "helpful":
+        return model.helpful_score
+    return func.coalesce(model.updated_at, model.created_at)
+
+
+def _encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[Any, int]:
+    """(sort key, review id) of the last review on the previous page."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key, last_id = json.loads(raw)
+        if sort == "recent":
+            key = datetime.fromisoformat(key)
+        else:
+            key = float(key)
+        return key, int(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="invalid_cursor")
+
+
 def _review_to_dict(
     r: ReviewModel,
     username: str,
@@ -202,35 +222,109 @@ def list_my_reviews(
     return out
 
 
-# GET /sets/{set_num}/reviews
-@router.get("/{set_num}/reviews", response_model=List[Review])
-def list_reviews_for_set(
-    set_num: str,
-    limit: int = Query(default=50, ge=1, le=200),
-    current_user: Optional[UserModel] = Depends(get_current_user_optional),
-    db: Session = Depends(get_db),
+def _review_page(
+    db: Session,
+    response: Response,
+    where: List[Any],
+    sort: Optional[str],
+    q: Optional[str],
+    cursor: Optional[str],
+    limit: int,
+    current_user: Optional[UserModel],
 ) -> List[Dict[str, Any]]:
-    canonical = _canonicalize_and_ensure_set(db, set_num)
-
-    rows = db.execute(
-        select(ReviewModel, UserModel.username, SetModel.image_url)
+    """
+    One keyset page of the reviews matching *where* (and search text *q*),
+    ordered by *sort* then id, newest first. Sets X-Next-Cursor when more
+    reviews follow.
+    """
+    q = (q or "").strip()
+    sort = sort or ("relevance" if q else "recent")
+    if sort not in _REVIEW_SORTS or (sort == "relevance" and not q):
+        raise HTTPException(status_code=400, detail="invalid_sort")
+
+    where = list(where)
+    if q:
+        match, rank = review_search.match_and_rank(db, q)
+        where.append(match)
+    key = rank if sort == "relevance" else _review_sort_key(ReviewModel, sort)
+
+    stmt = (
+        select(ReviewModel, UserModel.username, SetModel.image_url, key)
         .join(ReviewModel.user)       # relationship join
         .outerjoin(ReviewModel.set)   # relationship join
-        .where(ReviewModel.set_num == canonical)
-        .order_by(func.coalesce(ReviewModel.updated_at, ReviewModel.created_at).desc())
-        .limit(int(limit))
-    ).all()
+        .where(*where)
+        .order_by(key.desc(), ReviewModel.id.desc())
+        .limit(int(limit) + 1)
+    )
+    if cursor:
+        last_key, last_id = _decode_cursor(cursor, sort)
+        anchor = last_key
+        if sort != "relevance":
+            # Compare against the anchor review's stored key, so the database
+            # compares values in its own format; the key carried in the cursor
+            # is only used if that review was deleted in the meantime.
+            prev = aliased(ReviewModel)
+            anchor = func.coalesce(
+                select(_review_sort_key(prev, sort)).where(prev.id == last_id).scalar_subquery(), last_key
+            )
+        stmt = stmt.where(or_(key < anchor, and_(key == anchor, ReviewModel.id < last_id)))
+    rows = db.execute(stmt).all()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor([last[3], int(last[0].id)])
 
-    review_ids = [r.id for (r, _, _) in rows]
     user_id = current_user.id if current_user else None
-    vote_map = _vote_counts_for_reviews(db, review_ids, user_id)
+    vote_map = _vote_counts_for_reviews(db, [r for (r, _, _, _) in rows], user_id)
 
     return [
         _review_to_dict(r, username, image_url, vote_map.get(r.id))
-        for (r, username, image_url) in rows
+        for (r, username, image_url, _) in rows
     ]
 
 
+# GET /sets/reviews/search
+@router.get("/reviews/search", response_model=List[Review])
+def search_reviews(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in review text"),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    current_user: Optional[UserModel] = Depends(get_current_user_optional),
+    db: Session = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    """Reviews of any set whose text matches *q*, best match first."""
+    if not q.strip():
+        raise HTTPException(status_code=422, detail="q_required")
+    return _review_page(db, response, [], "relevance", q, cursor, limit, current_user)
+
+
+# GET /sets/{set_num}/reviews
+@router.get("/{set_num}/reviews", response_model=List[Review])
+def list_reviews_for_set(
+    set_num: str,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    sort: Optional[str] = Query(default=None, description="recent | helpful | relevance (default: relevance with q, else recent)"),
+    q: Optional[str] = Query(default=None, max_length=200, description="Only reviews whose text matches"),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor of the previous page"),
+    current_user: Optional[UserModel] = Depends(get_current_user_optional),
+    db: Session = Depends(get_db),
+) -> List[Dict[str, Any]]:
+    """
+    A page of a set's reviews: newest first, most helpful first, or (with
+    ?q=) best text match first.
+
+    Pages are keyset-paginated: when more reviews follow, the response
+    carries an X-Next-Cursor header to pass back as ?cursor=.
+    """
+    canonical = _canonicalize_and_ensure_set(db, set_num)
+    return _review_page(
+        db, response, [ReviewModel.set_num == canonical], sort, q, cursor, limit, current_user
+    )
+
+
 # POST /sets/{set_num}/reviews
 @router.post("/{set_num}/reviews", response_model=Review)
 @limiter.limit("20/minute")
@@ -259,15 +353,17 @@ def create_or_update_review(
     ).scalar_one_or_none()
 
     if existing is not None:
+        before = review_state(existing)
         if payload.rating is not None:
             existing.rating = payload.rating
         if payload.text is not None:
             existing.text = payload.text
 
         existing.updated_at = datetime.utcnow()
+        apply_review_change(db, canonical, before, review_state(existing))
         db.commit()
         db.refresh(existing)
-        invalidate_ratings_cache()
+        feed.publish(RATINGS, [canonical])
 
         # Auto-move wishlist → owned when a rating is set
         if payload.rating is not None:
@@ -276,7 +372,7 @@ def create_or_update_review(
             except Exception:
                 logger.exception("Failed to move set %s from wishlist to owned", canonical)
 
-        vote_map = _vote_counts_for_reviews(db, [existing.id], current_user.id)
+        vote_map = _vote_counts_for_reviews(db, [existing], current_user.id)
         return _review_to_dict(existing, current_user.username, image_url, vote_map.get(existing.id))
 
     new_row = ReviewModel(
@@ -287,9 +383,11 @@ def create_or_update_review(
         updated_at=datetime.utcnow(),
     )
     db.add(new_row)
+    apply_review_change(db, canonical, None, review_state(new_row))
+    trending_data.record_event(db, canonical, "review")
     db.commit()
     db.refresh(new_row)
-    invalidate_ratings_cache()
+    feed.publish(RATINGS, [canonical])
 
     # Auto-move wishlist → owned when a rating is set
     if payload.rating is not None:
@@ -316,14 +414,19 @@ def delete_my_review(
             return Response(status_code=status.HTTP_204_NO_CONTENT)
         raise
 
-    from sqlalchemy import delete as sa_delete
-    db.execute(
-        sa_delete(ReviewModel).where(
+    existing = db.execute(
+        select(ReviewModel).where(
             ReviewModel.user_id == current_user.id,
             ReviewModel.set_num == canonical,
         )
-    )
+    ).scalar_one_or_none()
+    if existing is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    apply_review_change(db, canonical, review_state(existing), None)
+    db.delete(existing)
     db.commit()
+    feed.publish(RATINGS, [canonical])
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
@@ -362,13 +465,16 @@ def vote_on_review(
     ).scalar_one_or_none()
 
     if existing_vote is not None:
+        before = existing_vote.vote_type
         if existing_vote.vote_type == payload.vote_type:
             # Same vote type → toggle off (remove vote)
             db.delete(existing_vote)
+            apply_vote_change(db, review_id, before, None)
             db.commit()
         else:
             # Different vote type → update
             existing_vote.vote_type = payload.vote_type
+            apply_vote_change(db, review_id, before, payload.vote_type)
             db.commit()
     else:
         # New vote
@@ -379,13 +485,16 @@ def vote_on_review(
         )
         db.add(new_vote)
         try:
+            db.flush()
+            apply_vote_change(db, review_id, None, payload.vote_type)
             db.commit()
         except IntegrityError:
             db.rollback()
 
     # Return updated counts
-    vote_map = _vote_counts_for_reviews(db, [review_id], current_user.id)
-    vi = vote_map.get(review_id, {"upvotes": 0, "downvotes": 0, "user_vote": None})
+    db.refresh(review)
+    vote_map = _vote_counts_for_reviews(db, [review], current_user.id)
+    vi = vote_map[review_id]
     return {
         "review_id": review_id,
         "upvotes": vi["upvotes"],
@@ -402,13 +511,15 @@ def remove_vote(
     current_user: UserModel = Depends(get_current_user),
     db: Session = Depends(get_db),
 ) -> Response:
-    from sqlalchemy import delete as sa_delete
-    db.execute(
-        sa_delete(ReviewVoteModel).where(
+    existing_vote = db.execute(
+        select(ReviewVoteModel).where(
             ReviewVoteModel.review_id == review_id,
             ReviewVoteModel.user_id == current_user.id,
         )
-    )
-    db.commit()
+    ).scalar_one_or_none()
+    if existing_vote is not None:
+        apply_vote_change(db, review_id, existing_vote.vote_type, None)
+        db.delete(existing_vote)
+        db.commit()
 
     return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,8 @@
 # backend/app/routers/sets.py
 
+import hashlib
 import json
+import logging
 import math
 import os
 import time
@@ -8,27 +10,39 @@ import threading
 from difflib import SequenceMatcher
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy import func, or_, select
 from sqlalchemy.orm import Session
-from sqlalchemy.orm.properties import RelationshipProperty
 
 from app.schemas.set import SetBulkOut
 
 from ..core.auth import get_current_user, get_current_user_optional
+from ..core.cache import _TTLCache
+from ..core.change_feed import RATINGS, feed, sweep_interval
 from ..core.limiter import limiter
+from ..data.catalog import AutocompleteIndex, SetCatalog, catalog_for
+from ..data.price_history import price_history
+from ..data.rating_stats import empty_histogram, histogram_key, histograms_for
 from ..data.sets import get_set_by_num, load_cached_sets
+from ..data.set_view import SetView, set_view
 from ..data import reviews as reviews_data
 from ..data import offers as offers_data  # used by /sets/{set_num}/offers
-from ..db import get_db
+from ..data import offer_refresh
+from ..data import trending as trending_data
+from ..db import SessionLocal, get_db
 from ..models import Offer as OfferModel
 from ..models import Review as ReviewModel
 from ..models import Set as SetModel
+from ..models import SetBestPrice, SetRatingStats
 from ..models import User as UserModel
 from ..models import AdminSetting
 from ..models import List as ListModel, ListItem as ListItemModel
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 
@@ -54,22 +68,27 @@ def _use_memory_reviews() -> bool:
     return os.getenv("PYTEST_CURRENT_TEST") is not None and hasattr(reviews_data, "REVIEWS")
 
 
-def _fuzzy_score_for_set(s: Dict[str, Any], q: str) -> float:
+def _fuzzy_matches(catalog: SetCatalog, q: str, threshold: float) -> Dict[int, float]:
+    """
+    Row position -> best SequenceMatcher ratio of *q* against the set's name,
+    ip or theme, for rows scoring at least *threshold*.
+
+    Only the strings the trigram index ranks as likely matches are scored
+    exactly, instead of every name / ip / theme in the catalog.
+    """
     q = (q or "").strip().lower()
     if not q:
-        return 0.0
-
-    candidates = [
-        (s.get("name") or "").lower(),
-        (s.get("ip") or "").lower(),
-        (s.get("theme") or "").lower(),
-    ]
+        return {}
 
-    best = 0.0
-    for text in candidates:
-        if not text:
+    index = catalog.trigram_index()
+    best: Dict[int, float] = {}
+    for tid in index.candidates(q):
+        score = SequenceMatcher(None, q, index.texts[tid]).ratio()
+        if score < threshold:
             continue
-        best = max(best, SequenceMatcher(None, q, text).ratio())
+        for i in index.text_rows[tid]:
+            if score > best.get(i, 0.0):
+                best[i] = score
     return best
 
 
@@ -110,18 +129,86 @@ def _relevance_score(s: Dict[str, Any], q: str) -> int:
     return score
 
 
-def _sort_key(sort: str):
-    if sort == "name":
-        return lambda r: (r.get("name") or "").lower()
-    if sort == "year":
-        return lambda r: (r.get("year") or 0)
-    if sort == "pieces":
-        return lambda r: (r.get("pieces") or 0)
-    if sort == "rating":
-        return lambda r: (r.get("_avg_rating") or 0.0, r.get("_rating_count") or 0)
-    if sort == "price":
-        return lambda r: (r.get("retail_price") or 0.0)
-    return lambda r: (r.get("name") or "").lower()
+def _top_k_order(keys: Tuple[np.ndarray, ...], k: int) -> np.ndarray:
+    """
+    Same as np.lexsort(keys)[:k] (last key is the primary one, ties keep
+    their incoming order) without sorting every element.
+
+    Only elements whose primary key is <= the k-th smallest primary key can
+    make the cut; those are found with a linear-time partition and then
+    lexsorted, which keeps the result identical to the full sort.
+    """
+    primary = keys[-1]
+    n = len(primary)
+    if k >= n:
+        return np.lexsort(keys)
+    kth = np.partition(primary, k - 1)[k - 1]
+    if kth != kth:  # NaN: fewer than k comparable keys
+        return np.lexsort(keys)[:k]
+    cand = np.flatnonzero(primary <= kth)
+    return cand[np.lexsort(tuple(key[cand] for key in keys))[:k]]
+
+
+def _sorted_head(
+    catalog: SetCatalog,
+    idx: np.ndarray,
+    sort: str,
+    reverse: bool,
+    q: str,
+    price_col: np.ndarray,
+    avg_col: np.ndarray,
+    cnt_col: np.ndarray,
+    k: int,
+) -> np.ndarray:
+    """
+    The first *k* row positions of *idx* in the requested sort.
+
+    Keys are negated for descending order so ties keep their incoming order
+    exactly like list.sort(reverse=True). Static keys (name, year, pieces)
+    walk the catalog's presorted permutation; the rest use a top-k
+    selection, so a page never pays for sorting the whole result.
+    """
+    sign = -1 if reverse else 1
+
+    static = sort if sort in ("name", "year", "pieces") else None
+    descending = reverse
+    if sort == "relevance" and not q:
+        static, descending = "year", True
+    if static is not None and (len(idx) < 2 or bool(np.all(idx[1:] > idx[:-1]))):
+        member = np.zeros(len(catalog), dtype=bool)
+        member[idx] = True
+        perm = catalog.sorted_rows(static, descending)
+        return perm[member[perm]][:k]
+
+    if sort == "relevance":
+        if not q:
+            keys: Tuple[np.ndarray, ...] = (-catalog.year[idx],)
+        else:
+            rel = np.fromiter(
+                (_relevance_score(catalog.rows[i], q) for i in idx), dtype=np.int64, count=len(idx)
+            )
+            keys = (-avg_col[idx], -cnt_col[idx], -catalog.year[idx], -rel)
+    elif sort == "year":
+        keys = (sign * catalog.year[idx],)
+    elif sort == "pieces":
+        keys = (sign * catalog.pieces[idx],)
+    elif sort == "rating":
+        keys = (sign * cnt_col[idx], sign * avg_col[idx])
+    elif sort == "price":
+        p = price_col[idx]
+        p = np.where(np.isnan(p), catalog.base_price[idx], p)
+        keys = (sign * p,)
+    else:
+        keys = (sign * catalog.name_rank[idx],)
+    return idx[_top_k_order(keys, k)]
+
+
+def _rating_entry(stats: Any) -> Tuple[Optional[float], int]:
+    """(avg_rating, rating_count) from a set_rating_stats row, or (None, 0)."""
+    cnt = int(stats.rating_count or 0) if stats is not None else 0
+    if cnt <= 0:
+        return (None, 0)
+    return (round(float(stats.rating_sum) / cnt, 2), cnt)
 
 
 def _rating_stats_for_set(db: Session, set_num: str) -> Tuple[Optional[float], int]:
@@ -138,16 +225,7 @@ def _rating_stats_for_set(db: Session, set_num: str) -> Tuple[Optional[float], i
             return (None, 0)
         return (round(sum(vals) / len(vals), 2), len(vals))
 
-    row = db.execute(
-        select(func.avg(ReviewModel.rating), func.count(ReviewModel.rating))
-        .where(ReviewModel.set_num == set_num, ReviewModel.rating.is_not(None))
-    ).one()
-
-    avg, cnt = row
-    cnt_i = int(cnt or 0)
-    if cnt_i <= 0 or avg is None:
-        return (None, 0)
-    return (round(float(avg), 2), cnt_i)
+    return _rating_entry(db.get(SetRatingStats, set_num))
 
 
 def _review_count_for_set(db: Session, set_num: str) -> int:
@@ -168,34 +246,23 @@ def _review_count_for_set(db: Session, set_num: str) -> int:
             cnt += 1
         return cnt
 
-    cnt = db.execute(
-        select(func.count())
-        .select_from(ReviewModel)
-        .where(
-            ReviewModel.set_num == set_num,
-            ReviewModel.text.is_not(None),
-            func.length(func.trim(ReviewModel.text)) > 0,
-        )
-    ).scalar_one()
-
-    return int(cnt or 0)
+    stats = db.get(SetRatingStats, set_num)
+    return int(stats.review_count) if stats is not None else 0
 
 
 def _set_tags_map(db: Session, set_nums: Optional[List[str]] = None) -> Dict[str, str]:
     """Map set_num -> set_tag for sets that have a tag. If set_nums given, filter to those only."""
-    q = select(SetModel.set_num, SetModel.set_tag).where(SetModel.set_tag.isnot(None))
-    if set_nums:
-        q = q.where(SetModel.set_num.in_(set_nums))
-    rows = db.execute(q).all()
-    return {r[0]: r[1] for r in rows if r[1]}
+    tags = set_view(db).tags
+    if not set_nums:
+        return tags
+    return {sn: tags[sn] for sn in set_nums if sn in tags}
 
 
 def _enrich_with_tags(db: Session, items: List[Dict[str, Any]]) -> None:
     """Add set_tag to a list of set dicts from DB tags."""
     if not items:
         return
-    set_nums = [item.get("set_num", "") for item in items if item.get("set_num")]
-    tags = _set_tags_map(db, set_nums)
+    tags = set_view(db).tags
     if not tags:
         return
     for item in items:
@@ -206,44 +273,69 @@ def _enrich_with_tags(db: Session, items: List[Dict[str, Any]]) -> None:
 
 
 _ratings_cache_lock = threading.Lock()
-_ratings_cache: Dict[str, Any] = {"ts": 0.0, "val": None}
-_RATINGS_TTL = 60  # seconds
-
-_review_counts_cache_lock = threading.Lock()
-_review_counts_cache: Dict[str, Any] = {"ts": 0.0, "val": None}
-
-_price_cache_lock = threading.Lock()
-_price_cache: Dict[str, Any] = {"ts": 0.0, "val": None}
-_PRICE_TTL = 300  # 5 minutes
+# val: (ratings map, review-count map); version: change-feed version it reflects
+_ratings_cache: Dict[str, Any] = {"ts": 0.0, "val": None, "version": 0}
+# Seconds between full rebuilds. Review writes in this process are applied
+# per key; those taken by other workers only arrive with a rebuild.
+_RATINGS_SWEEP = sweep_interval(300)
 
 
-def invalidate_ratings_cache() -> None:
-    """Call after a review is created/updated/deleted to bust the cache."""
-    with _ratings_cache_lock:
-        _ratings_cache["ts"] = 0.0
-        _ratings_cache["val"] = None
-    with _review_counts_cache_lock:
-        _review_counts_cache["ts"] = 0.0
-        _review_counts_cache["val"] = None
+def _price_map(db: Session) -> Dict[str, float]:
+    """Map set_num -> retail_price (> 0), from the in-memory set view."""
+    return set_view(db).prices
 
 
-def _price_map(db: Session) -> Dict[str, float]:
-    """Map set_num -> retail_price from DB, with TTL cache."""
+def _rating_maps(db: Session) -> Tuple[Dict[str, Tuple[Optional[float], int]], Dict[str, int]]:
+    """
+    (set_num -> (avg_rating, rating_count), set_num -> review_count), both
+    read from set_rating_stats.
+
+    Review writes publish the set_num on the RATINGS change feed; the next
+    read re-loads just those rows and patches copies of the maps (copies, so
+    SetCatalog.scatter's identity-keyed memo sees a new map). A full rebuild
+    only happens every _RATINGS_SWEEP seconds or when the feed window was
+    missed.
+    """
+    version = feed.version(RATINGS)
     now = time.monotonic()
-    with _price_cache_lock:
-        if now - _price_cache["ts"] < _PRICE_TTL and _price_cache["val"] is not None:
-            return _price_cache["val"]
-
-    rows = db.execute(
-        select(SetModel.set_num, SetModel.retail_price)
-        .where(SetModel.retail_price.isnot(None), SetModel.retail_price > 0)
-    ).all()
-    result = {r.set_num: float(r.retail_price) for r in rows}
+    changed = None
+    with _ratings_cache_lock:
+        cached = _ratings_cache["val"]
+        if cached is not None and now - _ratings_cache["ts"] < _RATINGS_SWEEP:
+            if _ratings_cache["version"] == version:
+                return cached
+            changed = feed.since(RATINGS, _ratings_cache["version"])
+        swept_at = _ratings_cache["ts"]
+
+    cols = (SetRatingStats.set_num, SetRatingStats.rating_sum, SetRatingStats.rating_count,
+            SetRatingStats.review_count)
+    if changed is None:
+        rows = db.execute(
+            select(*cols).where((SetRatingStats.rating_count > 0) | (SetRatingStats.review_count > 0))
+        ).all()
+        ratings: Dict[str, Tuple[Optional[float], int]] = {}
+        review_counts: Dict[str, int] = {}
+        swept_at = time.monotonic()
+    else:
+        rows = db.execute(select(*cols).where(SetRatingStats.set_num.in_(changed))).all()
+        ratings, review_counts = dict(cached[0]), dict(cached[1])
+        for sn in changed:
+            ratings.pop(sn, None)
+            review_counts.pop(sn, None)
+
+    for r in rows:
+        if r.rating_count:
+            ratings[str(r.set_num)] = _rating_entry(r)
+        if r.review_count:
+            review_counts[str(r.set_num)] = int(r.review_count)
 
-    with _price_cache_lock:
-        _price_cache["ts"] = time.monotonic()
-        _price_cache["val"] = result
-    return result
+    with _ratings_cache_lock:
+        # Don't replace a map another request already brought further forward.
+        if _ratings_cache["val"] is None or _ratings_cache["version"] <= version:
+            _ratings_cache["ts"] = swept_at
+            _ratings_cache["val"] = (ratings, review_counts)
+            _ratings_cache["version"] = version
+    return ratings, review_counts
 
 
 def _ratings_map(db: Session) -> Dict[str, Tuple[Optional[float], int]]:
@@ -267,27 +359,7 @@ def _ratings_map(db: Session) -> Dict[str, Tuple[Optional[float], int]]:
                 out[set_num] = (round(sum(vals) / len(vals), 2), len(vals))
         return out
 
-    now = time.monotonic()
-    with _ratings_cache_lock:
-        if now - _ratings_cache["ts"] < _RATINGS_TTL and _ratings_cache["val"] is not None:
-            return _ratings_cache["val"]
-
-    rows = db.execute(
-        select(ReviewModel.set_num, func.avg(ReviewModel.rating), func.count(ReviewModel.rating))
-        .where(ReviewModel.rating.is_not(None))
-        .group_by(ReviewModel.set_num)
-    ).all()
-
-    out: Dict[str, Tuple[Optional[float], int]] = {}
-    for set_num, avg, cnt in rows:
-        cnt_i = int(cnt or 0)
-        avg_f: Optional[float] = round(float(avg), 2) if (avg is not None and cnt_i > 0) else None
-        out[str(set_num)] = (avg_f, cnt_i)
-
-    with _ratings_cache_lock:
-        _ratings_cache["ts"] = time.monotonic()
-        _ratings_cache["val"] = out
-    return out
+    return _rating_maps(db)[0]
 
 
 def _review_counts_map(db: Session) -> Dict[str, int]:
@@ -304,161 +376,77 @@ def _review_counts_map(db: Session) -> Dict[str, int]:
             counts[key] = counts.get(key, 0) + 1
         return counts
 
-    now = time.monotonic()
-    with _review_counts_cache_lock:
-        if now - _review_counts_cache["ts"] < _RATINGS_TTL and _review_counts_cache["val"] is not None:
-            return _review_counts_cache["val"]
-
-    rows = db.execute(
-        select(ReviewModel.set_num, func.count(ReviewModel.id))
-        .where(
-            ReviewModel.text.is_not(None),
-            func.length(func.trim(ReviewModel.text)) > 0,
-        )
-        .group_by(ReviewModel.set_num)
-    ).all()
+    return _rating_maps(db)[1]
 
-    out: Dict[str, int] = {}
-    for set_num, cnt in rows:
-        out[str(set_num)] = int(cnt or 0)
 
-    with _review_counts_cache_lock:
-        _review_counts_cache["ts"] = time.monotonic()
-        _review_counts_cache["val"] = out
-    return out
+_suggest_cache_lock = threading.Lock()
+_suggest_building = threading.Lock()  # single flight for index builds
+_suggest_cache: Dict[str, Any] = {"ts": 0.0, "val": None}
+_SUGGEST_TTL = 600  # popularity in the autocomplete index may lag this long
 
 
-def _user_rating_for_set(
-    db: Session,
-    username: str,
-    set_num: str,
-    set_num_plain: Optional[str],
-) -> Optional[float]:
-    """
-    Return the user's most recent non-null rating for a set.
-    """
-    user_attr = getattr(ReviewModel, "user", None) or getattr(ReviewModel, "username", None)
-    if user_attr is None:
-        raise RuntimeError("ReviewModel is missing a user field (expected .user or .username)")
-
-    prop = getattr(user_attr, "property", None)
-    if isinstance(prop, RelationshipProperty):
-        UserRel = prop.mapper.class_
-        if hasattr(UserRel, "username"):
-            user_filter = user_attr.has(username=username)
-        elif hasattr(UserRel, "user"):
-            user_filter = user_attr.has(user=username)
-        elif hasattr(UserRel, "name"):
-            user_filter = user_attr.has(name=username)
-        else:
-            raise RuntimeError(
-                "ReviewModel.user is a relationship, but User model has no username/user/name field to filter on."
-            )
-    else:
-        user_filter = (user_attr == username)
-
-    order_col = getattr(ReviewModel, "created_at", None) or getattr(ReviewModel, "id", None)
-
-    def query_for(target_set_num: str):
-        q = (
-            select(ReviewModel.rating)
-            .where(
-                ReviewModel.set_num == target_set_num,
-                user_filter,
-                ReviewModel.rating.is_not(None),
-            )
-            .limit(1)
-        )
-        if order_col is not None:
-            q = q.order_by(order_col.desc())
-        return q
-
-    r = db.execute(query_for(set_num)).scalar_one_or_none()
-    if r is not None:
-        return float(r)
-
-    if set_num_plain:
-        r2 = db.execute(query_for(set_num_plain)).scalar_one_or_none()
-        if r2 is not None:
-            return float(r2)
-
-    return None
+def _build_suggest_index(db: Session, catalog: SetCatalog) -> AutocompleteIndex:
+    ratings = _ratings_map(db)
+    counts = catalog.scatter("rating_count", ratings, lambda v: v[1] or 0, 0, np.int64)
+    index = AutocompleteIndex(catalog.rows, counts, catalog.year)
 
+    with _suggest_cache_lock:
+        _suggest_cache["ts"] = time.monotonic()
+        _suggest_cache["val"] = (catalog, index)
+    return index
 
-# ---------------- on-demand price scrape ----------------
 
-import logging as _logging
+def _rebuild_suggest_in_background(catalog: SetCatalog) -> None:
+    db = SessionLocal()
+    try:
+        _build_suggest_index(db, catalog)
+    except Exception:
+        logger.exception("Autocomplete index rebuild failed")
+    finally:
+        db.close()
+        _suggest_building.release()
 
-_od_logger = _logging.getLogger("bricktrack.on_demand_scrape")
 
-def _try_on_demand_scrape(
-    db: Session,
-    canonical_set_num: str,
-    plain: str,
-    name: str,
-) -> List[Dict[str, Any]]:
+def _suggest_index(db: Session, catalog: SetCatalog) -> AutocompleteIndex:
     """
-    Scrape LEGO.com for a single set and create offers on the fly.
+    Autocomplete index for the current catalog.
 
-    Called when a user views a set that has no LEGO offer yet, so we
-    don't have to wait for the next batch scraper run.
+    Its row positions are only valid for the catalog it was built over, so a
+    catalog reload builds a new one inline; concurrent requests wait for that
+    one build. Popularity weights older than _SUGGEST_TTL are refreshed in a
+    background thread while the previous index keeps serving.
     """
-    from app.pipelines.price_scraper import (
-        scrape_lego_product_page,
-        build_amazon_url,
-        build_target_url,
-        build_walmart_url,
-        HEADERS,
-        REQUEST_TIMEOUT,
-    )
-    import httpx
-
-    now = datetime.now(timezone.utc)
-
-    try:
-        with httpx.Client(timeout=REQUEST_TIMEOUT) as client:
-            lego_data = scrape_lego_product_page(client, plain)
-    except Exception:
-        _od_logger.debug("On-demand scrape failed for %s", plain)
-        lego_data = None
-
-    # Upsert LEGO offer if scrape succeeded
-    if lego_data and lego_data.get("price"):
-        _upsert_on_demand_offer(
-            db, plain, "LEGO",
-            lego_data["price"], lego_data.get("currency", "USD"),
-            lego_data["url"], lego_data.get("in_stock"),
-            now,
-        )
-
-        # Also update Set.retail_price
-        set_row = db.execute(
-            select(SetModel).where(SetModel.set_num == canonical_set_num)
-        ).scalar_one_or_none()
-        if set_row:
-            set_row.retail_price = lego_data["price"]
-            set_row.retail_currency = lego_data.get("currency", "USD")
-
-    # Only create Amazon offer if we already have an ASIN for this set
-    existing_amazon = db.execute(
-        select(OfferModel).where(
-            OfferModel.set_num == plain,
-            OfferModel.store == "Amazon",
-            OfferModel.asin.isnot(None),
-        )
-    ).scalar_one_or_none()
-    if existing_amazon:
-        # Refresh the URL with current affiliate tag
-        _upsert_on_demand_offer(
-            db, plain, "Amazon", None, "USD",
-            build_amazon_url(plain, name, asin=existing_amazon.asin), None, now,
-        )
+    with _suggest_cache_lock:
+        cached, ts = _suggest_cache["val"], _suggest_cache["ts"]
+    if cached is None or cached[0] is not catalog:
+        with _suggest_building:
+            with _suggest_cache_lock:
+                cached = _suggest_cache["val"]
+            if cached is not None and cached[0] is catalog:
+                return cached[1]
+            return _build_suggest_index(db, catalog)
+
+    if time.monotonic() - ts >= _SUGGEST_TTL and _suggest_building.acquire(blocking=False):
+        threading.Thread(
+            target=_rebuild_suggest_in_background, args=(catalog,), name="suggest-index", daemon=True,
+        ).start()
+    return cached[1]
+
+
+def warm_caches(db: Session) -> None:
+    """
+    Fill the set view, the TTL-cached DB maps, the autocomplete index for
+    the current catalog and the homepage snapshot. Used by app.core.preload
+    before gunicorn forks workers.
+    """
+    set_view(db)
+    _ratings_map(db)
+    _review_counts_map(db)
+    _suggest_index(db, catalog_for(load_cached_sets()))
+    _homepage_snapshot(db)
 
-    db.commit()
-    price_str = lego_data["price"] if lego_data and lego_data.get("price") else "N/A"
-    _od_logger.info("On-demand scrape created offers for %s ($%s)", plain, price_str)
 
-    return offers_data.get_offers_for_set(db, plain)
+# ---------------- on-demand retailer links ----------------
 
 
 def _ensure_retailer_urls(
@@ -480,53 +468,16 @@ def _ensure_retailer_urls(
         )
     ).scalar_one_or_none()
     if existing_amazon:
-        _upsert_on_demand_offer(
-            db, plain, "Amazon", None, "USD",
-            build_amazon_url(plain, name, asin=existing_amazon.asin), None, now,
+        offers_data.upsert_offer(
+            db, plain, "Amazon", price=None, currency="USD",
+            url=build_amazon_url(plain, name, asin=existing_amazon.asin), in_stock=None, now=now,
         )
         db.commit()
-        _od_logger.info("Refreshed Amazon ASIN link for %s", plain)
+        logger.info("Refreshed Amazon ASIN link for %s", plain)
 
     return offers_data.get_offers_for_set(db, plain)
 
 
-def _upsert_on_demand_offer(
-    db: Session,
-    set_num_plain: str,
-    store: str,
-    price: Optional[float],
-    currency: str,
-    url: str,
-    in_stock: Optional[bool],
-    now: datetime,
-) -> None:
-    from sqlalchemy import and_
-    existing = db.execute(
-        select(OfferModel).where(
-            and_(OfferModel.set_num == set_num_plain, OfferModel.store == store)
-        )
-    ).scalar_one_or_none()
-
-    if existing:
-        if price is not None:
-            existing.price = price
-        existing.currency = currency
-        existing.url = url
-        if in_stock is not None:
-            existing.in_stock = in_stock
-        existing.last_checked = now
-    else:
-        db.add(OfferModel(
-            set_num=set_num_plain,
-            store=store,
-            price=price,
-            currency=currency,
-            url=url,
-            in_stock=in_stock,
-            last_checked=now,
-        ))
-
-
 # ---------------- endpoints ----------------
 
 @router.get("")
@@ -564,37 +515,33 @@ def list_sets(
     db: Session = Depends(get_db),
 ):
     all_sets = load_cached_sets()
-    sets = all_sets
+    catalog = catalog_for(all_sets)
+
+    # Work on an ordered array of row positions; filters are boolean masks
+    # over the catalog columns and only the final page is turned into dicts.
+    idx = np.arange(len(all_sets), dtype=np.intp)
 
     q_clean = (q or "").strip()
 
     if q_clean:
-        direct = [s for s in all_sets if _matches_query(s, q_clean)]
+        direct = [i for i, s in enumerate(all_sets) if _matches_query(s, q_clean)]
         if direct:
-            sets = direct
+            idx = np.asarray(direct, dtype=np.intp)
         else:
-            scored: List[Tuple[float, Dict[str, Any]]] = []
-            for s in all_sets:
-                score = _fuzzy_score_for_set(s, q_clean)
-                if score >= 0.55:
-                    scored.append((score, s))
-            scored.sort(key=lambda t: t[0], reverse=True)
-            sets = [s for _, s in scored[:100]]
+            fuzzy = _fuzzy_matches(catalog, q_clean, 0.55)
+            scored = sorted(fuzzy, key=lambda i: (-fuzzy[i], i))
+            idx = np.asarray(scored[:100], dtype=np.intp)
 
     if year is not None:
-        y = int(year)
-        sets = [s for s in sets if int(s.get("year") or 0) == y]
+        idx = idx[catalog.year[idx] == int(year)]
     else:
         if min_year is not None:
-            y0 = int(min_year)
-            sets = [s for s in sets if int(s.get("year") or 0) >= y0]
+            idx = idx[catalog.year[idx] >= int(min_year)]
         if max_year is not None:
-            y1 = int(max_year)
-            sets = [s for s in sets if int(s.get("year") or 0) <= y1]
+            idx = idx[catalog.year[idx] <= int(max_year)]
 
     if pieces is not None:
-        p = int(pieces)
-        sets = [s for s in sets if int(s.get("pieces") or 0) == p]
+        idx = idx[catalog.pieces[idx] == int(pieces)]
     else:
         lo = min_pieces
         hi = max_pieces
@@ -605,55 +552,38 @@ def list_sets(
             hi = max_parts if max_parts is not None else max_num_parts
 
         if lo is not None:
-            p0 = int(lo)
-            sets = [s for s in sets if int(s.get("pieces") or 0) >= p0]
+            idx = idx[catalog.pieces[idx] >= int(lo)]
         if hi is not None:
-            p1 = int(hi)
-            sets = [s for s in sets if int(s.get("pieces") or 0) <= p1]
+            idx = idx[catalog.pieces[idx] <= int(hi)]
 
     theme_clean = (theme or "").strip()
     if theme_clean:
-        tl = theme_clean.lower()
-        sets = [s for s in sets if (s.get("theme") or "").strip().lower() == tl]
+        code = catalog.theme_code_of(theme_clean)
+        idx = idx[catalog.theme_code[idx] == code] if code is not None else idx[:0]
 
-    prices = _price_map(db) if (min_price is not None or max_price is not None) else {}
+    prices = _price_map(db)
+    price_col = catalog.scatter("retail_price", prices, float, np.nan)
     if min_price is not None:
-        sets = [s for s in sets if prices.get(s.get("set_num") or "", 0) >= min_price]
+        p = price_col[idx]
+        idx = idx[np.where(np.isnan(p), 0.0, p) >= min_price]
     if max_price is not None:
-        sets = [s for s in sets if 0 < prices.get(s.get("set_num") or "", float("inf")) <= max_price]
+        p = price_col[idx]
+        idx = idx[~np.isnan(p) & (p > 0) & (p <= max_price)]
 
     if availability is not None:
         allowed = set(v.strip().lower() for v in availability.split(",") if v.strip())
-        status_rows = db.execute(
-            select(SetModel.set_num, SetModel.retirement_status)
-            .where(SetModel.retirement_status.in_([v for v in allowed]))
-        ).all()
-        allowed_nums = {r.set_num for r in status_rows}
-        sets = [s for s in sets if (s.get("set_num") or "") in allowed_nums]
+        view = set_view(db)
+        status_col = catalog.scatter("retirement_status", view.status_by_set, int, -1, np.int32)
+        codes = [view.status_codes[v] for v in allowed if v in view.status_codes]
+        idx = idx[np.isin(status_col[idx], codes)]
 
     ratings = _ratings_map(db)
     review_counts = _review_counts_map(db)
-    if not prices:
-        prices = _price_map(db)
-
-    enriched: List[Dict[str, Any]] = []
-    for s in sets:
-        canonical = s.get("set_num") or ""
-        avg, cnt = ratings.get(canonical, (None, 0))
-        rev_cnt = int(review_counts.get(canonical, 0))
-
-        r = dict(s)
-        price = prices.get(canonical)
-        if price is not None:
-            r["retail_price"] = price
-        r["_avg_rating"] = avg
-        r["_rating_count"] = cnt
-        r["_review_count"] = rev_cnt
-        enriched.append(r)
+    avg_col = catalog.scatter("rating_avg", ratings, lambda v: v[0] or 0.0, 0.0)
+    cnt_col = catalog.scatter("rating_count", ratings, lambda v: v[1] or 0, 0, np.int64)
 
     if min_rating is not None:
-        mr = float(min_rating)
-        enriched = [r for r in enriched if (r.get("_avg_rating") or 0.0) >= mr]
+        idx = idx[avg_col[idx] >= float(min_rating)]
 
     allowed_sorts = {"relevance", "name", "year", "pieces", "rating", "price"}
     if sort not in allowed_sorts:
@@ -663,38 +593,26 @@ def list_sets(
         order = "desc" if sort in {"relevance", "rating"} else "asc"
     reverse = (order == "desc")
 
-    if sort == "relevance":
-        if q_clean:
-            for r in enriched:
-                r["_relevance"] = _relevance_score(r, q_clean)
-            enriched.sort(
-                key=lambda r: (
-                    r.get("_relevance") or 0,
-                    int(r.get("year") or 0),
-                    r.get("_rating_count") or 0,
-                    (r.get("_avg_rating") or 0.0),
-                ),
-                reverse=True,
-            )
-        else:
-            enriched.sort(key=_sort_key("year"), reverse=True)
-    else:
-        enriched.sort(key=_sort_key(sort), reverse=reverse)
-
-    total = len(enriched)
+    total = len(idx)
     start = (page - 1) * limit
     end = start + limit
-    page_rows = enriched[start:end]
 
-    for r in page_rows:
-        avg = r.pop("_avg_rating", None)
-        cnt = r.pop("_rating_count", 0)
-        rev_cnt = r.pop("_review_count", 0)
-        r.pop("_relevance", None)
+    head = _sorted_head(catalog, idx, sort, reverse, q_clean, price_col, avg_col, cnt_col, end)
+
+    page_rows: List[Dict[str, Any]] = []
+    for i in head[start:end]:
+        s = all_sets[i]
+        canonical = s.get("set_num") or ""
+        avg, cnt = ratings.get(canonical, (None, 0))
 
+        r = dict(s)
+        price = prices.get(canonical)
+        if price is not None:
+            r["retail_price"] = price
         r["rating_avg"] = avg
         r["rating_count"] = int(cnt or 0)
-        r["review_count"] = int(rev_cnt or 0)
+        r["review_count"] = int(review_counts.get(canonical, 0) or 0)
+        page_rows.append(r)
 
     response.headers["X-Total-Count"] = str(total)
     offers_data.enrich_with_best_prices(db, page_rows)
@@ -710,55 +628,38 @@ def suggest_sets(
     limit: int = Query(6, ge=1, le=20),
     db: Session = Depends(get_db),
 ):
-    q_clean = (q or "").strip().lower()
+    q_clean = " ".join((q or "").lower().split())
     if not q_clean:
         return []
 
-    all_sets = load_cached_sets()
-    ratings = _ratings_map(db)
-
-    candidates: List[Tuple[float, int, int, Dict[str, Any]]] = []
-    for s in all_sets:
-        name = (s.get("name") or "").lower()
-        theme = (s.get("theme") or "").lower()
-        set_num = (s.get("set_num") or "").lower()
-        plain = (s.get("set_num_plain") or "").lower()
-
-        base_score = 0.0
-        direct = False
-
-        if plain and plain == q_clean:
-            base_score += 120
-            direct = True
-        if set_num and set_num == q_clean:
-            base_score += 110
-            direct = True
-        if name.startswith(q_clean):
-            base_score += 80
-            direct = True
-        if q_clean in name:
-            base_score += 60
-            direct = True
-        if q_clean in theme:
-            base_score += 30
-            direct = True
-
-        if not direct:
-            fuzzy = _fuzzy_score_for_set(s, q_clean)
-            if fuzzy < 0.5:
-                continue
-            base_score += fuzzy * 50.0
-
-        canonical = s.get("set_num") or ""
-        _, cnt = ratings.get(canonical, (None, 0))
-        pop_score = min(int(cnt), 50)
-
-        total_score = base_score + pop_score
-        year = int(s.get("year") or 0)
-        candidates.append((total_score, int(cnt), year, s))
-
-    candidates.sort(key=lambda t: (t[0], t[1], t[2]), reverse=True)
-    top = [s for _, _, _, s in candidates[:limit]]
+    catalog = catalog_for(load_cached_sets())
+    index = _suggest_index(db, catalog)
+
+    picked: List[int] = []
+    exact = catalog.position(q_clean)
+    if exact is not None:
+        picked.append(exact)
+    for i in index.top(q_clean, min(limit + 1, index.TOP_K)):
+        if i not in picked:
+            picked.append(i)
+
+    if len(picked) < limit:
+        # No (or too few) prefix hits: fill from the fuzzy matcher, ranked
+        # the way the old linear scan weighed fuzzy ratio and popularity.
+        fuzzy = _fuzzy_matches(catalog, q_clean, 0.5)
+        ranked = sorted(
+            fuzzy,
+            key=lambda i: (
+                -(fuzzy[i] * 50.0 + min(int(index.popularity[i]), 50)),
+                -int(index.popularity[i]),
+                -int(index.year[i]),
+            ),
+        )
+        for i in ranked:
+            if len(picked) >= limit:
+                break
+            if i not in picked:
+                picked.append(i)
 
     return [
         {
@@ -767,7 +668,7 @@ def suggest_sets(
             "ip": s.get("ip") or s.get("theme"),
             "year": s.get("year"),
         }
-        for s in top
+        for s in (catalog.rows[i] for i in picked[:limit])
     ]
 
 
@@ -782,6 +683,25 @@ def get_set_rating_summary(set_num: str, db: Session = Depends(get_db)):
     return {"set_num": canonical, "average": avg, "count": cnt}
 
 
+@router.get("/{set_num}/rating-histogram")
+def get_set_rating_histogram(set_num: str, db: Session = Depends(get_db)):
+    """Half-star rating counts for a set, keyed "0.5" ... "5.0"."""
+    s = get_set_by_num(set_num)
+    if not s:
+        raise HTTPException(status_code=404, detail="Set not found")
+
+    canonical = s.get("set_num") or set_num
+    avg, cnt = _rating_stats_for_set(db, canonical)
+    if _use_memory_reviews():
+        hist = empty_histogram()
+        for r in (reviews_data.REVIEWS or []):
+            if str(r.get("set_num")) == canonical and r.get("rating") is not None:
+                hist[histogram_key(r["rating"])] += 1
+    else:
+        hist = histograms_for(db, [canonical])[canonical]
+    return {"set_num": canonical, "average": avg, "count": cnt, "histogram": hist}
+
+
 @router.get("/{set_num}/offers")
 def get_set_offers(set_num: str, db: Session = Depends(get_db)):
     s = get_set_by_num(set_num)
@@ -794,10 +714,11 @@ def get_set_offers(set_num: str, db: Session = Depends(get_db)):
 
     offers = offers_data.get_offers_for_set(db, plain)
 
-    # On-demand scrape: if no LEGO offer exists, try LEGO.com right now
+    # No LEGO offer yet: queue a LEGO.com scrape and answer with what we have
+    refreshing = False
     has_lego_offer = any(o.get("store") == "LEGO" for o in offers)
     if not has_lego_offer:
-        offers = _try_on_demand_scrape(db, canonical, plain, name)
+        refreshing = offer_refresh.request_refresh(canonical, plain, name)
     else:
         # Ensure retailer search URLs exist even if LEGO offer was created by batch pipeline
         has_retailer_urls = any(o.get("store") in ("Amazon", "Target", "Walmart") for o in offers)
@@ -813,18 +734,41 @@ def get_set_offers(set_num: str, db: Session = Depends(get_db)):
 
     return {
         "set_num": canonical,
-        "summary": {"status": "unknown", "best_offer_id": None, "updated_at": updated_at},
+        "summary": {
+            "status": "unknown",
+            "best_offer_id": None,
+            "updated_at": updated_at,
+            "refreshing": refreshing,
+        },
         "offers": offers,
     }
 
 
+@router.get("/{set_num}/price-history")
+def get_set_price_history(
+    set_num: str,
+    days: int = Query(90, ge=1, le=730),
+    store: Optional[List[str]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """Per-store price series from the offer price rollups (daily, or weekly past 120 days)."""
+    s = get_set_by_num(set_num)
+    if not s:
+        raise HTTPException(status_code=404, detail="Set not found")
+
+    canonical = s.get("set_num") or set_num
+    plain = s.get("set_num_plain") or canonical.split("-")[0]
+    return {"set_num": canonical, "days": days, **price_history(db, plain, days, stores=store)}
+
+
 @router.get(
     "/bulk",
     response_model=List[SetBulkOut],
     summary="Bulk fetch sets",
     description=(
         "Fetch multiple sets by set_num. Returns cached set fields plus rating stats "
-        "(rating_avg, rating_count) and review_count (non-empty text). If authenticated, includes user_rating."
+        "(rating_avg, rating_count) and review_count (non-empty text). If authenticated, includes "
+        "user_rating, is_owned and in_wishlist."
     ),
 )
 def bulk_get_sets(
@@ -846,73 +790,40 @@ def bulk_get_sets(
 
     found: List[Dict[str, Any]] = []
     canonicals: List[str] = []
-    plain_map: Dict[str, Optional[str]] = {}
 
     for x in requested:
         s = get_set_by_num(x)
         if not s:
             continue
-        canonical = s.get("set_num") or x
-        canonicals.append(canonical)
-        plain_map[canonical] = s.get("set_num_plain")
+        canonicals.append(s.get("set_num") or x)
         found.append(s)
 
     if not canonicals:
         return []
 
-    rows = db.execute(
-        select(
-            ReviewModel.set_num,
-            func.avg(ReviewModel.rating),
-            func.count(ReviewModel.rating),
-        )
-        .where(
-            ReviewModel.rating.is_not(None),
-            ReviewModel.set_num.in_(canonicals),
-        )
-        .group_by(ReviewModel.set_num)
-    ).all()
-
-    ratings: Dict[str, Tuple[Optional[float], int]] = {}
-    for set_num, avg, cnt in rows:
-        cnt_i = int(cnt or 0)
-        avg_f: Optional[float] = round(float(avg), 2) if (avg is not None and cnt_i > 0) else None
-        ratings[str(set_num)] = (avg_f, cnt_i)
-
-    review_rows = db.execute(
-        select(
-            ReviewModel.set_num,
-            func.count(ReviewModel.id),
-        )
-        .where(
-            ReviewModel.set_num.in_(canonicals),
-            ReviewModel.text.is_not(None),
-            func.length(func.trim(ReviewModel.text)) > 0,
-        )
-        .group_by(ReviewModel.set_num)
-    ).all()
-
-    review_counts: Dict[str, int] = {}
-    for set_num, cnt in review_rows:
-        review_counts[str(set_num)] = int(cnt or 0)
+    ratings = _ratings_map(db)
+    review_counts = _review_counts_map(db)
 
-    username: Optional[str] = current_user.username if current_user else None
+    user_ratings: Dict[str, float] = {}
+    memberships: Dict[str, set] = {}
+    if current_user:
+        user_ratings = _user_ratings_for_sets(db, current_user.id, found)
+        memberships = _user_list_memberships(db, current_user.id, found)
 
     out: List[Dict[str, Any]] = []
     for s in found:
         canonical = s.get("set_num") or ""
         avg, cnt = ratings.get(canonical, (None, 0))
-        rev_cnt = int(review_counts.get(canonical, 0))
-
-        user_rating = None
-        if username:
-            user_rating = _user_rating_for_set(db, username, canonical, plain_map.get(canonical))
 
         r = dict(s)
         r["rating_avg"] = avg
         r["rating_count"] = int(cnt or 0)
-        r["review_count"] = int(rev_cnt or 0)
-        r["user_rating"] = user_rating
+        r["review_count"] = int(review_counts.get(canonical, 0))
+        r["user_rating"] = user_ratings.get(canonical)
+        if current_user:
+            keys = memberships.get(canonical, ())
+            r["is_owned"] = "owned" in keys
+            r["in_wishlist"] = "wishlist" in keys
         out.append(r)
 
     offers_data.enrich_with_best_prices(db, out)
@@ -971,24 +882,22 @@ def list_new_sets(
     - With `days=N`: returns sets launched within the last N days.
     """
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    base_q = select(SetModel).where(
-        SetModel.launch_date.isnot(None),
-        SetModel.launch_date <= today,  # Only sets that have actually launched
-    )
-
+    cutoff = None
     if days is not None:
         cutoff = (datetime.now(timezone.utc) - timedelta(days=int(days))).strftime("%Y-%m-%d")
-        base_q = base_q.where(SetModel.launch_date >= cutoff)
 
-    base_q = base_q.order_by(SetModel.launch_date.desc(), SetModel.set_num.asc())
+    # Newest first; only sets that have actually launched
+    matching = [
+        s for s in set_view(db).by_launch_desc
+        if s["launch_date"] <= today and (cutoff is None or s["launch_date"] >= cutoff)
+    ]
 
     # Total count
-    total = db.execute(select(func.count()).select_from(base_q.subquery())).scalar_one()
-    response.headers["X-Total-Count"] = str(total)
+    response.headers["X-Total-Count"] = str(len(matching))
 
     # Pagination
     offset = (page - 1) * limit
-    rows = db.execute(base_q.offset(offset).limit(limit)).scalars().all()
+    rows = matching[offset:offset + limit]
 
     # Ratings enrichment
     ratings = _ratings_map(db)
@@ -996,23 +905,23 @@ def list_new_sets(
 
     out: List[Dict[str, Any]] = []
     for s in rows:
-        canonical = s.set_num
+        canonical = s["set_num"]
         avg, cnt = ratings.get(canonical, (None, 0))
         rev_cnt = int(review_counts.get(canonical, 0))
 
         out.append(
             {
-                "set_num": s.set_num,
-                "name": s.name,
-                "year": s.year,
-                "theme": s.theme,
-                "pieces": s.pieces,
-                "image_url": s.image_url,
+                "set_num": s["set_num"],
+                "name": s["name"],
+                "year": s["year"],
+                "theme": s["theme"],
+                "pieces": s["pieces"],
+                "image_url": s["image_url"],
                 "rating_avg": avg,
                 "rating_count": int(cnt or 0),
                 "review_count": int(rev_cnt or 0),
-                "retail_price": s.retail_price,
-                "launch_date": s.launch_date,
+                "retail_price": s["retail_price"],
+                "launch_date": s["launch_date"],
             }
         )
 
@@ -1039,37 +948,11 @@ def list_deals(
     Sets currently on sale — where the best in-stock offer is below retail price.
     Returns sets enriched with discount_pct, savings, sale_price, original_price.
     """
-    # Subquery: best (cheapest) in-stock offer per set
-    # Exclude aftermarket sellers (BrickLink) — not comparable to retail deals
-    best_offer_sq = (
-        select(
-            OfferModel.set_num,
-            func.min(OfferModel.price).label("best_price"),
-        )
-        .where(
-            OfferModel.price.isnot(None),
-            func.coalesce(OfferModel.in_stock, True).is_(True),
-            OfferModel.store != "BrickLink",
-        )
-        .group_by(OfferModel.set_num)
-        .subquery()
-    )
-
-    # Join sets with their best offer, filter where best_price < retail_price
+    # Sets whose best offer (app.data.best_prices) is below retail
     q = (
-        select(
-            SetModel,
-            best_offer_sq.c.best_price,
-        )
-        .join(
-            best_offer_sq,
-            SetModel.set_num == func.concat(best_offer_sq.c.set_num, "-1"),
-        )
-        .where(
-            SetModel.retail_price.isnot(None),
-            SetModel.retail_price > 0,
-            best_offer_sq.c.best_price < SetModel.retail_price,
-        )
+        select(SetModel, SetBestPrice)
+        .join(SetBestPrice, SetBestPrice.set_num == SetModel.set_num)
+        .where(SetBestPrice.discount_pct > 0)
     )
 
     # Theme filter
@@ -1079,17 +962,11 @@ def list_deals(
 
     # Min discount filter
     if min_discount is not None:
-        q = q.where(
-            (1.0 - best_offer_sq.c.best_price / SetModel.retail_price) * 100 >= min_discount
-        )
+        q = q.where(SetBestPrice.discount_pct >= min_discount)
 
     # Max price filter
     if max_price is not None:
-        q = q.where(best_offer_sq.c.best_price <= max_price)
-
-    # Sorting
-    discount_expr = (1.0 - best_offer_sq.c.best_price / SetModel.retail_price)
-    savings_expr = SetModel.retail_price - best_offer_sq.c.best_price
+        q = q.where(SetBestPrice.best_price <= max_price)
 
     allowed_sorts = {"discount", "price", "savings", "name"}
     if sort not in allowed_sorts:
@@ -1100,11 +977,11 @@ def list_deals(
     reverse = (order == "desc")
 
     if sort == "discount":
-        order_col = discount_expr.desc() if reverse else discount_expr.asc()
+        order_col = SetBestPrice.discount_pct.desc() if reverse else SetBestPrice.discount_pct.asc()
     elif sort == "price":
-        order_col = best_offer_sq.c.best_price.asc() if not reverse else best_offer_sq.c.best_price.desc()
+        order_col = SetBestPrice.best_price.asc() if not reverse else SetBestPrice.best_price.desc()
     elif sort == "savings":
-        order_col = savings_expr.desc() if reverse else savings_expr.asc()
+        order_col = SetBestPrice.savings.desc() if reverse else SetBestPrice.savings.asc()
     else:  # name
         order_col = SetModel.name.asc() if not reverse else SetModel.name.desc()
 
@@ -1125,16 +1002,8 @@ def list_deals(
     # Collect themes for the filter dropdown
     theme_q = (
         select(func.distinct(SetModel.theme))
-        .join(
-            best_offer_sq,
-            SetModel.set_num == func.concat(best_offer_sq.c.set_num, "-1"),
-        )
-        .where(
-            SetModel.retail_price.isnot(None),
-            SetModel.retail_price > 0,
-            best_offer_sq.c.best_price < SetModel.retail_price,
-            SetModel.theme.isnot(None),
-        )
+        .join(SetBestPrice, SetBestPrice.set_num == SetModel.set_num)
+        .where(SetBestPrice.discount_pct > 0, SetModel.theme.isnot(None))
     )
     deal_themes = sorted(
         [r[0] for r in db.execute(theme_q).all() if r[0]],
@@ -1142,15 +1011,15 @@ def list_deals(
     )
 
     out: List[Dict[str, Any]] = []
-    for s, best_price in rows:
+    for s, best in rows:
         canonical = s.set_num
         avg, cnt = ratings.get(canonical, (None, 0))
         rev_cnt = int(review_counts.get(canonical, 0))
 
-        retail = float(s.retail_price)
-        sale = float(best_price)
-        savings = round(retail - sale, 2)
-        discount_pct = round((1.0 - sale / retail) * 100)
+        retail = float(best.retail_price)
+        sale = float(best.best_price)
+        savings = round(best.savings, 2)
+        discount_pct = round(best.discount_pct)
 
         out.append(
             {
@@ -1195,42 +1064,78 @@ def list_retiring_sets(
     Sets with retirement_status='retiring_soon', ordered by retirement_date.
     Returns empty until retirement data is populated (via BrickEconomy or manual curation).
     """
-    base_q = (
-        select(SetModel)
-        .where(SetModel.retirement_status == "retiring_soon")
-        .order_by(SetModel.retirement_date.asc(), SetModel.name.asc())
-    )
-
-    total = db.execute(select(func.count()).select_from(base_q.subquery())).scalar_one()
-    response.headers["X-Total-Count"] = str(total)
+    matching = set_view(db).retiring
+    response.headers["X-Total-Count"] = str(len(matching))
 
     offset = (page - 1) * limit
-    rows = db.execute(base_q.offset(offset).limit(limit)).scalars().all()
+    rows = matching[offset:offset + limit]
 
     ratings = _ratings_map(db)
     review_counts = _review_counts_map(db)
 
     out: List[Dict[str, Any]] = []
     for s in rows:
-        canonical = s.set_num
+        canonical = s["set_num"]
         avg, cnt = ratings.get(canonical, (None, 0))
         rev_cnt = int(review_counts.get(canonical, 0))
 
         out.append(
             {
-                "set_num": s.set_num,
-                "name": s.name,
-                "year": s.year,
-                "theme": s.theme,
-                "pieces": s.pieces,
-                "image_url": s.image_url,
+                "set_num": s["set_num"],
+                "name": s["name"],
+                "year": s["year"],
+                "theme": s["theme"],
+                "pieces": s["pieces"],
+                "image_url": s["image_url"],
                 "rating_avg": avg,
                 "rating_count": int(cnt or 0),
                 "review_count": int(rev_cnt or 0),
-                "retail_price": s.retail_price,
-                "retirement_date": s.retirement_date,
-                "exit_date": s.exit_date,
-                "set_tag": s.set_tag,
+                "retail_price": s["retail_price"],
+                "retirement_date": s["retirement_date"],
+                "exit_date": s["exit_date"],
+                "set_tag": s["set_tag"],
+            }
+        )
+
+    offers_data.enrich_with_best_prices(db, out)
+    _enrich_with_tags(db, out)
+    return out
+
+
+@router.get("/trending")
+def list_trending_sets(
+    limit: int = Query(24, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Sets with the most recent activity (reviews, owned/wishlist adds,
+    affiliate clicks), each event's weight halving every week.
+    """
+    view = set_view(db)
+    ratings = _ratings_map(db)
+    review_counts = _review_counts_map(db)
+
+    out: List[Dict[str, Any]] = []
+    for canonical, score in trending_data.top_sets(db, limit):
+        s = view.get(canonical)
+        if s is None:
+            continue
+        avg, cnt = ratings.get(canonical, (None, 0))
+        out.append(
+            {
+                "set_num": s["set_num"],
+                "name": s["name"],
+                "year": s["year"],
+                "theme": s["theme"],
+                "pieces": s["pieces"],
+                "image_url": s["image_url"],
+                "rating_avg": avg,
+                "rating_count": int(cnt or 0),
+                "review_count": int(review_counts.get(canonical, 0)),
+                "retail_price": s["retail_price"],
+                "retirement_status": s["retirement_status"],
+                "set_tag": s["set_tag"],
+                "trending_score": round(score, 3),
             }
         )
 
@@ -1250,30 +1155,24 @@ def list_coming_soon_sets(
     Sets found on LEGO.com's coming-soon page (scraped by coming_soon_scraper).
     Only returns sets explicitly listed by LEGO as upcoming.
     """
-    base_q = (
-        select(SetModel)
-        .where(SetModel.lego_com_coming_soon.is_(True))
-        .order_by(SetModel.launch_date.asc().nulls_last(), SetModel.name.asc())
-    )
-
-    total = db.execute(select(func.count()).select_from(base_q.subquery())).scalar_one()
-    response.headers["X-Total-Count"] = str(total)
+    matching = set_view(db).coming_soon
+    response.headers["X-Total-Count"] = str(len(matching))
 
     offset = (page - 1) * limit
-    rows = db.execute(base_q.offset(offset).limit(limit)).scalars().all()
+    rows = matching[offset:offset + limit]
 
     out: List[Dict[str, Any]] = []
     for s in rows:
         out.append(
             {
-                "set_num": s.set_num,
-                "name": s.name,
-                "year": s.year,
-                "theme": s.theme,
-                "pieces": s.pieces,
-                "image_url": s.image_url,
-                "retail_price": s.retail_price,
-                "launch_date": s.launch_date,
+                "set_num": s["set_num"],
+                "name": s["name"],
+                "year": s["year"],
+                "theme": s["theme"],
+                "pieces": s["pieces"],
+                "image_url": s["image_url"],
+                "retail_price": s["retail_price"],
+                "launch_date": s["launch_date"],
             }
         )
 
@@ -1333,17 +1232,13 @@ def retiring_page_config(db: Session = Depends(get_db)):
 # Homepage aggregated data
 # ===================================================================
 
-@router.get("/homepage")
-def homepage_data(
-    request: Request,
-    db: Session = Depends(get_db),
-):
+def _build_homepage(db: Session) -> Dict[str, Any]:
     """
-    Single endpoint returning all data the homepage needs:
+    All data the homepage needs:
     - featured: top-rated available sets (with images)
     - deals: best current deals (discount_pct > 0)
     - retiring: sets retiring soon
-    - trending: most-reviewed sets
+    - trending: most active sets lately (reviews, collection adds, clicks)
     """
     ratings = _ratings_map(db)
     review_counts = _review_counts_map(db)
@@ -1402,43 +1297,20 @@ def homepage_data(
                     break
 
     # --- Deals: best current deals ---
-    best_offer_sq = (
-        select(
-            OfferModel.set_num,
-            func.min(OfferModel.price).label("best_price"),
-        )
-        .where(
-            OfferModel.price.isnot(None),
-            func.coalesce(OfferModel.in_stock, True).is_(True),
-            OfferModel.store != "BrickLink",
-        )
-        .group_by(OfferModel.set_num)
-        .subquery()
-    )
-
     deal_rows = db.execute(
-        select(SetModel, best_offer_sq.c.best_price)
-        .join(
-            best_offer_sq,
-            SetModel.set_num == func.concat(best_offer_sq.c.set_num, "-1"),
-        )
-        .where(
-            SetModel.retail_price.isnot(None),
-            SetModel.retail_price > 0,
-            best_offer_sq.c.best_price < SetModel.retail_price,
-        )
-        .order_by(
-            (1.0 - best_offer_sq.c.best_price / SetModel.retail_price).desc()
-        )
+        select(SetModel, SetBestPrice)
+        .join(SetBestPrice, SetBestPrice.set_num == SetModel.set_num)
+        .where(SetBestPrice.discount_pct > 0)
+        .order_by(SetBestPrice.discount_pct.desc())
         .limit(12)
     ).all()
 
     deals = []
-    for s, best_price in deal_rows:
-        retail = float(s.retail_price)
-        sale = float(best_price)
-        savings = round(retail - sale, 2)
-        discount_pct = round((1.0 - sale / retail) * 100)
+    for s, best in deal_rows:
+        retail = float(best.retail_price)
+        sale = float(best.best_price)
+        savings = round(best.savings, 2)
+        discount_pct = round(best.discount_pct)
         deals.append(_set_to_dict(s, {
             "original_price": retail,
             "sale_price": sale,
@@ -1457,17 +1329,27 @@ def homepage_data(
     retiring = [_set_to_dict(s, {"retirement_date": s.retirement_date, "exit_date": s.exit_date}) for s in retiring_rows]
     offers_data.enrich_with_best_prices(db, retiring)
 
-    # --- Trending: most-reviewed sets ---
-    trending_rows = db.execute(
-        select(SetModel, func.count(ReviewModel.id).label("rev_count"))
-        .join(ReviewModel, ReviewModel.set_num == SetModel.set_num)
-        .where(ReviewModel.text.isnot(None), ReviewModel.text != "")
-        .group_by(SetModel.set_num)
-        .order_by(func.count(ReviewModel.id).desc())
-        .limit(6)
-    ).all()
-
-    trending = [_set_to_dict(s) for s, _ in trending_rows]
+    # --- Trending: highest decayed activity score (app.data.trending) ---
+    top = trending_data.top_sets(db, 6)
+    trending_sets = {
+        s.set_num: s
+        for s in db.execute(
+            select(SetModel).where(SetModel.set_num.in_([sn for sn, _ in top]))
+        ).scalars()
+    } if top else {}
+    trending = [_set_to_dict(trending_sets[sn]) for sn, _ in top if sn in trending_sets]
+
+    if not trending:
+        # No recorded activity yet: most-reviewed sets
+        trending_rows = db.execute(
+            select(SetModel, func.count(ReviewModel.id).label("rev_count"))
+            .join(ReviewModel, ReviewModel.set_num == SetModel.set_num)
+            .where(ReviewModel.text.isnot(None), ReviewModel.text != "")
+            .group_by(SetModel.set_num)
+            .order_by(func.count(ReviewModel.id).desc())
+            .limit(6)
+        ).all()
+        trending = [_set_to_dict(s) for s, _ in trending_rows]
 
     _enrich_with_tags(db, featured)
     _enrich_with_tags(db, deals)
@@ -1481,6 +1363,88 @@ def homepage_data(
     }
 
 
+# The homepage is served from a pre-encoded snapshot. Its stamp is the set
+# view version, which moves when a pipeline (price scrape, Brickset sync, ...)
+# invalidates the view, plus the RATINGS feed version, which review writes
+# bump. A changed stamp or an old snapshot triggers a rebuild in a background
+# thread while requests keep getting the previous snapshot; only the very
+# first request builds inline.
+_HOMEPAGE_MAX_AGE = 600  # seconds; trending and deals drift without a signal
+
+_homepage_lock = threading.Lock()
+_homepage_building = threading.Lock()
+_homepage_state: Dict[str, Any] = {"val": None, "version": 0}
+
+
+def _homepage_stamp(db: Session) -> Tuple[int, int]:
+    return (set_view(db).version, feed.version(RATINGS))
+
+
+def _build_homepage_snapshot(db: Session) -> Dict[str, Any]:
+    # Read the stamp first: a change landing mid-build triggers another one.
+    stamp = _homepage_stamp(db)
+    body = json.dumps(jsonable_encoder(_build_homepage(db)), separators=(",", ":")).encode()
+    with _homepage_lock:
+        version = _homepage_state["version"] + 1
+        snap = {
+            "version": version,
+            "stamp": stamp,
+            "built": time.monotonic(),
+            "body": body,
+            "etag": f'"{hashlib.sha1(body).hexdigest()[:20]}"',
+        }
+        _homepage_state["val"] = snap
+        _homepage_state["version"] = version
+    return snap
+
+
+def _rebuild_homepage_in_background() -> None:
+    db = SessionLocal()
+    try:
+        _build_homepage_snapshot(db)
+    except Exception:
+        logger.exception("Homepage snapshot rebuild failed")
+    finally:
+        db.close()
+        _homepage_building.release()
+
+
+def _homepage_snapshot(db: Session) -> Dict[str, Any]:
+    stamp = _homepage_stamp(db)
+    with _homepage_lock:
+        snap = _homepage_state["val"]
+    if snap is None:
+        with _homepage_building:
+            with _homepage_lock:
+                snap = _homepage_state["val"]
+            return snap if snap is not None else _build_homepage_snapshot(db)
+
+    stale = snap["stamp"] != stamp or time.monotonic() - snap["built"] >= _HOMEPAGE_MAX_AGE
+    if stale and _homepage_building.acquire(blocking=False):
+        threading.Thread(target=_rebuild_homepage_in_background, name="homepage-snapshot", daemon=True).start()
+    return snap
+
+
+def invalidate_homepage() -> None:
+    """Drop the snapshot; the next request rebuilds it inline."""
+    with _homepage_lock:
+        _homepage_state["val"] = None
+
+
+@router.get("/homepage")
+def homepage_data(
+    request: Request,
+    db: Session = Depends(get_db),
+):
+    """The homepage payload (see _build_homepage), with an ETag."""
+    snap = _homepage_snapshot(db)
+    etag = snap["etag"]
+    if_none_match = request.headers.get("if-none-match") or ""
+    if etag in {t.strip().removeprefix("W/") for t in if_none_match.split(",")}:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=snap["body"], media_type="application/json", headers={"ETag": etag})
+
+
 # ── Quick explore card auto-generation ──────────────────────────
 
 _CARD_COLORS = {
@@ -1571,24 +1535,8 @@ def _generate_explore_cards(db: Session) -> List[Dict[str, str]]:
         })
 
     # --- On Sale ---
-    from ..models import Offer as OfferModel2
-    best_offer_sq = (
-        select(
-            OfferModel2.set_num,
-            func.min(OfferModel2.price).label("best_price"),
-        )
-        .where(OfferModel2.price > 0)
-        .group_by(OfferModel2.set_num)
-        .subquery()
-    )
     deals_count = db.execute(
-        select(func.count()).select_from(SetModel)
-        .join(best_offer_sq, best_offer_sq.c.set_num == SetModel.set_num)
-        .where(
-            SetModel.retail_price.isnot(None),
-            SetModel.retail_price > 0,
-            best_offer_sq.c.best_price < SetModel.retail_price,
-        )
+        select(func.count()).select_from(SetBestPrice).where(SetBestPrice.discount_pct > 0)
     ).scalar_one()
     if deals_count >= 3:
         candidates.append({
@@ -1701,6 +1649,141 @@ def collection_stats(set_num: str, db: Session = Depends(get_db)):
     }
 
 
+def _set_num_keys(sets: List[Dict[str, Any]]) -> Tuple[set, Dict[str, str]]:
+    """
+    Per-user rows (reviews, list items) may be stored under the canonical or
+    the plain set number. Returns every key to look up for catalog rows
+    *sets* and the plain -> canonical mapping to fold results back with.
+    """
+    plain_to_canonical: Dict[str, str] = {}
+    for s in sets:
+        canonical = s.get("set_num")
+        plain = s.get("set_num_plain")
+        if plain and canonical and plain != canonical:
+            plain_to_canonical[plain] = canonical
+    keys = {s.get("set_num") for s in sets if s.get("set_num")} | set(plain_to_canonical)
+    return keys, plain_to_canonical
+
+
+def _user_ratings_for_sets(
+    db: Session,
+    user_id: int,
+    sets: List[Dict[str, Any]],
+) -> Dict[str, float]:
+    """
+    canonical set_num -> the user's non-null rating, for catalog rows *sets*.
+
+    Reviews may be stored under the canonical or the plain set number; the
+    canonical one wins. One query on (user_id, set_num) for all of *sets*.
+    """
+    keys, plain_to_canonical = _set_num_keys(sets)
+    if not keys:
+        return {}
+
+    rows = db.execute(
+        select(ReviewModel.set_num, ReviewModel.rating).where(
+            ReviewModel.user_id == user_id,
+            ReviewModel.set_num.in_(keys),
+            ReviewModel.rating.is_not(None),
+        )
+    ).all()
+
+    out: Dict[str, float] = {}
+    for sn, rating in rows:
+        if sn in plain_to_canonical:
+            out.setdefault(plain_to_canonical[sn], float(rating))
+        else:
+            out[sn] = float(rating)
+    return out
+
+
+def _user_list_memberships(db: Session, user_id: int, sets: List[Dict[str, Any]]) -> Dict[str, set]:
+    """
+    canonical set_num -> system list keys ("owned", "wishlist") of the user's
+    lists holding it, for catalog rows *sets*. Items may be stored under the
+    canonical or the plain set number.
+    """
+    keys, plain_to_canonical = _set_num_keys(sets)
+    if not keys:
+        return {}
+    rows = db.execute(
+        select(ListItemModel.set_num, ListModel.system_key)
+        .join(ListModel, ListModel.id == ListItemModel.list_id)
+        .where(
+            ListModel.owner_id == user_id,
+            ListModel.is_system.is_(True),
+            ListModel.system_key.in_(["owned", "wishlist"]),
+            ListItemModel.set_num.in_(keys),
+        )
+    ).all()
+    out: Dict[str, set] = {}
+    for sn, key in rows:
+        sn = str(sn)
+        out.setdefault(plain_to_canonical.get(sn, sn), set()).add(key)
+    return out
+
+
+_DETAIL_TTL = 3600  # seconds; entries are also checked against current versions
+_detail_cache = _TTLCache(ttl=_DETAIL_TTL, max_size=4096)
+
+
+def _public_set_detail(db: Session, s: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The anonymous /sets/{set_num} payload for catalog row *s*, as a new dict.
+
+    The catalog row enriched from the set view is cached per set, and an
+    entry is reused only while it was built from the same catalog row and
+    set-view version. The rating numbers are merged in on every call from
+    the set's set_rating_stats row (one primary-key read), so they are
+    current in every worker, not only the one that took the review.
+    """
+    canonical = s.get("set_num") or ""
+    view = set_view(db)
+
+    hit, entry = _detail_cache.get(canonical)
+    if hit and entry[0] is s and entry[1] == view.version:
+        out = dict(entry[2])
+    else:
+        out = _enriched_set_detail(view, s)
+        _detail_cache.set(canonical, (s, view.version, out))
+        out = dict(out)
+
+    out["rating_avg"], out["rating_count"] = _rating_stats_for_set(db, canonical)
+    out["review_count"] = _review_count_for_set(db, canonical)
+    return out
+
+
+def _enriched_set_detail(view: SetView, s: Dict[str, Any]) -> Dict[str, Any]:
+    """Catalog row *s* plus its Brickset fields from the set view."""
+    canonical = s.get("set_num") or ""
+    out = dict(s)
+    out["user_rating"] = None
+
+    # Enrich with Brickset data from DB
+    db_set = view.get(canonical)
+    if db_set:
+        out["description"] = _short_description(db_set["description"])
+        out["subtheme"] = db_set["subtheme"]
+        out["minifigs"] = db_set["minifigs"]
+        out["age_min"] = db_set["age_min"]
+        out["age_max"] = db_set["age_max"]
+        dims = (db_set["dimensions_height"], db_set["dimensions_width"], db_set["dimensions_depth"])
+        out["dimensions"] = {
+            "height": dims[0],
+            "width": dims[1],
+            "depth": dims[2],
+        } if any(dims) else None
+        out["weight_kg"] = db_set["weight_kg"]
+        out["launch_date"] = db_set["launch_date"]
+        out["exit_date"] = db_set["exit_date"]
+        out["retirement_status"] = db_set["retirement_status"]
+        out["retirement_date"] = db_set["retirement_date"]
+        out["retail_price"] = db_set["retail_price"]
+        out["retail_currency"] = db_set["retail_currency"]
+        out["set_tag"] = db_set["set_tag"]
+    return out
+
+
 @router.get("/{set_num}")
 def get_set(
     set_num: str,
@@ -1711,46 +1794,9 @@ def get_set(
     if not s:
         raise HTTPException(status_code=404, detail="Set not found")
 
-    canonical = s.get("set_num") or set_num
-    plain = s.get("set_num_plain")
-
-    avg, cnt = _rating_stats_for_set(db, canonical)
-    review_cnt = _review_count_for_set(db, canonical)
-
-    user_rating = None
+    out = _public_set_detail(db, s)
     if current_user:
-        user_rating = _user_rating_for_set(db, current_user.username, canonical, plain)
-
-    out = dict(s)
-    out["rating_avg"] = avg
-    out["rating_count"] = cnt
-    out["review_count"] = review_cnt
-    out["user_rating"] = user_rating
-
-    # Enrich with Brickset data from DB
-    db_set = db.execute(
-        select(SetModel).where(SetModel.set_num == canonical)
-    ).scalar_one_or_none()
-    if db_set:
-        out["description"] = _short_description(db_set.description)
-        out["subtheme"] = db_set.subtheme
-        out["minifigs"] = db_set.minifigs
-        out["age_min"] = db_set.age_min
-        out["age_max"] = db_set.age_max
-        out["dimensions"] = {
-            "height": db_set.dimensions_height,
-            "width": db_set.dimensions_width,
-            "depth": db_set.dimensions_depth,
-        } if any([db_set.dimensions_height, db_set.dimensions_width, db_set.dimensions_depth]) else None
-        out["weight_kg"] = db_set.weight_kg
-        out["launch_date"] = db_set.launch_date
-        out["exit_date"] = db_set.exit_date
-        out["retirement_status"] = db_set.retirement_status
-        out["retirement_date"] = db_set.retirement_date
-        out["retail_price"] = db_set.retail_price
-        out["retail_currency"] = db_set.retail_currency
-        out["set_tag"] = db_set.set_tag
-
+        out["user_rating"] = _user_ratings_for_sets(db, current_user.id, [s]).get(out["set_num"])
     return out
 
 
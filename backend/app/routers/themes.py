@@ -1,13 +1,14 @@
 # backend/app/routers/themes.py
 
-import unicodedata
-from typing import Any, Dict, List, Optional, Tuple
+import heapq
+from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 
 from sqlalchemy import func, select
 
+from app.data.catalog import catalog_for, fold_text
 from app.data.sets import load_cached_sets
 from app.data import offers as offers_data
 from app.db import get_db
@@ -51,71 +52,12 @@ ALLOWED_SORTS = {"relevance", "year", "pieces", "name", "rating"}
 ALLOWED_ORDERS = {"asc", "desc"}
 
 
-def _strip_diacritics(s: str) -> str:
-    """Remove diacritical marks: é → e, ü → u, etc."""
-    return "".join(
-        c for c in unicodedata.normalize("NFD", s)
-        if unicodedata.category(c) != "Mn"
-    )
-
-
 def _norm(s: str) -> str:
     return (s or "").strip()
 
 
 def _norm_lower(s: str) -> str:
-    return _strip_diacritics(_norm(s)).lower()
-
-
-def _theme_key(theme: str) -> str:
-    # stable key for comparisons / grouping (accent-insensitive, slug-safe)
-    return _norm_lower(theme).replace("-", " ")
-
-
-def _set_count_by_theme(
-    all_sets: List[Dict[str, Any]],
-    q: str,
-    min_year: Optional[int] = None,
-) -> List[Tuple[str, int, Optional[str]]]:
-    """Returns list of (display_theme, set_count, image_url)."""
-    ql = _norm_lower(q)
-    counts: Dict[str, int] = {}
-    display: Dict[str, str] = {}
-    # Track the best image per theme: pick the set with the most pieces
-    best_image: Dict[str, Tuple[int, Optional[str]]] = {}  # key -> (pieces, url)
-
-    for s in all_sets:
-        theme = _norm(str(s.get("theme") or ""))
-        if not theme:
-            continue
-
-        if min_year is not None:
-            try:
-                if int(s.get("year") or 0) < min_year:
-                    continue
-            except (ValueError, TypeError):
-                continue
-
-        k = _theme_key(theme)
-        if ql and ql not in k:
-            continue
-
-        counts[k] = counts.get(k, 0) + 1
-        display.setdefault(k, theme)
-
-        img = s.get("image_url") or None
-        if img:
-            pieces = int(s.get("pieces") or 0)
-            prev = best_image.get(k)
-            if prev is None or pieces > prev[0]:
-                best_image[k] = (pieces, img)
-
-    rows = [
-        (display[k], counts[k], (best_image.get(k) or (0, None))[1])
-        for k in counts.keys()
-    ]
-    rows.sort(key=lambda t: t[0].lower())
-    return rows
+    return fold_text(s)
 
 
 def _sort_key(sort: str):
@@ -166,11 +108,11 @@ def list_themes(
     Header: X-Total-Count = total number of distinct themes matching filters
     Pass min_year to filter to themes with sets from that year onward.
     """
-    all_sets = load_cached_sets()
+    themes = catalog_for(load_cached_sets()).theme_index()
     excluded, custom_images = _load_theme_settings(db)
     excluded_lower = {t.lower() for t in excluded}
 
-    rows = _set_count_by_theme(all_sets, q or "", min_year=min_year)
+    rows = themes.listing(q or "", min_year=min_year)
 
     # Filter out excluded themes
     if excluded_lower:
@@ -248,26 +190,18 @@ def list_sets_for_theme(
         raise HTTPException(status_code=400, detail=f"invalid_order:{order}")
 
     all_sets = load_cached_sets()
+    catalog = catalog_for(all_sets)
 
-    # determine whether theme exists at all (case-insensitive)
-    target_key = _theme_key(theme_raw)
-    theme_exists = any(_theme_key(str(s.get("theme") or "")) == target_key for s in all_sets)
-    if not theme_exists:
+    # theme partition (accent/case-insensitive); 404 if the theme doesn't exist
+    positions = catalog.theme_index().rows_for(theme_raw)
+    if positions is None:
         raise HTTPException(status_code=404, detail="theme_not_found")
 
-    # filter to theme
-    filtered = [
-        s
-        for s in all_sets
-        if _theme_key(str(s.get("theme") or "")) == target_key
-    ]
-
     # optional min_year filter
     if min_year is not None:
-        filtered = [
-            s for s in filtered
-            if int(s.get("year") or 0) >= min_year
-        ]
+        positions = positions[catalog.year[positions] >= min_year]
+
+    filtered = [all_sets[i] for i in positions]
 
     # optional subtheme filter (look up matching set_nums from DB)
     if subtheme:
@@ -300,22 +234,29 @@ def list_sets_for_theme(
 
     reverse = (order == "desc")
 
+    # Only the rows up to the end of the requested page are ordered;
+    # nlargest/nsmallest match sorted(...)[:n], ties included.
+    offset = (page - 1) * limit
+    end = offset + limit
+
     if sort == "relevance":
         if q_clean:
-            filtered.sort(
+            head = heapq.nlargest(
+                end,
+                filtered,
                 key=lambda s: (
                     _relevance_score(s, q_clean),
                     int(s.get("rating_count") or 0),
                     float(s.get("rating_avg") or 0.0),
                 ),
-                reverse=True,
             )
         else:
-            filtered.sort(key=_sort_key("name"), reverse=False)
+            head = heapq.nsmallest(end, filtered, key=_sort_key("name"))
+    elif reverse:
+        head = heapq.nlargest(end, filtered, key=_sort_key(sort))
     else:
-        filtered.sort(key=_sort_key(sort), reverse=reverse)
+        head = heapq.nsmallest(end, filtered, key=_sort_key(sort))
 
-    offset = (page - 1) * limit
-    page_result = filtered[offset : offset + limit]
+    page_result = head[offset:]
     offers_data.enrich_with_best_prices(db, page_result)
     return page_result
\ No newline at end of file
@@ -17,4 +17,6 @@ class SetBulkOut(BaseModel):
     rating_avg: Optional[float] = Field(None, json_schema_extra={"example": 4.62})
     rating_count: int = Field(0, json_schema_extra={"example": 18})
 
-    user_rating: Optional[float] = Field(None, json_schema_extra={"example": 4.5})
\ No newline at end of file
+    user_rating: Optional[float] = Field(None, json_schema_extra={"example": 4.5})
+    is_owned: Optional[bool] = Field(None, json_schema_extra={"example": True})
+    in_wishlist: Optional[bool] = Field(None, json_schema_extra={"example": False})
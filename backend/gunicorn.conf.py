@@ -0,0 +1,30 @@
+# backend/gunicorn.conf.py
+"""
+Multi-worker serving: one gunicorn master, N uvicorn workers.
+
+    WEB_CONCURRENCY=4 ./start.sh
+
+The app is imported in the master (preload_app) and its read-only state --
+set catalog, indexes, rating/price maps -- is warmed there before workers
+are forked, so every worker reads the same copy-on-write pages instead of
+holding its own catalog. Each worker still refreshes the DB maps on their
+own TTLs after that, and the in-memory rate limiter counts per worker.
+The change feed is per worker too, so with WEB_CONCURRENCY > 1 those TTLs
+are shortened (app.core.change_feed.sweep_interval).
+
+Only one worker runs the APScheduler jobs and startup scrapes
+(see app.core.scheduler.acquire_job_leadership).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 60
+
+
+def when_ready(server):
+    from app.core.preload import warm_shared_state
+
+    warm_shared_state()
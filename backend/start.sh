@@ -5,4 +5,8 @@ echo "Running migrations..."
 alembic upgrade head
 
 echo "Starting API..."
-exec uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}"
\ No newline at end of file
+if [ "${WEB_CONCURRENCY:-1}" -gt 1 ]; then
+  # Catalog is loaded once in the master and shared with forked workers
+  exec gunicorn -c gunicorn.conf.py app.main:app
+fi
+exec uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}"
@@ -0,0 +1,175 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import get_db
+from app.data import offers as offers_data
+from app.data.best_prices import rebuild_best_prices, refresh_best_prices
+from app.models import Offer as OfferModel
+from app.models import Set as SetModel
+from app.models import OfferPricePoint, OfferPriceRollup, SetBestPrice
+from app.pipelines import brickset_sync, price_scraper
+
+
+@pytest.fixture
+def seeded(db_session):
+    db_session.query(SetModel).delete()
+    db_session.add_all([
+        SetModel(set_num="10305-1", name="Lion Knights' Castle", theme="Icons", retail_price=400.0),
+        SetModel(set_num="21318-1", name="Tree House", theme="Ideas", retail_price=250.0),
+        SetModel(set_num="76419-1", name="Hogwarts Castle and Grounds", theme="Harry Potter"),
+    ])
+    db_session.add_all([
+        OfferModel(set_num="10305", store="LEGO", price=400.0, url="u", in_stock=True),
+        OfferModel(set_num="10305", store="Amazon", price=340.0, url="u", in_stock=None),
+        OfferModel(set_num="10305", store="Walmart", price=300.0, url="u", in_stock=False),
+        OfferModel(set_num="10305", store="BrickLink", price=250.0, url="u", in_stock=True),
+        OfferModel(set_num="21318", store="LEGO", price=250.0, url="u", in_stock=True),
+        OfferModel(set_num="76419", store="LEGO", price=169.99, url="u", in_stock=True),
+    ])
+    db_session.commit()
+    rebuild_best_prices(db_session)
+    yield db_session
+    db_session.query(OfferPriceRollup).delete()
+    db_session.query(OfferPricePoint).delete()
+    db_session.query(SetBestPrice).delete()
+    db_session.query(OfferModel).delete()
+    db_session.query(SetModel).delete()
+    db_session.commit()
+
+
+def test_best_offer_skips_out_of_stock_and_aftermarket(seeded):
+    row = seeded.get(SetBestPrice, "10305-1")
+    assert (row.best_price, row.store, row.retail_price) == (340.0, "Amazon", 400.0)
+    assert row.discount_pct == pytest.approx(15.0) and row.savings == pytest.approx(60.0)
+
+    no_retail = seeded.get(SetBestPrice, "76419-1")
+    assert no_retail.best_price == 169.99 and no_retail.discount_pct is None
+
+    assert offers_data.best_prices_for_sets(seeded, ["10305-1", "21318"]) == {
+        "10305-1": 340.0, "21318": 250.0,
+    }
+
+
+def test_refresh_follows_offer_and_retail_changes(seeded):
+    db = seeded
+    walmart = db.query(OfferModel).filter_by(set_num="10305", store="Walmart").one()
+    walmart.in_stock = True
+    db.get(SetModel, "21318-1").retail_price = 300.0
+    db.query(OfferModel).filter_by(set_num="76419").delete()
+    refresh_best_prices(db, ["10305", "21318-1", "76419-1"])
+    db.commit()
+
+    assert (db.get(SetBestPrice, "10305-1").best_price, db.get(SetBestPrice, "10305-1").store) == (300.0, "Walmart")
+    assert db.get(SetBestPrice, "21318-1").discount_pct == pytest.approx(100 / 6)
+    assert db.get(SetBestPrice, "76419-1") is None
+
+
+def test_deals_are_listed_from_the_table(seeded):
+    app.dependency_overrides[get_db] = lambda: seeded
+    try:
+        client = TestClient(app)
+        data = client.get("/sets/deals").json()
+        assert data["total"] == 1 and data["themes"] == ["Icons"]
+        [deal] = data["results"]
+        assert (deal["set_num"], deal["sale_price"], deal["discount_pct"], deal["savings"]) == (
+            "10305-1", 340.0, 15, 60.0,
+        )
+        assert client.get("/sets/deals", params={"min_discount": 20}).json()["total"] == 0
+    finally:
+        app.dependency_overrides.clear()
+
+
+def test_upsert_offer_inserts_then_updates_in_place(seeded):
+    db = seeded
+    assert offers_data.upsert_offer(
+        db, "21318", "Amazon", price=229.99, currency="USD", url="a1", in_stock=True, asin="B07X",
+    ) is True
+    assert offers_data.upsert_offer(
+        db, "21318", "Amazon", price=None, currency="USD", url="a2", in_stock=None,
+    ) is False
+    db.commit()
+
+    [offer] = db.query(OfferModel).filter_by(set_num="21318", store="Amazon").all()
+    assert (offer.price, offer.in_stock, offer.asin, offer.url) == (229.99, True, "B07X", "a2")
+    assert offer.canonical_set_num == "21318-1"
+
+
+def test_offer_writer_merges_and_writes_in_batches(seeded):
+    db = seeded
+    writer = offers_data.OfferWriter(db, batch_size=2)
+    writer.add("21318", "Walmart", price=199.99, currency="USD", url="w1", in_stock=True)
+    writer.add("21318", "Walmart", price=None, currency="USD", url="w2", in_stock=None)  # merged
+    writer.add("10305", "LEGO", price=380.0, currency="USD", url="l", in_stock=True)      # fills the batch
+    writer.add("76419", "Target", price=None, currency="USD", url="t", in_stock=None)
+    assert len(writer.batches) == 1
+    writer.flush()
+
+    assert writer.stats["offers_inserted"] == 2 and writer.stats["offers_updated"] == 1
+    assert [b["offers"] for b in writer.batches] == [2, 1]
+    walmart = db.query(OfferModel).filter_by(set_num="21318", store="Walmart").one()
+    assert (walmart.price, walmart.url) == (199.99, "w2")
+    assert db.get(SetBestPrice, "21318-1").store == "Walmart"
+    assert db.get(SetBestPrice, "10305-1").best_price == 340.0
+
+
+def test_offer_writer_counts_only_changed_offers(seeded):
+    db = seeded
+    writer = offers_data.OfferWriter(db)
+    writer.add("21318", "LEGO", price=250.0, currency="USD", url="u", in_stock=None)  # as stored
+    writer.add("76419", "LEGO", price=149.99, currency="USD", url="u", in_stock=True)
+    writer.add("10305", "Target", price=None, currency="USD", url="t", in_stock=None)
+    writer.flush()
+
+    stats = writer.stats
+    assert (stats["offers_inserted"], stats["offers_updated"], stats["offers_changed"]) == (1, 2, 1)
+
+
+def test_brickset_retail_price_change_refreshes_the_discount(seeded, monkeypatch):
+    db = seeded
+    bs_sets = [
+        {"number": "10305", "numberVariant": 1, "availability": "Retired",
+         "LEGOCom": {"US": {"retailPrice": 500.0}}},
+        {"number": "21318", "numberVariant": 1, "availability": "Retail",
+         "LEGOCom": {"US": {"retailPrice": 260.0}}},
+    ]
+    monkeypatch.setenv("BRICKSET_API_KEY", "x")
+    monkeypatch.setattr(brickset_sync, "_fetch_sets_by_year", lambda api_key, year: bs_sets)
+    monkeypatch.setattr(brickset_sync, "SessionLocal", lambda: db)
+    monkeypatch.setattr(brickset_sync.time, "sleep", lambda s: None)
+    monkeypatch.setattr(db, "close", lambda: None)
+
+    stats = brickset_sync.run_brickset_sync(years=[2022])
+    assert "error" not in stats and stats["offers_updated"] == 1
+
+    # No LEGO offer written for the retired set; its discount follows the new retail price.
+    castle = db.get(SetBestPrice, "10305-1")
+    assert (castle.retail_price, castle.best_price) == (500.0, 340.0)
+    assert castle.discount_pct == pytest.approx(32.0)
+    tree_house = db.get(SetBestPrice, "21318-1")
+    assert (tree_house.best_price, tree_house.retail_price) == (260.0, 260.0)
+
+
+def test_price_scrape_keeps_the_batch_gathered_before_a_failure(seeded, monkeypatch):
+    db = seeded
+    active = [
+        {"set_num": "21318-1", "set_num_plain": "21318", "name": "Tree House"},
+        {"set_num": "76419-1", "set_num_plain": "76419", "name": "Hogwarts Castle and Grounds"},
+    ]
+
+    def scrape(client, plain):
+        if plain == "76419":
+            raise RuntimeError("boom")
+        return {"price": 229.99, "currency": "USD", "url": "l", "in_stock": True}
+
+    monkeypatch.setattr(price_scraper, "_get_active_sets", lambda db: active)
+    monkeypatch.setattr(price_scraper, "scrape_lego_product_page", scrape)
+    monkeypatch.setattr(price_scraper, "SessionLocal", lambda: db)
+    monkeypatch.setattr(price_scraper.time, "sleep", lambda s: None)
+    monkeypatch.setattr(db, "close", lambda: None)
+
+    assert price_scraper.run_price_scrape()["error"] == "scrape_failed"
+
+    assert db.query(OfferModel).filter_by(set_num="21318").count() == 5
+    tree_house = db.get(SetBestPrice, "21318-1")
+    assert (tree_house.best_price, tree_house.retail_price) == (229.99, 229.99)
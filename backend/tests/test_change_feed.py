@@ -0,0 +1,28 @@
+from app.core.change_feed import MULTI_WORKER_SWEEP, ChangeFeed, sweep_interval
+
+
+def test_since_returns_keys_changed_after_a_version():
+    feed = ChangeFeed(window=3)
+    assert feed.version("t") == 0
+    v1 = feed.publish("t", ["a"])
+    feed.publish("t", ["b", "a"])
+
+    assert feed.since("t", 0) == {"a", "b"}
+    assert feed.since("t", v1) == {"a", "b"}
+    assert feed.since("t", feed.version("t")) == set()
+    assert feed.since("other", 0) == set()
+
+
+def test_consumer_behind_the_window_must_rebuild():
+    feed = ChangeFeed(window=2)
+    feed.publish("t", ["a", "b", "c"])
+    assert feed.since("t", 0) is None
+    assert feed.since("t", 1) == {"b", "c"}
+
+
+def test_sweeps_are_shortened_with_several_workers(monkeypatch):
+    monkeypatch.delenv("WEB_CONCURRENCY", raising=False)
+    assert sweep_interval(300) == 300
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert sweep_interval(300) == MULTI_WORKER_SWEEP
+    assert sweep_interval(10) == 10
@@ -0,0 +1,99 @@
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import get_db
+from app.data import offer_refresh
+from app.data import sets as sets_data
+from app.models import Offer as OfferModel
+from app.models import OfferPricePoint, OfferPriceRollup, SetBestPrice
+from app.models import Set as SetModel
+from app.pipelines import price_scraper
+
+
+@pytest.fixture
+def api(db_session, monkeypatch):
+    catalog = [{"set_num": "10305-1", "set_num_plain": "10305", "name": "Lion Knights' Castle"}]
+    monkeypatch.setattr(sets_data, "load_cached_sets", lambda: catalog)
+    monkeypatch.setattr(offer_refresh, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(offer_refresh, "_ensure_worker", lambda: None)  # jobs are run by hand
+    monkeypatch.setattr(offer_refresh, "_queue", offer_refresh.queue.Queue(maxsize=4))
+    monkeypatch.setattr(offer_refresh, "_pending", set())
+    monkeypatch.setattr(offer_refresh, "_not_found", {})
+    monkeypatch.setattr(db_session, "close", lambda: None)
+
+    db_session.add(SetModel(set_num="10305-1", name="Lion Knights' Castle", theme="Icons"))
+    db_session.commit()
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    for model in (SetBestPrice, OfferPriceRollup, OfferPricePoint, OfferModel, SetModel):
+        db_session.query(model).delete()
+    db_session.commit()
+
+
+def summary(client):
+    return client.get("/sets/10305-1/offers").json()
+
+
+def test_offers_are_refreshed_in_the_background_once(api, db_session, monkeypatch):
+    calls = []
+
+    def scrape(client, plain):
+        calls.append(plain)
+        return {"price": 399.99, "currency": "USD", "in_stock": True, "url": "https://lego.example/10305"}
+
+    monkeypatch.setattr(price_scraper, "fetch_lego_product_page", scrape)
+
+    first, second = summary(api), summary(api)
+    assert first["offers"] == [] and first["summary"]["refreshing"] is True
+    assert second["summary"]["refreshing"] is True
+    assert offer_refresh._queue.qsize() == 1 and calls == []
+
+    offer_refresh._run(offer_refresh._queue.get_nowait())
+    assert calls == ["10305"]
+    data = summary(api)
+    assert data["summary"]["refreshing"] is False
+    assert [(o["store"], o["price"]) for o in data["offers"]] == [("LEGO", 399.99)]
+    assert db_session.get(SetModel, "10305-1").retail_price == 399.99
+
+
+def test_missing_pages_are_negatively_cached(api, monkeypatch):
+    monkeypatch.setattr(price_scraper, "fetch_lego_product_page", lambda client, plain: None)
+
+    summary(api)
+    offer_refresh._run(offer_refresh._queue.get_nowait())
+
+    assert summary(api)["summary"]["refreshing"] is False
+    assert offer_refresh._queue.empty()
+
+
+@pytest.mark.parametrize("error", [
+    httpx.ReadTimeout("timed out"),
+    httpx.HTTPStatusError("429", request=httpx.Request("GET", "https://lego.example"),
+                          response=httpx.Response(429)),
+])
+def test_fetch_errors_are_not_negatively_cached(api, monkeypatch, error):
+    def scrape(client, plain):
+        raise error
+
+    monkeypatch.setattr(price_scraper, "fetch_lego_product_page", scrape)
+
+    summary(api)
+    offer_refresh._run(offer_refresh._queue.get_nowait())
+
+    assert offer_refresh._not_found == {}
+    assert summary(api)["summary"]["refreshing"] is True
+    assert offer_refresh._queue.qsize() == 1
+
+
+def test_only_a_404_reads_as_no_page():
+    def handler(request):
+        status = {"/en-us/product/1": 404, "/en-us/product/2": 503}[request.url.path]
+        return httpx.Response(status, text="")
+
+    with httpx.Client(transport=httpx.MockTransport(handler)) as client:
+        assert price_scraper.fetch_lego_product_page(client, "1") is None
+        with pytest.raises(httpx.HTTPStatusError):
+            price_scraper.fetch_lego_product_page(client, "2")
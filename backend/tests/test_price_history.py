@@ -0,0 +1,94 @@
+from datetime import date, datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import get_db
+from app.data import offers as offers_data
+from app.data import sets as sets_data
+from app.data.price_history import price_history, rebuild_rollups
+from app.models import Offer as OfferModel
+from app.models import OfferPricePoint, OfferPriceRollup
+from app.models import Set as SetModel
+
+
+def at(day, hour=12):
+    return datetime(2026, 3, day, hour, tzinfo=timezone.utc)
+
+
+def lego(db, price, when, in_stock=True):
+    offers_data.upsert_offer(db, "10305", "LEGO", price=price, currency="USD", url="u", in_stock=in_stock, now=when)
+
+
+@pytest.fixture
+def db(db_session):
+    db_session.query(SetModel).delete()
+    db_session.add(SetModel(set_num="10305-1", name="Lion Knights' Castle", theme="Icons"))
+    db_session.commit()
+    yield db_session
+    for model in (OfferPriceRollup, OfferPricePoint, OfferModel, SetModel):
+        db_session.query(model).delete()
+    db_session.commit()
+
+
+def test_only_changes_are_recorded(db):
+    lego(db, 399.99, at(2, 8))
+    lego(db, 399.99, at(2, 14))                 # unchanged
+    lego(db, None, at(2, 20))                   # None keeps the price
+    lego(db, 399.99, at(3), in_stock=False)     # stock change
+    lego(db, 349.99, at(3, 18), in_stock=False)
+    db.commit()
+
+    points = db.query(OfferPricePoint).order_by(OfferPricePoint.id).all()
+    assert [(p.price, p.in_stock) for p in points] == [(399.99, True), (399.99, False), (349.99, False)]
+
+    day3 = db.get(OfferPriceRollup, ("10305", "LEGO", "day", date(2026, 3, 3)))
+    assert (day3.low, day3.high, day3.last, day3.points) == (349.99, 399.99, 349.99, 2)
+    week = db.get(OfferPriceRollup, ("10305", "LEGO", "week", date(2026, 3, 2)))
+    assert (week.low, week.high, week.last, week.points) == (349.99, 399.99, 349.99, 3)
+
+    before = {(r.granularity, r.bucket): (r.low, r.high, r.last, r.points) for r in db.query(OfferPriceRollup)}
+    rebuild_rollups(db)
+    assert {(r.granularity, r.bucket): (r.low, r.high, r.last, r.points) for r in db.query(OfferPriceRollup)} == before
+
+
+def test_history_carries_the_opening_price_and_downsamples(db):
+    lego(db, 399.99, datetime(2025, 12, 1, tzinfo=timezone.utc))
+    lego(db, 379.99, at(10))
+    db.commit()
+
+    daily = price_history(db, "10305", 30, today=date(2026, 3, 20))
+    assert daily["granularity"] == "day" and daily["start"] == "2026-02-19"
+    [series] = daily["series"]
+    assert [(p["date"], p["close"]) for p in series["points"]] == [
+        ("2026-02-19", 399.99), ("2026-03-10", 379.99),
+    ]
+    assert series["low"] == 379.99
+
+    weekly = price_history(db, "10305", 365, today=date(2026, 3, 20))
+    assert weekly["granularity"] == "week"
+    assert [p["date"] for p in weekly["series"][0]["points"]] == ["2025-12-01", "2026-03-09"]
+
+    # Later buckets are outside the range; the opening point stays first.
+    lego(db, 359.99, at(25))
+    db.commit()
+    again = price_history(db, "10305", 30, today=date(2026, 3, 20))
+    assert again["series"][0]["points"] == series["points"]
+
+
+def test_price_history_endpoint(db, monkeypatch):
+    catalog = [{"set_num": "10305-1", "set_num_plain": "10305", "name": "Lion Knights' Castle"}]
+    monkeypatch.setattr(sets_data, "load_cached_sets", lambda: catalog)
+    lego(db, 399.99, datetime.now(timezone.utc))
+    db.commit()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        data = client.get("/sets/10305-1/price-history", params={"days": 7}).json()
+        assert client.get("/sets/10305-1/price-history", params={"days": 0}).status_code == 422
+    finally:
+        app.dependency_overrides.clear()
+    assert data["set_num"] == "10305-1" and data["granularity"] == "day"
+    assert [s["store"] for s in data["series"]] == ["LEGO"]
+    assert data["series"][0]["points"][-1]["close"] == 399.99
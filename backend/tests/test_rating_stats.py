@@ -0,0 +1,67 @@
+from app.data.rating_stats import apply_review_change, empty_histogram, histograms_for, rebuild_rating_stats
+from app.models import Review, Set, SetRatingStats, User
+
+
+def _snapshot(db):
+    db.expire_all()
+    return {
+        r.set_num: (r.rating_sum, r.rating_count, r.review_count, r.hist_40, r.hist_45, r.hist_50)
+        for r in db.query(SetRatingStats).all()
+    }
+
+
+def test_incremental_updates_match_a_full_rebuild(db_session):
+    db = db_session
+    db.add_all([
+        Set(set_num="75300-1", name="Fighter"),
+        User(username="stats_a", email="stats_a@example.com"),
+        User(username="stats_b", email="stats_b@example.com"),
+    ])
+    db.commit()
+    a, b = (db.query(User).filter_by(username=u).one() for u in ("stats_a", "stats_b"))
+
+    r1 = Review(user_id=a.id, set_num="75300-1", rating=4.5, text="Great")
+    db.add(r1)
+    apply_review_change(db, "75300-1", None, (4.5, "Great"))
+    r2 = Review(user_id=b.id, set_num="75300-1", rating=5.0, text="  ")
+    db.add(r2)
+    apply_review_change(db, "75300-1", None, (5.0, "  "))
+    db.commit()
+
+    # Edit: 4.5 -> 4.0, keep text; then delete the other review
+    apply_review_change(db, "75300-1", (r1.rating, r1.text), (4.0, r1.text))
+    r1.rating = 4.0
+    apply_review_change(db, "75300-1", (r2.rating, r2.text), None)
+    db.delete(r2)
+    db.commit()
+
+    incremental = _snapshot(db)
+    assert incremental == {"75300-1": (4.0, 1, 1, 1, 0, 0)}
+
+    assert rebuild_rating_stats(db) == 1
+    assert _snapshot(db) == incremental
+
+    db.query(Review).delete()
+    db.query(SetRatingStats).delete()
+    db.query(User).filter(User.username.in_(["stats_a", "stats_b"])).delete()
+    db.query(Set).filter_by(set_num="75300-1").delete()
+    db.commit()
+
+
+def test_histograms_are_read_from_the_buckets(db_session):
+    db = db_session
+    db.add(Set(set_num="75301-1", name="X-Wing"))
+    db.commit()
+    apply_review_change(db, "75301-1", None, (4.5, None))
+    apply_review_change(db, "75301-1", None, (4.5, "Swooshable"))
+    apply_review_change(db, "75301-1", None, (1.0, None))
+    db.commit()
+
+    hists = histograms_for(db, ["75301-1", "10305-1"])
+    assert hists["75301-1"] == {**empty_histogram(), "1.0": 1, "4.5": 2}
+    assert hists["10305-1"] == empty_histogram()
+    assert list(empty_histogram()) == ["0.5", "1.0", "1.5", "2.0", "2.5", "3.0", "3.5", "4.0", "4.5", "5.0"]
+
+    db.query(SetRatingStats).delete()
+    db.query(Set).filter_by(set_num="75301-1").delete()
+    db.commit()
@@ -0,0 +1,97 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.auth import get_current_user
+from app.db import get_db
+from app.data import sets as sets_data
+from app.data.review_votes import rebuild_vote_counts, wilson_lower_bound
+from app.models import Review, ReviewVote, Set, User
+
+
+@pytest.fixture
+def seeded(db_session, monkeypatch):
+    db = db_session
+    catalog = [{"set_num": "10497-1", "set_num_plain": "10497", "name": "Galaxy Explorer",
+                "year": 2022, "pieces": 1254, "theme": "Icons", "image_url": None}]
+    monkeypatch.setattr(sets_data, "load_cached_sets", lambda: catalog)
+
+    users = [User(username=f"voter_{i}") for i in range(4)]
+    db.add(Set(set_num="10497-1", name="Galaxy Explorer"))
+    db.add_all(users)
+    db.flush()
+    reviews = [Review(user_id=u.id, set_num="10497-1", rating=4.0, text=f"Review {i}")
+               for i, u in enumerate(users[:3])]
+    db.add_all(reviews)
+    db.commit()
+
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app), users, reviews
+    app.dependency_overrides.clear()
+    db.query(ReviewVote).delete()
+    db.query(Review).delete()
+    db.query(User).filter(User.username.like("voter_%")).delete(synchronize_session=False)
+    db.query(Set).filter_by(set_num="10497-1").delete()
+    db.commit()
+
+
+def test_wilson_lower_bound_orders_by_confidence():
+    assert wilson_lower_bound(0, 0) == 0.0
+    assert wilson_lower_bound(1, 0) < wilson_lower_bound(10, 1)
+    assert 0.0 < wilson_lower_bound(10, 1) < 1.0
+
+
+def _vote(api, user, review, vote_type):
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        return api.post(f"/sets/10497-1/reviews/{review.id}/vote", json={"vote_type": vote_type}).json()
+    finally:
+        del app.dependency_overrides[get_current_user]
+
+
+def test_votes_update_counters_and_helpful_paging(seeded, db_session):
+    api, users, (r0, r1, r2) = seeded
+    assert _vote(api, users[3], r1, "up")["upvotes"] == 1
+    _vote(api, users[0], r1, "up")
+    _vote(api, users[3], r2, "down")
+    _vote(api, users[3], r2, "up")          # switch
+    _vote(api, users[1], r0, "up")
+    out = _vote(api, users[1], r0, "up")    # toggle off
+    assert (out["upvotes"], out["downvotes"], out["user_vote"]) == (0, 0, None)
+
+    db_session.expire_all()
+    counted = {r.id: (r.upvotes, r.downvotes, r.helpful_score) for r in db_session.query(Review)}
+    assert counted[r1.id][:2] == (2, 0) and counted[r2.id][:2] == (1, 0)
+    rebuild_vote_counts(db_session)
+    assert {r.id: (r.upvotes, r.downvotes, r.helpful_score) for r in db_session.query(Review)} == counted
+
+    first = api.get("/sets/10497-1/reviews", params={"sort": "helpful", "limit": 2})
+    rest = api.get("/sets/10497-1/reviews",
+                   params={"sort": "helpful", "limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+    assert [r["id"] for r in first.json() + rest.json()] == [r1.id, r2.id, r0.id]
+    assert "X-Next-Cursor" not in rest.headers
+
+
+def test_recent_paging_visits_every_review_once(seeded):
+    api, _, reviews = seeded
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, **({"cursor": cursor} if cursor else {})}
+        resp = api.get("/sets/10497-1/reviews", params=params)
+        seen += [r["id"] for r in resp.json()]
+        cursor = resp.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == sorted(r.id for r in reviews)
+    assert api.get("/sets/10497-1/reviews", params={"cursor": "nope"}).status_code == 400
+
+
+def test_search_matches_review_text(seeded, db_session):
+    api, _, (r0, r1, _) = seeded
+    r1.text = "The minifigures are 100% classic space"
+    db_session.commit()
+
+    assert [r["id"] for r in api.get("/sets/10497-1/reviews", params={"q": "Classic SPACE"}).json()] == [r1.id]
+    assert [r["id"] for r in api.get("/sets/reviews/search", params={"q": "100%"}).json()] == [r1.id]
+    assert api.get("/sets/reviews/search", params={"q": "review 0"}).json()[0]["id"] == r0.id
+    assert api.get("/sets/10497-1/reviews", params={"sort": "relevance"}).status_code == 400
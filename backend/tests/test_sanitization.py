@@ -1,7 +1,8 @@
 """Tests for input sanitization utilities and schema validators."""
 import pytest
 
-from app.core.sanitize import sanitize_text, sanitize_oneline
+from app.core.profanity import ProfanityMatcher
+from app.core.sanitize import contains_profanity, sanitize_text, sanitize_oneline
 
 
 # ---------------------------------------------------------------------------
@@ -65,6 +66,33 @@ def test_sanitize_oneline_empty_string():
     assert sanitize_oneline("") == ""
 
 
+def test_sanitize_oneline_collapses_whitespace_left_by_tags():
+    assert sanitize_oneline("My <b> </b> List") == "My List"
+
+
+# ---------------------------------------------------------------------------
+# contains_profanity
+# ---------------------------------------------------------------------------
+
+def test_contains_profanity_clean_text():
+    assert not contains_profanity("Classic castle, great bass-ment build. Assemble with care!")
+    assert not contains_profanity("   ")
+
+
+def test_contains_profanity_finds_look_alikes():
+    assert contains_profanity("What a load of $h1t")
+    assert contains_profanity("The instructions are BULLSH1T.")
+
+
+def test_profanity_matcher_phrases_and_spelled_words():
+    matcher = ProfanityMatcher(["darn", "heck no", "gosh-darn"])
+    assert matcher.contains("well d4rn it")
+    assert matcher.contains("Heck no!")
+    assert matcher.contains("d4r n")  # split word, joined back
+    assert matcher.contains("gosh-darn bricks")
+    assert not matcher.contains("darned heckle")
+
+
 # ---------------------------------------------------------------------------
 # ReviewCreate schema validation
 # ---------------------------------------------------------------------------
@@ -0,0 +1,204 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.auth import get_current_user_optional
+from app.core.change_feed import RATINGS, SETS, feed
+from app.db import get_db
+from app.data import sets as sets_data
+from app.data import reviews as reviews_data
+from app.data.set_view import invalidate_set_view, set_view
+from app.models import List as ListModel, ListItem as ListItemModel
+from app.models import Review as ReviewModel
+from app.models import Set as SetModel
+from app.models import SetRatingStats
+from app.models import User as UserModel
+from app.routers import sets as sets_router
+from app.routers.sets import _detail_cache
+
+
+@pytest.fixture
+def api(db_session, monkeypatch):
+    db_session.query(SetModel).delete()
+    db_session.add_all([
+        SetModel(set_num="10305-1", name="Lion Knights' Castle", year=2022, theme="Icons",
+                 pieces=4514, retail_price=399.99, retirement_status="retiring_soon",
+                 retirement_date="2026-12", subtheme="Castle", dimensions_width=58.0),
+        SetModel(set_num="21318-1", name="Tree House", year=2019, theme="Ideas",
+                 pieces=3036, retirement_status="retiring_soon", retirement_date="2026-06"),
+        SetModel(set_num="76419-1", name="Hogwarts Castle and Grounds", year=2023,
+                 theme="Harry Potter", pieces=2660, lego_com_coming_soon=True),
+    ])
+    db_session.commit()
+    invalidate_set_view()
+
+    catalog = [
+        {"set_num": "10305-1", "set_num_plain": "10305", "name": "Lion Knights' Castle",
+         "year": 2022, "pieces": 4514, "theme": "Icons", "image_url": None},
+    ]
+    monkeypatch.setattr(sets_data, "load_cached_sets", lambda: catalog)
+    reviews_data.REVIEWS = []
+
+    app.dependency_overrides[get_db] = lambda: db_session
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    db_session.query(SetModel).delete()
+    db_session.commit()
+    invalidate_set_view()
+
+
+def test_get_set_merges_db_fields(api):
+    data = api.get("/sets/10305").json()
+    assert data["retail_price"] == 399.99
+    assert data["subtheme"] == "Castle"
+    assert data["dimensions"] == {"height": None, "width": 58.0, "depth": None}
+
+
+def test_retiring_and_coming_soon_served_from_view(api):
+    resp = api.get("/sets/retiring")
+    assert resp.headers["X-Total-Count"] == "2"
+    assert [s["set_num"] for s in resp.json()] == ["21318-1", "10305-1"]
+
+    assert [s["set_num"] for s in api.get("/sets/coming-soon").json()] == ["76419-1"]
+
+
+def test_view_rebuilds_only_after_invalidation(api, db_session):
+    before = set_view(db_session)
+    db_session.get(SetModel, "10305-1").retail_price = 349.99
+    db_session.commit()
+
+    assert set_view(db_session) is before
+    assert api.get("/sets/10305").json()["retail_price"] == 399.99
+
+    invalidate_set_view()
+    assert set_view(db_session).version == before.version + 1
+    assert api.get("/sets/10305").json()["retail_price"] == 349.99
+
+
+def test_single_set_writes_are_patched_in_through_the_feed(api, db_session):
+    before = set_view(db_session)
+    db_session.get(SetModel, "21318-1").set_tag = "GWP"
+    db_session.commit()
+    feed.publish(SETS, ["21318-1"])
+
+    after = set_view(db_session)
+    assert after is not before
+    assert after.tags == {"21318-1": "GWP"}
+    assert after.get("10305-1") is before.get("10305-1")  # untouched rows are reused
+    assert set_view(db_session) is after
+
+
+def test_detail_payload_is_reused_until_its_inputs_change(api):
+    first = api.get("/sets/10305-1").json()
+    _, cached = _detail_cache.get("10305-1")
+    assert api.get("/sets/10305").json() == first
+    assert _detail_cache.get("10305-1")[1] is cached
+
+    reviews_data.REVIEWS = [{"set_num": "10305-1", "rating": 4.0, "text": "Huge build"}]
+    data = api.get("/sets/10305-1").json()
+    assert (data["rating_avg"], data["rating_count"], data["review_count"]) == (4.0, 1, 1)
+
+
+def test_detail_ratings_are_read_from_the_stats_row(api, db_session, monkeypatch):
+    monkeypatch.delattr(reviews_data, "REVIEWS")
+    api.get("/sets/10305-1")
+
+    # Written by another worker: no change-feed entry in this process.
+    db_session.add(SetRatingStats(set_num="10305-1", rating_sum=9.0, rating_count=2, review_count=1))
+    db_session.commit()
+    try:
+        data = api.get("/sets/10305").json()
+        assert (data["rating_avg"], data["rating_count"], data["review_count"]) == (4.5, 2, 1)
+    finally:
+        db_session.query(SetRatingStats).delete()
+        db_session.commit()
+
+
+def test_user_rating_is_merged_into_the_shared_payload(api, db_session):
+    user = UserModel(username="brickfan")
+    db_session.add(user)
+    db_session.flush()
+    db_session.add_all([
+        ReviewModel(user_id=user.id, set_num="10305", rating=3.0),
+        ReviewModel(user_id=user.id, set_num="10305-1", rating=4.5),
+    ])
+    db_session.commit()
+    try:
+        app.dependency_overrides[get_current_user_optional] = lambda: user
+        assert api.get("/sets/10305").json()["user_rating"] == 4.5
+
+        del app.dependency_overrides[get_current_user_optional]
+        assert api.get("/sets/10305").json()["user_rating"] is None
+    finally:
+        db_session.query(ReviewModel).delete()
+        db_session.query(UserModel).delete()
+        db_session.commit()
+
+
+def test_bulk_overlays_rating_and_list_membership(api, db_session):
+    user = UserModel(username="collector")
+    db_session.add(user)
+    db_session.flush()
+    owned = ListModel(owner_id=user.id, title="Owned", is_system=True, system_key="owned")
+    wishlist = ListModel(owner_id=user.id, title="Wishlist", is_system=True, system_key="wishlist")
+    db_session.add_all([owned, wishlist])
+    db_session.flush()
+    db_session.add_all([
+        ListItemModel(list_id=owned.id, set_num="10305-1"),
+        ListItemModel(list_id=wishlist.id, set_num="10305"),  # older plain-number item
+        ReviewModel(user_id=user.id, set_num="10305", rating=4.0),
+    ])
+    db_session.commit()
+    try:
+        app.dependency_overrides[get_current_user_optional] = lambda: user
+        [row] = api.get("/sets/bulk", params={"set_nums": "10305,99999-1"}).json()
+        assert (row["user_rating"], row["is_owned"], row["in_wishlist"]) == (4.0, True, True)
+
+        del app.dependency_overrides[get_current_user_optional]
+        [row] = api.get("/sets/bulk", params={"set_nums": "10305"}).json()
+        assert (row["user_rating"], row["is_owned"], row["in_wishlist"]) == (None, None, None)
+    finally:
+        db_session.query(ListItemModel).delete()
+        db_session.query(ListModel).delete()
+        db_session.query(ReviewModel).delete()
+        db_session.query(UserModel).delete()
+        db_session.commit()
+
+
+def test_rating_histogram_endpoint(api):
+    reviews_data.REVIEWS = [
+        {"set_num": "10305-1", "rating": 5.0},
+        {"set_num": "10305-1", "rating": 4.5},
+        {"set_num": "10305-1", "rating": 5.0},
+    ]
+    data = api.get("/sets/10305/rating-histogram").json()
+    assert (data["set_num"], data["count"], data["average"]) == ("10305-1", 3, 4.83)
+    assert data["histogram"]["5.0"] == 2 and data["histogram"]["4.5"] == 1
+    assert sum(data["histogram"].values()) == 3
+
+
+def test_homepage_is_served_from_a_snapshot_with_an_etag(api, db_session, monkeypatch):
+    sets_router.invalidate_homepage()
+    monkeypatch.setattr(sets_router, "SessionLocal", lambda: db_session)
+
+    first = api.get("/sets/homepage")
+    etag = first.headers["ETag"]
+    assert [s["set_num"] for s in first.json()["retiring"]] == ["21318-1", "10305-1"]
+    assert api.get("/sets/homepage", headers={"If-None-Match": etag}).status_code == 304
+
+    # A review write bumps RATINGS: the stale snapshot is served while a
+    # background rebuild picks the new rating up.
+    version = sets_router._homepage_state["version"]
+    reviews_data.REVIEWS = [{"set_num": "10305-1", "rating": 5.0, "text": "Superb"}]
+    feed.publish(RATINGS, ["10305-1"])
+    assert api.get("/sets/homepage").headers["ETag"] == etag
+
+    deadline = time.monotonic() + 5
+    while sets_router._homepage_state["version"] == version and time.monotonic() < deadline:
+        time.sleep(0.01)
+    fresh = api.get("/sets/homepage", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200 and fresh.headers["ETag"] != etag
+    retiring = {s["set_num"]: s for s in fresh.json()["retiring"]}
+    assert retiring["10305-1"]["rating_avg"] == 5.0
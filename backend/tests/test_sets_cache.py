@@ -56,4 +56,56 @@ def test_load_cached_sets_corrupted(monkeypatch, tmp_path, capsys):
     assert rows == []
     # We don't assert exact text, just that a warning was printed
     assert "Cache corrupted" in captured.out
-    assert sets_data.cache_count() == 0
\ No newline at end of file
+    assert sets_data.cache_count() == 0
+
+def test_get_set_by_num_uses_current_catalog(monkeypatch):
+    """
+    get_set_by_num() should resolve full and plain numbers (case-insensitive)
+    and pick up a new catalog list as soon as load_cached_sets() returns it.
+    """
+    first = [
+        {"set_num": "10305-1", "set_num_plain": "10305", "name": "Lion Knights' Castle"},
+        {"set_num": "75192-1", "set_num_plain": "75192", "name": "Millennium Falcon"},
+    ]
+    monkeypatch.setattr(sets_data, "load_cached_sets", lambda: first)
+
+    assert sets_data.get_set_by_num("10305")["name"] == "Lion Knights' Castle"
+    assert sets_data.get_set_by_num(" 75192-1 ")["name"] == "Millennium Falcon"
+    assert sets_data.get_set_by_num("99999") is None
+
+    second = [{"set_num": "10305-1", "set_num_plain": "10305", "name": "Renamed"}]
+    monkeypatch.setattr(sets_data, "load_cached_sets", lambda: second)
+
+    assert sets_data.get_set_by_num("10305-1")["name"] == "Renamed"
+    assert sets_data.get_set_by_num("75192") is None
+
+
+def test_load_cached_sets_reparses_only_changed_file(monkeypatch, tmp_path):
+    """
+    A stale snapshot is still served immediately; the background re-check
+    reparses the file only when its mtime/size changed.
+    """
+    fake_cache = tmp_path / "sets_cache.json"
+    fake_cache.write_text(json.dumps([{"set_num": "1000-1", "name": "Old"}]))
+    monkeypatch.setattr(sets_data, "CACHE_FILE", fake_cache)
+
+    parses = []
+    real_read = sets_data._read_cache_file
+    monkeypatch.setattr(sets_data, "_read_cache_file", lambda p: parses.append(p) or real_read(p))
+
+    first = sets_data.load_cached_sets()
+    assert [r["name"] for r in first] == ["Old"]
+
+    # Unchanged file: the re-check keeps the same list object.
+    assert sets_data.reload_cached_sets() is first
+    assert len(parses) == 1
+
+    fake_cache.write_text(json.dumps([{"set_num": "1000-1", "name": "New set name"}]))
+    monkeypatch.setattr(sets_data, "_RECHECK_SECONDS", 0)
+
+    # Still the old snapshot on this call; the refresh happens off-thread.
+    assert sets_data.load_cached_sets() is first
+    with sets_data._refresh_started:
+        pass
+    assert [r["name"] for r in sets_data.load_cached_sets()] == ["New set name"]
+    assert len(parses) == 2
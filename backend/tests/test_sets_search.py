@@ -136,4 +136,75 @@ def test_relevance_order_for_castle(monkeypatch, search_sets):
 
     # We expect "Castle" to appear before "Small Castle" because
     # name.startswith(q) scores higher than just name contains.
-    assert names.index("Castle") < names.index("Small Castle")
\ No newline at end of file
+    assert names.index("Castle") < names.index("Small Castle")
+
+def test_typo_falls_back_to_fuzzy_match(monkeypatch, search_sets):
+    """
+    A misspelled query with no substring hit should still find the
+    closest sets through the fuzzy (trigram + SequenceMatcher) fallback.
+    """
+    _use_sets(monkeypatch, search_sets)
+
+    resp = client.get("/sets", params={"q": "cruser", "limit": 10})
+    assert resp.status_code == 200
+
+    data = resp.json()
+    assert [s["name"] for s in data] == ["Space Cruiser"]
+
+    resp = client.get("/sets", params={"q": "qqqqq", "limit": 10})
+    assert resp.status_code == 200
+    assert resp.json() == []
+
+
+def test_suggest_prefix_tokens_and_set_numbers(monkeypatch, search_sets):
+    """
+    /sets/suggest matches name/theme prefixes (including later words of a
+    name) and puts an exact set-number hit first.
+    """
+    monkeypatch.setattr(sets_router, "load_cached_sets", lambda: list(search_sets))
+
+    resp = client.get("/sets/suggest", params={"q": "Cast", "limit": 10})
+    assert resp.status_code == 200
+    names = [s["name"] for s in resp.json()]
+    assert names[0] == "Castle"
+    assert set(names) == {"Castle", "Small Castle", "Lion Knights' Castle"}
+
+    resp = client.get("/sets/suggest", params={"q": "10305"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data[0]["set_num"] == "10305-1"
+    assert data[0]["ip"] == "Icons"
+
+    resp = client.get("/sets/suggest", params={"q": "cruzer"})
+    assert resp.status_code == 200
+    assert [s["name"] for s in resp.json()] == ["Space Cruiser"]
+
+
+def test_stale_suggest_index_is_rebuilt_once_in_the_background(monkeypatch, search_sets, db_session):
+    catalog = sets_router.catalog_for(list(search_sets))
+    index = sets_router._suggest_index(db_session, catalog)
+    assert sets_router._suggest_index(db_session, catalog) is index
+
+    started = []
+
+    class FakeThread:
+        def __init__(self, target, args, **kwargs):
+            self.run = lambda: target(*args)
+
+        def start(self):
+            started.append(self)
+
+    monkeypatch.setattr(sets_router.threading, "Thread", FakeThread)
+    monkeypatch.setattr(sets_router, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(db_session, "close", lambda: None)
+    monkeypatch.setitem(sets_router._suggest_cache, "ts", 0.0)
+
+    # Stale: both callers get the old index; only one rebuild is started.
+    assert sets_router._suggest_index(db_session, catalog) is index
+    assert sets_router._suggest_index(db_session, catalog) is index
+    assert len(started) == 1
+
+    started[0].run()
+    rebuilt = sets_router._suggest_index(db_session, catalog)
+    assert rebuilt is not index and rebuilt.top("cast", 30) == index.top("cast", 30)
+    assert not sets_router._suggest_building.locked()
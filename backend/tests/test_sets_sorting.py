@@ -5,6 +5,7 @@ from fastapi.testclient import TestClient
 from app.main import app
 import app.routers.sets as sets_router
 import app.data.reviews as reviews_data
+from app.core.limiter import limiter
 
 client = TestClient(app)
 
@@ -183,4 +184,60 @@ def test_sort_relevance_with_query(monkeypatch, sample_sets, sample_reviews):
     # Only the two car sets should appear
     assert names[0] == "Car One"
     assert names[1] == "Race Car"
-    assert all("car" in n.lower() for n in names)
\ No newline at end of file
+    assert all("car" in n.lower() for n in names)
+
+def test_sort_name_ascending_and_descending(monkeypatch, sample_sets):
+    _use_sample_sets(monkeypatch, sample_sets)
+
+    resp = client.get("/sets", params={"sort": "name", "order": "asc", "limit": 50})
+    assert resp.status_code == 200
+    assert [s["name"] for s in resp.json()] == ["Car One", "Race Car", "Space Station"]
+
+    resp = client.get("/sets", params={"sort": "name", "order": "desc", "limit": 50})
+    assert resp.status_code == 200
+    assert [s["name"] for s in resp.json()] == ["Space Station", "Race Car", "Car One"]
+
+
+def test_theme_filter_is_case_insensitive(monkeypatch, sample_sets):
+    _use_sample_sets(monkeypatch, sample_sets)
+
+    resp = client.get("/sets", params={"theme": " speed ", "limit": 50})
+    assert resp.status_code == 200
+    assert [s["set_num"] for s in resp.json()] == ["1002-1"]
+    assert resp.headers["X-Total-Count"] == "1"
+
+    resp = client.get("/sets", params={"theme": "Unknown Theme", "limit": 50})
+    assert resp.status_code == 200
+    assert resp.json() == []
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    """/sets allows 30 requests a minute; this test alone makes nine."""
+    monkeypatch.setattr(limiter, "enabled", False)
+
+
+@pytest.mark.parametrize("sort", ["name", "pieces", "price"])
+def test_pages_match_a_full_sort(monkeypatch, no_rate_limit, sort):
+    many = [
+        {
+            "set_num": f"{2000 + i}-1",
+            "set_num_plain": str(2000 + i),
+            "name": f"Set {i % 7}",
+            "year": 2015 + i % 4,
+            "pieces": 100 * (i % 5),
+            "theme": "City" if i % 2 else "Space",
+            "image_url": None,
+        }
+        for i in range(40)
+    ]
+    _use_sample_sets(monkeypatch, many)
+
+    full = client.get("/sets", params={"sort": sort, "theme": "city", "limit": 100}).json()
+    paged = []
+    for page in (1, 2):
+        resp = client.get("/sets", params={"sort": sort, "theme": "city", "limit": 8, "page": page})
+        assert resp.headers["X-Total-Count"] == "20"
+        paged.extend(s["set_num"] for s in resp.json())
+
+    assert paged == [s["set_num"] for s in full][:16]
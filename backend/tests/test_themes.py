@@ -1,3 +1,9 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.routers import themes as themes_router
+
+
 def test_themes_list_returns_items(client):
     r = client.get("/themes")
     assert r.status_code == 200
@@ -45,4 +51,25 @@ def test_theme_sets_sorting(client):
     theme = themes[0]["theme"]
 
     r = client.get(f"/themes/{theme}/sets?limit=10&offset=0&sort=year&order=desc")
-    assert r.status_code == 200
\ No newline at end of file
+    assert r.status_code == 200
+
+def test_themes_group_spellings_and_honor_min_year(monkeypatch):
+    rows = [
+        {"set_num": "1-1", "name": "A", "year": 2015, "pieces": 900, "theme": "Pokémon", "image_url": "old.jpg"},
+        {"set_num": "2-1", "name": "B", "year": 2023, "pieces": 300, "theme": "pokemon", "image_url": "new.jpg"},
+        {"set_num": "3-1", "name": "C", "year": 2023, "pieces": 50, "theme": "Star-Wars", "image_url": None},
+    ]
+    monkeypatch.setattr(themes_router, "load_cached_sets", lambda: rows)
+    api = TestClient(app)
+
+    data = api.get("/themes").json()
+    assert data == [
+        {"theme": "Pokémon", "set_count": 2, "image_url": "old.jpg"},
+        {"theme": "Star-Wars", "set_count": 1, "image_url": None},
+    ]
+
+    data = api.get("/themes", params={"min_year": 2020, "q": "poke"}).json()
+    assert data == [{"theme": "pokemon", "set_count": 1, "image_url": "new.jpg"}]
+
+    r = api.get("/themes/star wars/sets")
+    assert [s["set_num"] for s in r.json()] == ["3-1"]
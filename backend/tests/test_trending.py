@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.db import get_db
+from app.core.auth import get_current_user
+from app.core.limiter import limiter
+from app.data import trending
+from app.data.set_view import invalidate_set_view
+from app.models import Review as ReviewModel
+from app.models import Set as SetModel
+from app.models import SetTrending
+from app.models import User as UserModel
+
+NOW = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def seeded(db_session):
+    db_session.query(SetModel).delete()
+    db_session.add_all([
+        SetModel(set_num="10305-1", name="Lion Knights' Castle", year=2022, theme="Icons", pieces=4514),
+        SetModel(set_num="21318-1", name="Tree House", year=2019, theme="Ideas", pieces=3036),
+        SetModel(set_num="76419-1", name="Hogwarts Castle and Grounds", year=2023, theme="Harry Potter", pieces=2660),
+    ])
+    db_session.commit()
+    invalidate_set_view()
+    trending.invalidate_trending()
+    yield db_session
+    db_session.query(SetTrending).delete()
+    db_session.query(ReviewModel).delete()
+    db_session.query(UserModel).delete()
+    db_session.query(SetModel).delete()
+    db_session.commit()
+    invalidate_set_view()
+    trending.invalidate_trending()
+
+
+def test_scores_halve_every_half_life():
+    stored = trending.WEIGHTS["review"] * trending.growth(NOW)
+    assert trending.decayed(stored, NOW) == pytest.approx(3.0)
+    assert trending.decayed(stored, NOW + trending.HALF_LIFE) == pytest.approx(1.5)
+    assert trending.decayed(stored, NOW + 3 * trending.HALF_LIFE) == pytest.approx(0.375)
+
+
+def test_recent_activity_outranks_older_heavier_activity(seeded):
+    db = seeded
+    two_weeks_ago = NOW - 2 * trending.HALF_LIFE
+    trending.record_event(db, "10305-1", "review", at=two_weeks_ago)  # 3.0 -> 0.75 now
+    trending.record_event(db, "21318-1", "wishlist", at=NOW)          # 1.0
+    trending.record_event(db, "21318-1", "click", at=NOW)             # + 0.5
+    trending.record_event(db, "76419-1", "click", at=NOW)             # 0.5
+    db.commit()
+
+    assert db.query(SetTrending).count() == 3
+    top = trending.top_sets(db, 10)
+    assert [sn for sn, _ in top] == ["21318-1", "10305-1", "76419-1"]
+
+    scale = trending.growth(NOW) / trending.growth(datetime.now(timezone.utc))
+    assert [score / scale for _, score in top] == pytest.approx([1.5, 0.75, 0.5])
+
+
+def test_top_sets_serves_a_snapshot_until_invalidated(seeded):
+    db = seeded
+    trending.record_event(db, "10305-1", "owned")
+    db.commit()
+    assert [sn for sn, _ in trending.top_sets(db, 5)] == ["10305-1"]
+
+    trending.record_event(db, "21318-1", "review")
+    db.commit()
+    assert [sn for sn, _ in trending.top_sets(db, 5)] == ["10305-1"]
+
+    trending.invalidate_trending()
+    assert [sn for sn, _ in trending.top_sets(db, 5)] == ["21318-1", "10305-1"]
+
+
+def test_rebuild_matches_recorded_events(seeded):
+    db = seeded
+    user = UserModel(username="builder")
+    db.add(user)
+    db.flush()
+    recent = datetime.now(timezone.utc) - timedelta(days=3)
+    db.add_all([
+        ReviewModel(user_id=user.id, set_num="10305", rating=5.0, created_at=recent),
+        ReviewModel(user_id=user.id, set_num="76419-1", rating=4.0,
+                    created_at=datetime.now(timezone.utc) - timedelta(days=400)),
+    ])
+    db.commit()
+
+    assert trending.rebuild_trending(db) == 1
+    row = db.get(SetTrending, "10305-1")
+    assert trending.decayed(row.score) == pytest.approx(3.0 * 2 ** (-3 / 7), rel=1e-3)
+
+
+def test_trending_endpoint(seeded):
+    db = seeded
+    trending.record_event(db, "76419-1", "review")
+    trending.record_event(db, "10305-1", "click")
+    db.commit()
+
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        data = TestClient(app).get("/sets/trending", params={"limit": 1}).json()
+    finally:
+        app.dependency_overrides.clear()
+    assert [s["set_num"] for s in data] == ["76419-1"]
+    assert data[0]["name"] == "Hogwarts Castle and Grounds"
+    assert data[0]["trending_score"] == pytest.approx(3.0, abs=0.01)
+
+
+def test_new_rating_counts_as_a_review(seeded, monkeypatch):
+    db = seeded
+    user = UserModel(username="rater")
+    db.add(user)
+    db.commit()
+    monkeypatch.setattr(limiter, "enabled", False)
+
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: user
+    try:
+        client = TestClient(app)
+        assert client.put("/ratings/10305", json={"rating": 4.5}).status_code == 200
+        assert client.put("/ratings/10305", json={"rating": 5.0}).status_code == 200  # update only
+    finally:
+        app.dependency_overrides.clear()
+
+    row = db.get(SetTrending, "10305-1")
+    assert trending.decayed(row.score) == pytest.approx(3.0, abs=0.01)